@@ -0,0 +1,834 @@
+"""
+Async WooCommerce agent: the same store operations as WooCommerceAgent, over a shared aiohttp session.
+The synchronous woocommerce.API is requests-based and blocks the event loop for every round trip.
+"""
+
+import asyncio
+import json
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlencode
+
+import aiohttp
+from multidict import CIMultiDict
+from woocommerce.oauth import OAuth
+from yarl import URL
+
+from utils import get_logger
+from utils.http_cache import HTTPResponseCache, cache_key
+from utils.llm_scheduler import parse_retry_after
+from utils.store_transport import RETRYABLE_STATUSES, StoreTransportPolicy
+
+logger = get_logger(__name__)
+
+USER_AGENT = "WooCommerce-Python-REST-API/3.0.0"
+
+# the largest page the REST API serves
+MAX_PER_PAGE = 100
+# the default item limit of a batch request (woocommerce_rest_batch_items_limit)
+MAX_BATCH_ITEMS = 100
+# statuses worth retrying: the store was busy or briefly unavailable
+TRANSIENT_STATUSES = RETRYABLE_STATUSES
+
+# seconds a GET response is served from the cache, per resource type
+DEFAULT_CACHE_TTLS = {"products": 300, "orders": 30, "reports": 300}
+
+
+class WooCommerceError(Exception):
+    """A store request failed; raised instead of returning an empty result."""
+
+
+class WooCommerceTimeoutError(WooCommerceError):
+    """The store did not answer in time (after all retries)."""
+
+
+class WooCommerceConnectionError(WooCommerceError):
+    """The store could not be reached (after all retries)."""
+
+
+class WooCommerceAPIError(WooCommerceError):
+    """The store answered a request with an error status."""
+
+    def __init__(self, status: int, text: str):
+        super().__init__(f"WooCommerce API error {status}: {text[:200]}")
+        self.status = status
+        self.text = text
+
+
+class WooCommerceNotFoundError(WooCommerceAPIError):
+    """The requested resource does not exist (404)."""
+
+
+class WooCommerceAuthError(WooCommerceAPIError):
+    """The API keys were rejected or lack permission (401/403)."""
+
+
+class WooCommerceRateLimitError(WooCommerceAPIError):
+    """The store kept answering 429 Too Many Requests."""
+
+    def __init__(self, status: int, text: str, retry_after: Optional[float] = None):
+        super().__init__(status, text)
+        self.retry_after = retry_after
+
+
+class WooCommerceServerError(WooCommerceAPIError):
+    """The store kept failing with a 5xx error."""
+
+
+def api_error(response: "WooResponse") -> WooCommerceAPIError:
+    """The typed error for an error response."""
+    if response.status == 404:
+        return WooCommerceNotFoundError(response.status, response.text)
+    if response.status in (401, 403):
+        return WooCommerceAuthError(response.status, response.text)
+    if response.status == 429:
+        return WooCommerceRateLimitError(
+            response.status, response.text, parse_retry_after(response.headers.get("Retry-After"))
+        )
+    if response.status >= 500:
+        return WooCommerceServerError(response.status, response.text)
+    return WooCommerceAPIError(response.status, response.text)
+
+
+@dataclass
+class WooResponse:
+    """A fully read API response (the connection is already back in the pool)."""
+    status: int
+    headers: Mapping[str, str]
+    text: str
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class AsyncWooCommerceAgent:
+    """
+    Async counterpart of WooCommerceAgent, with the same methods and return shapes.
+
+    - Authentication matches woocommerce.API: HTTP Basic over HTTPS (or key/secret in the
+      query string with query_string_auth), OAuth 1.0a signed URLs over plain HTTP
+    - All calls share one session with a bounded, keep-alive connection pool,
+      opened on first use (or in start) and released in close
+    - GET responses are cached per resource type and revalidated with ETag/Last-Modified;
+      product updates invalidate cached products
+    - Every request goes through a StoreTransportPolicy: a concurrency cap and request rate
+      for the store, and jittered retries of timeouts, 429 and 5xx for idempotent methods
+    - Failures raise WooCommerceError subclasses, so "no orders" and "the store timed out"
+      are told apart; only get_order maps a missing order (404) to None
+    """
+
+    def __init__(
+        self,
+        url: str,
+        consumer_key: str,
+        consumer_secret: str,
+        version: str = "wc/v3",
+        timeout: float = 10.0,
+        pool_size: int = 10,
+        keepalive_timeout: float = 60.0,
+        query_string_auth: bool = False,
+        verify_ssl: bool = True,
+        cache_ttls: Optional[Dict[str, float]] = None,
+        cache_max_bytes: int = 16 * 1024 * 1024,
+        transport: Optional[StoreTransportPolicy] = None
+    ):
+        """
+        Initialize the agent.
+
+        Args:
+            url: Store URL
+            consumer_key: REST API consumer key
+            consumer_secret: REST API consumer secret
+            version: REST API version
+            timeout: Total seconds allowed per request attempt (methods can override it per call)
+            pool_size: Maximum open connections to the store
+            keepalive_timeout: Seconds an idle connection is kept open
+            query_string_auth: Send the key and secret as query parameters instead of Basic auth (HTTPS only)
+            verify_ssl: Verify the store's TLS certificate
+            cache_ttls: Seconds GET responses are cached per resource type (None = defaults)
+            cache_max_bytes: Size bound of the response cache (0 = no caching)
+            transport: Concurrency, rate and retry policy for the store (None = defaults)
+        """
+        self.url = url.rstrip("/")
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.version = version
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.query_string_auth = query_string_auth
+        self.verify_ssl = verify_ssl
+        self.is_ssl = self.url.startswith("https")
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.cache: Optional[HTTPResponseCache] = None
+        if cache_max_bytes > 0:
+            self.cache = HTTPResponseCache(
+                ttls=DEFAULT_CACHE_TTLS if cache_ttls is None else cache_ttls,
+                max_bytes=cache_max_bytes
+            )
+        self.transport = transport if transport is not None else StoreTransportPolicy()
+
+        logger.info(
+            "מאתחל את ה-WooCommerce Agent האסינכרוני",
+            extra={
+                "store_url": url,
+                "api_version": version,
+                "pool_size": pool_size,
+                "max_concurrency": self.transport.max_concurrency,
+                "consumer_key_length": len(consumer_key) if consumer_key else 0
+            }
+        )
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout,
+                ssl=None if self.verify_ssl else False,
+                enable_cleanup_closed=True
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": USER_AGENT, "Accept": "application/json"}
+            )
+            logger.info("נפתח סשן HTTP משותף ל-WooCommerce", extra={"pool_size": self.pool_size})
+        return self._session
+
+    async def start(self) -> None:
+        """Open the connection pool."""
+        self._ensure_session()
+
+    async def close(self) -> None:
+        """Close the shared session and release its connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("הסשן המשותף ל-WooCommerce נסגר")
+        self._session = None
+
+    def _endpoint_url(self, endpoint: str) -> str:
+        return f"{self.url}/wp-json/{self.version}/{endpoint}"
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        timeout: Optional[float] = None
+    ) -> WooResponse:
+        """
+        Send an authenticated request through the transport policy and read the whole response.
+
+        Timeouts, connection errors, 429 and 5xx are retried for idempotent methods; the
+        last response is returned if the store keeps failing, so the caller sees its status.
+
+        Args:
+            method: HTTP method
+            endpoint: Endpoint relative to the API root, e.g. "products"
+            params: Query parameters
+            data: JSON body
+            use_cache: Serve and store GET responses through the response cache
+            timeout: Seconds allowed per attempt (None = the agent's timeout)
+
+        Raises:
+            WooCommerceTimeoutError: If the last attempt timed out
+            WooCommerceConnectionError: If the last attempt could not reach the store
+        """
+        key = entry = generation = None
+        if method == "GET" and use_cache and self.cache is not None and self.cache.cacheable(endpoint):
+            key = cache_key(endpoint, params)
+            generation = self.cache.generation
+            entry, fresh = self.cache.lookup(key)
+            if fresh:
+                return WooResponse(entry.status, entry.headers, entry.text)
+
+        headers: Dict[str, str] = {}
+        if entry is not None:
+            headers.update(self.cache.conditional_headers(entry))
+
+        attempt = 0
+        while True:
+            status = retry_after = None
+            try:
+                async with self.transport.slot():
+                    response = await self._send(method, endpoint, params, data, headers, timeout)
+            except asyncio.TimeoutError as e:
+                error: WooCommerceError = WooCommerceTimeoutError(
+                    f"{method} {endpoint} timed out after {timeout or self.timeout}s"
+                )
+                error.__cause__ = e
+            except aiohttp.ClientError as e:
+                error = WooCommerceConnectionError(f"{method} {endpoint}: {type(e).__name__}: {e}")
+                error.__cause__ = e
+            else:
+                if response.status not in RETRYABLE_STATUSES:
+                    break
+                status = response.status
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if status == 429 and retry_after is not None:
+                    # the limit is the store's, not this request's - hold every request back
+                    self.transport.pause(retry_after)
+
+            if not self.transport.should_retry(method, attempt, status):
+                if status is None:
+                    logger.error(
+                        "הבקשה לחנות נכשלה",
+                        extra={"method": method, "endpoint": endpoint, "attempts": attempt + 1, "error_message": str(error)}
+                    )
+                    raise error
+                break
+            delay = self.transport.retry_delay(attempt, retry_after)
+            logger.warning(
+                "שגיאה זמנית בבקשה לחנות - מנסה שוב",
+                extra={
+                    "method": method,
+                    "endpoint": endpoint,
+                    "status_code": status,
+                    "attempt": attempt + 1,
+                    "delay": round(delay, 2)
+                }
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if key is not None:
+            if response.status == 304 and entry is not None:
+                # unchanged on the store - serve the cached body, nothing was downloaded
+                self.cache.refresh(key, entry)
+                return WooResponse(entry.status, entry.headers, entry.text)
+            self.cache.store(key, response.status, response.headers, response.text, generation=generation)
+        return response
+
+    async def _send(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]],
+        data: Optional[Dict[str, Any]],
+        headers: Dict[str, str],
+        timeout: Optional[float]
+    ) -> WooResponse:
+        """Send one attempt; signed anew each time, since an OAuth nonce cannot be reused."""
+        url: Any = self._endpoint_url(endpoint)
+        params = dict(params or {})
+        auth = None
+        if self.is_ssl:
+            if self.query_string_auth:
+                params.update({"consumer_key": self.consumer_key, "consumer_secret": self.consumer_secret})
+            else:
+                auth = aiohttp.BasicAuth(self.consumer_key, self.consumer_secret)
+        else:
+            # OAuth signs the full URL, so the query string is part of it and nothing is passed separately
+            if params:
+                url = f"{url}?{urlencode(params)}"
+            url = OAuth(
+                url=url,
+                consumer_key=self.consumer_key,
+                consumer_secret=self.consumer_secret,
+                version=self.version,
+                method=method
+            ).get_oauth_url()
+            # already percent-encoded; re-encoding would break the signature
+            url = URL(url, encoded=True)
+            params = {}
+
+        headers = dict(headers)
+        kwargs: Dict[str, Any] = {"params": params or None, "auth": auth, "headers": headers}
+        if data is not None:
+            kwargs["data"] = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            headers["Content-Type"] = "application/json;charset=utf-8"
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        async with self._ensure_session().request(method, url, **kwargs) as response:
+            text = await response.text()
+            return WooResponse(response.status, CIMultiDict(response.headers), text)
+
+    def invalidate(self, *resources: str) -> None:
+        """
+        Drop cached responses of resource types, e.g. invalidate("products").
+
+        Args:
+            resources: Resource types (the first segment of the endpoint)
+        """
+        if self.cache is not None:
+            self.cache.invalidate(resources)
+
+    @staticmethod
+    def _product_filters(category: Optional[str],
+                         stock_status: Optional[str],
+                         sku: Optional[str],
+                         modified_after: Optional[str] = None,
+                         include: Optional[List[int]] = None) -> Dict[str, Any]:
+        filters: Dict[str, Any] = {}
+        if category:
+            filters["category"] = category
+        if stock_status:
+            filters["stock_status"] = stock_status
+        if sku:
+            filters["sku"] = sku
+        if modified_after:
+            filters["modified_after"] = modified_after
+            filters["dates_are_gmt"] = "true"
+        if include:
+            filters["include"] = ",".join(str(product_id) for product_id in include)
+        return filters
+
+    @staticmethod
+    def _order_filters(status: Optional[str], modified_after: Optional[str] = None) -> Dict[str, Any]:
+        filters: Dict[str, Any] = {"status": status} if status else {}
+        if modified_after:
+            filters["modified_after"] = modified_after
+            filters["dates_are_gmt"] = "true"
+        return filters
+
+    async def _fetch_page(self, endpoint: str, params: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Fetch one page of a collection.
+
+        Returns:
+            The page's items and the total number of pages (X-WP-TotalPages)
+
+        Raises:
+            WooCommerceError: If the page could not be fetched
+        """
+        # walks are not cached: they would fill the cache and hide changes from incremental syncs
+        response = await self._request("GET", endpoint, params=params, use_cache=False)
+        if response.status != 200:
+            raise api_error(response)
+        return response.json(), int(response.headers.get("X-WP-TotalPages") or 1)
+
+    async def _iter_collection(
+        self,
+        endpoint: str,
+        filters: Dict[str, Any],
+        per_page: int,
+        prefetch: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield every item of a collection, in page order.
+
+        The first page gives the page count; the following pages are requested up to
+        prefetch at a time ahead of the consumer, so at most prefetch + 1 pages are held.
+        """
+        per_page = min(per_page, MAX_PER_PAGE)
+        prefetch = max(prefetch, 1)
+        logger.info(
+            "מתחיל מעבר על כל הדפים",
+            extra={"endpoint": endpoint, "per_page": per_page, "prefetch": prefetch, "params": filters}
+        )
+        items, total_pages = await self._fetch_page(endpoint, {**filters, "page": 1, "per_page": per_page})
+        for item in items:
+            yield item
+        count = len(items)
+
+        pending: Deque[asyncio.Task] = deque()
+        next_page = 2
+        try:
+            while next_page <= total_pages or pending:
+                while next_page <= total_pages and len(pending) < prefetch:
+                    pending.append(asyncio.create_task(
+                        self._fetch_page(endpoint, {**filters, "page": next_page, "per_page": per_page})
+                    ))
+                    next_page += 1
+                items, _ = await pending.popleft()
+                for item in items:
+                    yield item
+                count += len(items)
+        finally:
+            # consumer stopped early or a page failed - drop the pages fetched ahead
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        logger.info(
+            "המעבר על כל הדפים הסתיים",
+            extra={"endpoint": endpoint, "total_pages": total_pages, "items_count": count}
+        )
+
+    def iter_products(self,
+                      per_page: int = MAX_PER_PAGE,
+                      category: Optional[str] = None,
+                      stock_status: Optional[str] = None,
+                      sku: Optional[str] = None,
+                      modified_after: Optional[str] = None,
+                      include: Optional[List[int]] = None,
+                      prefetch: int = 4) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over all matching products across pages.
+
+        A failed page raises a WooCommerceError instead of ending the iteration quietly
+        with a partial catalog.
+
+        Args:
+            per_page: Items per request (up to 100)
+            category: Optional category filter
+            stock_status: Optional stock status filter (instock, outofstock, onbackorder)
+            sku: Optional SKU filter
+            modified_after: Only products modified after this GMT time (ISO 8601)
+            include: Only these product IDs
+            prefetch: Pages requested concurrently ahead of the consumer
+        """
+        return self._iter_collection(
+            "products",
+            self._product_filters(category, stock_status, sku, modified_after, include),
+            per_page,
+            prefetch
+        )
+
+    def iter_orders(self,
+                    status: Optional[str] = None,
+                    per_page: int = MAX_PER_PAGE,
+                    modified_after: Optional[str] = None,
+                    prefetch: int = 4) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over all matching orders across pages.
+
+        Args:
+            status: Optional order status filter
+            per_page: Items per request (up to 100)
+            modified_after: Only orders modified after this GMT time (ISO 8601)
+            prefetch: Pages requested concurrently ahead of the consumer
+        """
+        return self._iter_collection("orders", self._order_filters(status, modified_after), per_page, prefetch)
+
+    async def get_products(self,
+                           page: int = 1,
+                           per_page: int = 10,
+                           category: Optional[str] = None,
+                           stock_status: Optional[str] = None,
+                           sku: Optional[str] = None,
+                           timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Get products from the store.
+
+        Args:
+            page: Page number
+            per_page: Number of items per page
+            category: Optional category filter
+            stock_status: Optional stock status filter (instock, outofstock, onbackorder)
+            sku: Optional SKU filter
+            timeout: Seconds allowed per attempt (None = the agent's timeout)
+
+        Raises:
+            WooCommerceError: If the products could not be fetched
+        """
+        params = {"page": page, "per_page": per_page, **self._product_filters(category, stock_status, sku)}
+        logger.info(
+            "מבקש רשימת מוצרים",
+            extra={"page": page, "per_page": per_page, "category": category, "params": params}
+        )
+        try:
+            response = await self._request("GET", "products", params=params, timeout=timeout)
+            if response.status != 200:
+                raise api_error(response)
+        except WooCommerceError as e:
+            logger.error(
+                "שגיאה בקבלת מוצרים",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "params": params}
+            )
+            raise
+
+        products = response.json()
+        logger.info(
+            "התקבלו מוצרים בהצלחה",
+            extra={
+                "products_count": len(products),
+                "total_pages": response.headers.get('X-WP-TotalPages'),
+                "total_products": response.headers.get('X-WP-Total')
+            }
+        )
+        return products
+
+    async def get_orders(self,
+                         status: Optional[str] = None,
+                         page: int = 1,
+                         per_page: int = 10,
+                         timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Get orders from the store.
+
+        Args:
+            status: Optional order status filter
+            page: Page number
+            per_page: Number of items per page
+            timeout: Seconds allowed per attempt (None = the agent's timeout)
+
+        Raises:
+            WooCommerceError: If the orders could not be fetched
+        """
+        params = {"page": page, "per_page": per_page, **self._order_filters(status)}
+        logger.info(
+            "מבקש רשימת הזמנות",
+            extra={"status": status, "page": page, "per_page": per_page, "params": params}
+        )
+        try:
+            response = await self._request("GET", "orders", params=params, timeout=timeout)
+            if response.status != 200:
+                raise api_error(response)
+        except WooCommerceError as e:
+            logger.error(
+                "שגיאה בקבלת הזמנות",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "params": params}
+            )
+            raise
+
+        orders = response.json()
+        logger.info(
+            "התקבלו הזמנות בהצלחה",
+            extra={
+                "orders_count": len(orders),
+                "total_pages": response.headers.get('X-WP-TotalPages'),
+                "total_orders": response.headers.get('X-WP-Total')
+            }
+        )
+        return orders
+
+    async def get_order(self, order_id: int, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a single order.
+
+        Args:
+            order_id: The ID of the order
+            timeout: Seconds allowed per attempt (None = the agent's timeout)
+
+        Returns:
+            The order, or None if the store has no such order
+
+        Raises:
+            WooCommerceError: If the order could not be fetched
+        """
+        logger.info("מבקש הזמנה", extra={"order_id": order_id})
+        try:
+            response = await self._request("GET", f"orders/{order_id}", timeout=timeout)
+            if response.status == 404:
+                logger.info("ההזמנה לא נמצאה בחנות", extra={"order_id": order_id})
+                return None
+            if response.status != 200:
+                raise api_error(response)
+        except WooCommerceError as e:
+            logger.error(
+                "שגיאה בקבלת הזמנה",
+                extra={"order_id": order_id, "error_type": type(e).__name__, "error_message": str(e)}
+            )
+            raise
+
+        order = response.json()
+        logger.info(
+            "התקבלה הזמנה בהצלחה",
+            extra={"order_id": order_id, "status": order.get("status")}
+        )
+        return order
+
+    async def update_product(self,
+                             product_id: int,
+                             data: Dict[str, Any],
+                             timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Update a product's details.
+
+        Args:
+            product_id: The ID of the product to update
+            data: Dictionary containing the fields to update
+            timeout: Seconds allowed per attempt (None = the agent's timeout)
+
+        Returns:
+            The updated product
+
+        Raises:
+            WooCommerceError: If the product was not updated
+        """
+        logger.info(
+            "מעדכן מוצר",
+            extra={
+                "product_id": product_id,
+                "update_fields": list(data.keys()),
+                "data_preview": str(data)[:200]
+            }
+        )
+        try:
+            response = await self._request("PUT", f"products/{product_id}", data=data, timeout=timeout)
+            if response.status not in [200, 201]:
+                raise api_error(response)
+        except WooCommerceError as e:
+            logger.error(
+                "שגיאה בעדכון מוצר",
+                extra={
+                    "product_id": product_id,
+                    "error_type": type(e).__name__,
+                    "error_message": str(e),
+                    "data": data
+                }
+            )
+            raise
+
+        updated_product = response.json()
+        # listings and the product itself may all include the old values
+        self.invalidate("products")
+        logger.info(
+            "מוצר עודכן בהצלחה",
+            extra={"product_id": product_id, "updated_fields": list(data.keys())}
+        )
+        return updated_product
+
+    async def batch_update_products(self,
+                                    updates: List[Dict[str, Any]],
+                                    chunk_size: int = MAX_BATCH_ITEMS,
+                                    concurrency: int = 4,
+                                    max_retries: int = 3) -> Dict[str, Any]:
+        """
+        Update many products through products/batch.
+
+        The updates are split into chunks of up to chunk_size, and up to concurrency chunks
+        are in flight at once. A chunk that fails with a transient error (timeout, 429, 5xx)
+        is retried with jittered exponential backoff; items the store rejects individually
+        with a 5xx error are retried the same way, other item errors are reported as is.
+
+        Args:
+            updates: Dictionaries with the product "id" and the fields to update
+            chunk_size: Items per batch request (the store's limit is 100 by default)
+            concurrency: Batch requests sent concurrently
+            max_retries: Retries per chunk after the first attempt
+
+        Returns:
+            A report with "updated" (the updated products), "failed" (id, status and
+            error of each item that was not updated) and "retries" (extra requests sent)
+        """
+        report: Dict[str, Any] = {"updated": [], "failed": [], "retries": 0}
+        valid = []
+        for update in updates:
+            if update.get("id"):
+                valid.append(update)
+            else:
+                report["failed"].append({"id": None, "status": None, "error": "missing product id"})
+
+        chunk_size = max(1, min(chunk_size, MAX_BATCH_ITEMS))
+        chunks = [valid[i:i + chunk_size] for i in range(0, len(valid), chunk_size)]
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        logger.info(
+            "מעדכן מוצרים באצוות",
+            extra={"products_count": len(valid), "chunks": len(chunks), "concurrency": concurrency}
+        )
+
+        async def run(chunk: List[Dict[str, Any]]) -> None:
+            async with semaphore:
+                await self._send_batch(chunk, report, max_retries)
+
+        await asyncio.gather(*(run(chunk) for chunk in chunks))
+        if report["updated"]:
+            self.invalidate("products")
+
+        log = logger.error if report["failed"] else logger.info
+        log(
+            "עדכון המוצרים באצוות הסתיים",
+            extra={
+                "updated_count": len(report["updated"]),
+                "failed_count": len(report["failed"]),
+                "retries": report["retries"]
+            }
+        )
+        return report
+
+    async def _send_batch(self, chunk: List[Dict[str, Any]], report: Dict[str, Any], max_retries: int) -> None:
+        """Send one chunk, retrying it (or its transiently failed items) until max_retries."""
+        for attempt in range(max_retries + 1):
+            retry_after = None
+            try:
+                response = await self._request("POST", "products/batch", data={"update": chunk})
+            except (WooCommerceTimeoutError, WooCommerceConnectionError) as e:
+                status, error = None, str(e)
+            else:
+                status, error = response.status, response.text[:500]
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status == 200:
+                    results = response.json().get("update") or []
+                    retry = []
+                    # the store answers item by item, in request order
+                    for update, result in zip(chunk, results):
+                        item_error = result.get("error")
+                        if not item_error:
+                            report["updated"].append(result)
+                            continue
+                        item_status = (item_error.get("data") or {}).get("status")
+                        if item_status in TRANSIENT_STATUSES and attempt < max_retries:
+                            retry.append(update)
+                        else:
+                            report["failed"].append(
+                                {"id": update["id"], "status": item_status, "error": item_error.get("message")}
+                            )
+                    for update in chunk[len(results):]:
+                        report["failed"].append({"id": update["id"], "status": 200, "error": "missing from response"})
+                    if not retry:
+                        return
+                    chunk, status, error = retry, None, None
+
+            if status is not None and status not in TRANSIENT_STATUSES:
+                break
+            if attempt == max_retries:
+                break
+            report["retries"] += 1
+            delay = self.transport.retry_delay(attempt, retry_after)
+            logger.warning(
+                "שגיאה זמנית בעדכון מוצרים באצווה - מנסה שוב",
+                extra={"status_code": status, "items": len(chunk), "attempt": attempt + 1, "delay": round(delay, 2)}
+            )
+            await asyncio.sleep(delay)
+
+        logger.error(
+            "עדכון אצוות מוצרים נכשל",
+            extra={"status_code": status, "response_text": error, "items": len(chunk)}
+        )
+        report["failed"].extend({"id": update["id"], "status": status, "error": error} for update in chunk)
+
+    async def get_sales_report(self,
+                               date_min: Optional[str] = None,
+                               date_max: Optional[str] = None,
+                               timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Get sales report for a specific period.
+
+        Args:
+            date_min: Start date in ISO format (YYYY-MM-DD)
+            date_max: End date in ISO format (YYYY-MM-DD)
+            timeout: Seconds allowed per attempt (None = the agent's timeout)
+
+        Raises:
+            WooCommerceError: If the report could not be fetched
+        """
+        params: Dict[str, Any] = {}
+        if date_min:
+            params["date_min"] = date_min
+        if date_max:
+            params["date_max"] = date_max
+        logger.info(
+            "מבקש דוח מכירות",
+            extra={"date_min": date_min, "date_max": date_max, "params": params}
+        )
+        try:
+            response = await self._request("GET", "reports/sales", params=params, timeout=timeout)
+            if response.status != 200:
+                raise api_error(response)
+        except WooCommerceError as e:
+            logger.error(
+                "שגיאה בקבלת דוח מכירות",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "params": params}
+            )
+            raise
+
+        report = response.json()
+        # ה-API מחזיר רשימה עם רשומה אחת לתקופה המבוקשת
+        if isinstance(report, list):
+            report = report[0] if report else {}
+        logger.info(
+            "התקבל דוח מכירות בהצלחה",
+            extra={
+                "report_period": f"{date_min or 'all'} to {date_max or 'now'}",
+                "total_sales": report.get('total_sales'),
+                "total_orders": report.get('total_orders')
+            }
+        )
+        return report
@@ -0,0 +1,487 @@
+"""
+מראה מקומית של קטלוג המוצרים.
+טעינה מלאה פעם אחת, ואחריה סנכרון מצטבר לפי modified_after מנקודת ביקורת שנשמרת בדיסק.
+המוצרים נשמרים בזיכרון בצורה מצומצמת עם אינדקסים לפי מק"ט, קטגוריה, מצב מלאי ומחיר,
+כך ששאלות על מוצרים נענות בלי לפנות לחנות.
+"""
+
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils import get_logger
+from agents.async_woocommerce_agent import AsyncWooCommerceAgent
+
+logger = get_logger(__name__)
+
+# גרסת מבנה קובץ נקודת הביקורת
+CHECKPOINT_VERSION = 1
+# מרווח ביטחון בשניות לנקודת הביקורת של ההזמנות, לפער בין השעון המקומי לשעון החנות
+ORDERS_CLOCK_MARGIN = 120
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class MirroredProduct:
+    """מוצר בצורה מצומצמת - רק השדות שהבוט עונה עליהם"""
+
+    __slots__ = (
+        "id", "name", "sku", "price", "regular_price", "sale_price",
+        "stock_status", "stock_quantity", "categories", "status", "permalink", "modified"
+    )
+
+    FIELDS = __slots__
+
+    def __init__(self, *values: Any):
+        for field, value in zip(self.FIELDS, values):
+            setattr(self, field, value)
+
+    @classmethod
+    def from_api(cls, product: Dict[str, Any]) -> "MirroredProduct":
+        """בניה מתשובת ה-REST API"""
+        return cls(
+            product["id"],
+            product.get("name") or "",
+            product.get("sku") or "",
+            _to_float(product.get("price")),
+            _to_float(product.get("regular_price")),
+            _to_float(product.get("sale_price")),
+            product.get("stock_status") or "",
+            product.get("stock_quantity"),
+            tuple(category["id"] for category in product.get("categories") or []),
+            product.get("status") or "",
+            product.get("permalink") or "",
+            product.get("date_modified_gmt") or ""
+        )
+
+    def to_row(self) -> List[Any]:
+        return [getattr(self, field) for field in self.FIELDS]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """המוצר בשמות השדות של ה-API, כדי שאפשר יהיה להציג אותו כמו תשובה מהחנות"""
+        product = {field: getattr(self, field) for field in self.FIELDS}
+        product["categories"] = list(self.categories)
+        return product
+
+
+class CatalogMirror:
+    """
+    עותק מקומי של קטלוג המוצרים, מתעדכן ברקע.
+    - start: טעינת נקודת הביקורת מהדיסק (אם יש), והסנכרון הראשון ברקע; בלי נקודת ביקורת -
+      טעינה מלאה ברקע, ועד שהיא מסתיימת ready=False והשאלות נענות מהחנות
+    - כל sync_interval שניות: רק מוצרים שהשתנו מאז המוצר האחרון שנראה (modified_after),
+      ובנוסף טעינה מחדש של המוצרים בהזמנות שהשתנו מאז הסנכרון הקודם - הזמנה משנה מלאי
+      בלי לעדכן את תאריך השינוי של המוצר, כך שהמלאי נשאר עדכני גם בלי webhooks
+    - כל full_sync_interval שניות: טעינה מלאה, שמסירה גם מוצרים שנמחקו (הם לא מופיעים
+      בסנכרון המצטבר) ומתקנת מלאי שהשתנה בלי לעדכן את תאריך השינוי של המוצר (למשל בהזמנה)
+    """
+
+    def __init__(
+        self,
+        store_agent: AsyncWooCommerceAgent,
+        checkpoint_path: Optional[str] = None,
+        sync_interval: float = 300,
+        full_sync_interval: float = 86400,
+        prefetch: int = 4
+    ):
+        """
+        Args:
+            store_agent: סוכן ה-WooCommerce שממנו נטען הקטלוג
+            checkpoint_path: קובץ לשמירת הקטלוג ונקודת הביקורת (None = בזיכרון בלבד)
+            sync_interval: כל כמה שניות לסנכרן שינויים
+            full_sync_interval: כל כמה שניות לטעון את כל הקטלוג מחדש (0 = רק בהפעלה הראשונה)
+            prefetch: כמה דפים לבקש במקביל בזמן טעינה
+        """
+        self.store_agent = store_agent
+        self.checkpoint_path = checkpoint_path
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self.prefetch = prefetch
+
+        self._products: Dict[int, MirroredProduct] = {}
+        self._by_sku: Dict[str, int] = {}
+        self._by_category: Dict[int, Set[int]] = {}
+        self._by_stock_status: Dict[str, Set[int]] = {}
+        self._by_price: List[Tuple[float, int]] = []
+
+        # תאריך השינוי (GMT) של המוצר האחרון שנראה - נקודת הביקורת לסנכרון הבא
+        self.modified_after: Optional[str] = None
+        # תאריך השינוי (GMT) של ההזמנה האחרונה שנראתה - המוצרים בהזמנות מאוחרות יותר נטענים מחדש
+        self.orders_modified_after: Optional[str] = None
+        self.last_full_sync: float = 0.0
+        self.ready = False
+        # עדכונים מבחוץ (webhook, refresh) שהגיעו בזמן טעינה מלאה - מוחלים שוב אחרי _rebuild,
+        # כדי שתמונת הדפים הישנה של הטעינה לא תדרוס אותם (None = אין טעינה מלאה כרגע)
+        self._events_during_full_sync: Optional[List[Tuple[str, Any]]] = None
+        self._sync_lock = asyncio.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+        self.stats = {"full_syncs": 0, "incremental_syncs": 0, "updated": 0, "removed": 0, "sync_errors": 0}
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    # --- אינדקסים ---
+
+    def _index(self, product: MirroredProduct) -> None:
+        self._products[product.id] = product
+        if product.sku:
+            self._by_sku[product.sku.lower()] = product.id
+        for category_id in product.categories:
+            self._by_category.setdefault(category_id, set()).add(product.id)
+        self._by_stock_status.setdefault(product.stock_status, set()).add(product.id)
+        if product.price is not None:
+            insort(self._by_price, (product.price, product.id))
+
+    def _unindex(self, product_id: int) -> None:
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+        if product.sku and self._by_sku.get(product.sku.lower()) == product_id:
+            del self._by_sku[product.sku.lower()]
+        for category_id in product.categories:
+            self._by_category.get(category_id, set()).discard(product_id)
+        self._by_stock_status.get(product.stock_status, set()).discard(product_id)
+        if product.price is not None:
+            position = bisect_left(self._by_price, (product.price, product_id))
+            if position < len(self._by_price) and self._by_price[position] == (product.price, product_id):
+                del self._by_price[position]
+
+    def _rebuild(self, products: Iterable[MirroredProduct]) -> None:
+        """בנייה מחדש של כל האינדקסים (בטעינה מלאה - מהיר יותר מהוספה אחת-אחת)"""
+        self._products = {}
+        self._by_sku = {}
+        self._by_category = {}
+        self._by_stock_status = {}
+        for product in products:
+            self._products[product.id] = product
+            if product.sku:
+                self._by_sku[product.sku.lower()] = product.id
+            for category_id in product.categories:
+                self._by_category.setdefault(category_id, set()).add(product.id)
+            self._by_stock_status.setdefault(product.stock_status, set()).add(product.id)
+        self._by_price = sorted(
+            (product.price, product.id) for product in self._products.values() if product.price is not None
+        )
+
+    def apply(self, product: Dict[str, Any], advance_checkpoint: bool = True) -> None:
+        """
+        עדכון מוצר בודד מתשובת ה-API (או מוצר שנמחק, אם הוא בפח)
+
+        Args:
+            product: המוצר כפי שהוחזר מה-API
+            advance_checkpoint: לקדם את נקודת הביקורת (False לעדכון שלא הגיע מסנכרון,
+                כמו webhook, כדי לא לדלג על שינויים שעוד לא סונכרנו)
+        """
+        if self._events_during_full_sync is not None:
+            self._events_during_full_sync.append(("apply", product))
+        current = self._products.get(product["id"])
+        modified = product.get("date_modified_gmt")
+        if current is not None and modified and current.modified > modified:
+            # גרסה ישנה יותר ממה שכבר יש (webhook שהגיע באיחור)
+            return
+        self._unindex(product["id"])
+        if product.get("status") == "trash":
+            self.stats["removed"] += 1
+        else:
+            self._index(MirroredProduct.from_api(product))
+            self.stats["updated"] += 1
+        if not advance_checkpoint:
+            return
+        if modified and (self.modified_after is None or modified > self.modified_after):
+            self.modified_after = modified
+
+    def _replace(self, product: Dict[str, Any]) -> None:
+        """החלפת מוצר בלי בדיקת תאריך עדכון - מלאי משתנה בלי לעדכן אותו"""
+        if self._events_during_full_sync is not None:
+            self._events_during_full_sync.append(("replace", product))
+        self._unindex(product["id"])
+        self._index(MirroredProduct.from_api(product))
+        self.stats["updated"] += 1
+
+    def remove(self, product_id: int) -> None:
+        """הסרת מוצר שנמחק מהחנות"""
+        if self._events_during_full_sync is not None:
+            self._events_during_full_sync.append(("remove", product_id))
+        if product_id in self._products:
+            self._unindex(product_id)
+            self.stats["removed"] += 1
+
+    # --- שאילתות ---
+
+    def get(self, product_id: int) -> Optional[Dict[str, Any]]:
+        """מוצר לפי מזהה"""
+        product = self._products.get(product_id)
+        return product.to_dict() if product else None
+
+    def get_by_sku(self, sku: str) -> Optional[Dict[str, Any]]:
+        """מוצר לפי מק"ט (ללא תלות באותיות גדולות/קטנות)"""
+        product_id = self._by_sku.get(sku.lower())
+        return self.get(product_id) if product_id is not None else None
+
+    def by_category(self, category_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """מוצרים בקטגוריה"""
+        return self._materialize(self._by_category.get(category_id, ()), limit)
+
+    def by_stock_status(self, stock_status: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """מוצרים לפי מצב מלאי (instock, outofstock, onbackorder)"""
+        return self._materialize(self._by_stock_status.get(stock_status, ()), limit)
+
+    def by_price_range(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        מוצרים בטווח מחירים, מהזול ליקר
+
+        Args:
+            min_price: מחיר מינימלי (כולל)
+            max_price: מחיר מקסימלי (כולל)
+            limit: מספר מוצרים מקסימלי
+        """
+        start = bisect_left(self._by_price, (min_price, -1)) if min_price is not None else 0
+        end = bisect_right(self._by_price, (max_price, float("inf"))) if max_price is not None else len(self._by_price)
+        if limit is not None:
+            end = min(end, start + limit)
+        return [self._products[product_id].to_dict() for _, product_id in self._by_price[start:end]]
+
+    def _materialize(self, product_ids: Iterable[int], limit: Optional[int]) -> List[Dict[str, Any]]:
+        ids = sorted(product_ids)
+        if limit is not None:
+            ids = ids[:limit]
+        return [self._products[product_id].to_dict() for product_id in ids]
+
+    # --- סנכרון ---
+
+    async def sync(self, full: bool = False) -> None:
+        """
+        סנכרון מול החנות
+
+        Args:
+            full: טעינה מלאה של כל הקטלוג במקום שינויים בלבד
+        """
+        async with self._sync_lock:
+            full = full or self.modified_after is None
+            started = time.monotonic()
+            try:
+                if full:
+                    await self._full_sync()
+                else:
+                    await self._incremental_sync()
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                logger.error(
+                    "שגיאה בסנכרון קטלוג המוצרים",
+                    extra={"error_type": type(e).__name__, "error_message": str(e), "full": full}
+                )
+                return
+            logger.info(
+                "קטלוג המוצרים סונכרן",
+                extra={
+                    "full": full,
+                    "products_count": len(self._products),
+                    "modified_after": self.modified_after,
+                    "duration": round(time.monotonic() - started, 2)
+                }
+            )
+            await self._save_checkpoint()
+
+    async def _full_sync(self) -> None:
+        # בונים עותק חדש בצד ומחליפים רק בסוף, כך שכשל באמצע לא משאיר קטלוג חלקי
+        products: List[MirroredProduct] = []
+        latest: Optional[str] = None
+        # הטעינה רואה את המלאי של עכשיו - רק הזמנות מכאן והלאה יכולות לשנות אותו
+        orders_since = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(time.time() - ORDERS_CLOCK_MARGIN))
+        self._events_during_full_sync = []
+        try:
+            async for product in self.store_agent.iter_products(prefetch=self.prefetch):
+                if product.get("status") == "trash":
+                    continue
+                products.append(MirroredProduct.from_api(product))
+                modified = product.get("date_modified_gmt")
+                if modified and (latest is None or modified > latest):
+                    latest = modified
+        finally:
+            events, self._events_during_full_sync = self._events_during_full_sync, None
+        self._rebuild(products)
+        self._replay(events)
+        self.modified_after = latest or self.modified_after
+        self.orders_modified_after = orders_since
+        self.last_full_sync = time.time()
+        self.ready = True
+        self.stats["full_syncs"] += 1
+
+    async def _incremental_sync(self) -> None:
+        async for product in self.store_agent.iter_products(
+            modified_after=self.modified_after,
+            prefetch=self.prefetch
+        ):
+            self.apply(product)
+        await self._refresh_ordered_products()
+        self.ready = True
+        self.stats["incremental_syncs"] += 1
+
+    async def _refresh_ordered_products(self) -> None:
+        """טעינה מחדש של המוצרים שבהזמנות שהשתנו מאז הסנכרון הקודם"""
+        if self.orders_modified_after is None:
+            # נקודת ביקורת ישנה בלי הזמנות - מתחילים לעקוב מעכשיו
+            self.orders_modified_after = time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.gmtime(time.time() - ORDERS_CLOCK_MARGIN)
+            )
+            return
+        product_ids: Set[int] = set()
+        latest = self.orders_modified_after
+        async for order in self.store_agent.iter_orders(
+            modified_after=self.orders_modified_after,
+            prefetch=self.prefetch
+        ):
+            product_ids.update(item["product_id"] for item in order.get("line_items") or [] if item.get("product_id"))
+            modified = order.get("date_modified_gmt")
+            if modified and modified > latest:
+                latest = modified
+        if product_ids:
+            await self._fetch_and_replace(sorted(product_ids))
+        # מתקדמים רק אחרי שהמוצרים נטענו, כדי שכשל יחזור על אותן הזמנות בסנכרון הבא
+        self.orders_modified_after = latest
+
+    def _replay(self, events: List[Tuple[str, Any]]) -> None:
+        """החלת העדכונים שהגיעו בזמן הטעינה המלאה על הקטלוג החדש, לפי הסדר"""
+        for kind, value in events:
+            if kind == "remove":
+                self.remove(value)
+            elif kind == "apply":
+                # בדיקת הגרסה ב-apply משאירה את המוצר מהטעינה אם הוא חדש יותר
+                self.apply(value, advance_checkpoint=False)
+            else:
+                self._replace(value)
+        if events:
+            logger.info("עדכונים שהגיעו בזמן הטעינה המלאה הוחלו מחדש", extra={"events": len(events)})
+
+    def _full_sync_due(self) -> bool:
+        return self.full_sync_interval > 0 and time.time() - self.last_full_sync >= self.full_sync_interval
+
+    async def refresh(self, product_ids: Iterable[int]) -> None:
+        """
+        טעינה מחדש של מוצרים מסוימים מהחנות - למשל אחרי הזמנה, שמשנה מלאי בלי לשנות את תאריך העדכון
+
+        Args:
+            product_ids: מזהי המוצרים
+        """
+        product_ids = sorted(set(product_ids))
+        if not product_ids:
+            return
+        try:
+            await self._fetch_and_replace(product_ids)
+        except Exception as e:
+            self.stats["sync_errors"] += 1
+            logger.error(
+                "שגיאה בטעינה מחדש של מוצרים",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "product_ids": product_ids}
+            )
+
+    async def _fetch_and_replace(self, product_ids: List[int]) -> None:
+        async for product in self.store_agent.iter_products(include=product_ids, prefetch=self.prefetch):
+            self._replace(product)
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await self.sync(full=self._full_sync_due())
+            await asyncio.sleep(self.sync_interval)
+
+    # --- נקודת ביקורת ---
+
+    def _read_checkpoint(self) -> Optional[Dict[str, Any]]:
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # כתיבה לקובץ זמני והחלפה, כדי שקריסה באמצע לא תשאיר קובץ פגום
+        # (קובץ זמני לכל תהליך - במצב תהליכים מרובים כולם כותבים לאותה נקודת ביקורת)
+        temp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, self.checkpoint_path)
+
+    async def _load_checkpoint(self) -> None:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            checkpoint = await asyncio.to_thread(self._read_checkpoint)
+            if checkpoint.get("version") != CHECKPOINT_VERSION:
+                return
+            products = [MirroredProduct(*row) for row in checkpoint["products"]]
+        except Exception as e:
+            logger.error(
+                "שגיאה בטעינת נקודת הביקורת של הקטלוג - תתבצע טעינה מלאה",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "path": self.checkpoint_path}
+            )
+            return
+        # JSON שומר טאפלים כרשימות
+        for product in products:
+            product.categories = tuple(product.categories)
+        self._rebuild(products)
+        self.modified_after = checkpoint.get("modified_after")
+        self.orders_modified_after = checkpoint.get("orders_modified_after")
+        self.last_full_sync = checkpoint.get("last_full_sync", 0.0)
+        self.ready = True
+        logger.info(
+            "קטלוג המוצרים נטען מנקודת הביקורת",
+            extra={"products_count": len(self._products), "modified_after": self.modified_after}
+        )
+
+    async def _save_checkpoint(self) -> None:
+        if not self.checkpoint_path or not self.ready:
+            return
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "modified_after": self.modified_after,
+            "orders_modified_after": self.orders_modified_after,
+            "last_full_sync": self.last_full_sync,
+            "products": [product.to_row() for product in self._products.values()]
+        }
+        try:
+            await asyncio.to_thread(self._write_checkpoint, checkpoint)
+        except Exception as e:
+            logger.error(
+                "שגיאה בשמירת נקודת הביקורת של הקטלוג",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "path": self.checkpoint_path}
+            )
+
+    async def start(self) -> None:
+        """טעינת נקודת הביקורת והפעלת הסנכרון ברקע"""
+        if self._sync_task is not None:
+            return
+        await self._load_checkpoint()
+        # גם בלי נקודת ביקורת לא מחכים לטעינה המלאה - הבוט עונה מיד, והנתב פונה לחנות עד ש-ready
+        self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def close(self) -> None:
+        """עצירת הסנכרון ברקע"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות המראה"""
+        return {
+            **self.stats,
+            "products_count": len(self._products),
+            "ready": self.ready,
+            "modified_after": self.modified_after
+        }
@@ -4,85 +4,462 @@ Orchestrator agent that coordinates between user requests and various specialize
 
 import json
 import time
+import asyncio
+import hashlib
 import logging
 import aiohttp
-from typing import Dict, Any, Optional, Tuple, List
+import numpy as np
+from collections import deque
+from typing import Dict, Any, Optional, Tuple, List, Callable, Awaitable
 from datetime import datetime
 from utils import get_logger
 from utils.cache_manager import SimpleCache
+from utils.conversation_store import ConversationStore
+from utils.conversation_db import SQLiteConversationStore
 from utils.embeddings_manager import EmbeddingsManager
+from utils.clarification_classifier import ClarificationClassifier
+from utils.single_flight import SingleFlight
+from utils.semantic_cache import SemanticCache
+from utils.llm_scheduler import (
+    LLMScheduler, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW, backoff_delay, parse_retry_after
+)
+from utils.resilience import CircuitBreaker, CircuitOpenError, LatencyTracker
+from utils.tokens import estimate_messages_tokens
+from utils.prompt_builder import PromptBuilder
+from utils.context_builder import ContextBuilder
 from utils.cache import ResponseCache
 from utils.metrics import PerformanceMetrics
+from utils.keyword_matcher import CATEGORY_MATCHER
+from agents.task_type import TaskType
+from agents.task_router import TaskRouter
+from agents.async_woocommerce_agent import AsyncWooCommerceAgent
+from agents.catalog_mirror import CatalogMirror
+from agents.order_analytics import OrderAnalytics
 
 # יצירת לוגר
 logger = get_logger(__name__)
 
+# טוקנים שמורים לסיכום ההקשר (נושא עיקרי ושאלה אחרונה)
+CONTEXT_SUMMARY_TOKENS = 40
+
+# קולבק שמקבל את הטקסט המצטבר בזמן הזרמת תשובה
+PartialCallback = Callable[[str], Awaitable[None]]
+
+
+class LLMAPIError(Exception):
+    """שגיאת HTTP מ-DeepSeek"""
+
+    def __init__(self, status: int, error_text: str, retry_after: Optional[float] = None):
+        super().__init__(f"API error: {error_text}")
+        self.status = status
+        self.retry_after = retry_after
+
+
 class OrchestratorAgent:
-    def __init__(self, deepseek_api_key: str):
-        """אתחול הסוכן"""
+    def __init__(
+        self,
+        deepseek_api_key: str,
+        pool_size: int = 100,
+        pool_size_per_host: int = 20,
+        keepalive_timeout: float = 75,
+        dns_cache_ttl: int = 300,
+        warmup_connections: int = 2,
+        speculative_clarification: bool = False,
+        local_clarification: bool = False,
+        clarification_clear_threshold: float = 0.35,
+        clarification_ambiguous_threshold: float = 0.75,
+        coalesce_requests: bool = True,
+        semantic_cache: bool = False,
+        semantic_cache_threshold: float = 0.92,
+        semantic_cache_size: int = 1000,
+        max_concurrency: int = 10,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        hedge_requests: bool = False,
+        hedge_min_delay: float = 2.0,
+        circuit_failure_threshold: int = 5,
+        circuit_reset_timeout: float = 30.0,
+        prompt_token_budget: int = 3000,
+        max_turn_tokens: int = 300,
+        conversation_max_turns: int = 20,
+        conversation_idle_ttl: float = 86400,
+        max_conversations: int = 10000,
+        conversation_memory_bytes: int = 64 * 1024 * 1024,
+        conversation_db_path: Optional[str] = None,
+        store_agent: Optional[AsyncWooCommerceAgent] = None,
+        catalog_mirror: Optional[CatalogMirror] = None,
+        order_analytics: Optional[OrderAnalytics] = None
+    ):
+        """
+        אתחול הסוכן
+        
+        Args:
+            deepseek_api_key: מפתח ה-API של DeepSeek
+            pool_size: מספר חיבורים מקסימלי במאגר החיבורים
+            pool_size_per_host: מספר חיבורים מקסימלי לשרת בודד
+            keepalive_timeout: כמה שניות להשאיר חיבור פנוי פתוח
+            dns_cache_ttl: זמן שמירת תוצאות DNS בשניות
+            warmup_connections: כמה חיבורים לפתוח מראש בעליית המערכת
+            speculative_clarification: להריץ את בדיקת ההבהרה במקביל להפקת התשובה
+            local_clarification: להחליט על הבהרה במסווג מקומי ולפנות למודל רק כשהוא לא בטוח
+            clarification_clear_threshold: ציון עמימות שמתחתיו השאלה ברורה
+            clarification_ambiguous_threshold: ציון עמימות שמעליו נדרשת הבהרה
+            coalesce_requests: לאחד בקשות זהות ל-DeepSeek שרצות במקביל
+            semantic_cache: להפעיל מטמון תשובות סמנטי משותף לכל השיחות
+            semantic_cache_threshold: דמיון מינימלי לפגיעה במטמון הסמנטי
+            semantic_cache_size: מספר תשובות מקסימלי במטמון הסמנטי
+            max_concurrency: מספר קריאות מקסימלי ל-DeepSeek שרצות במקביל
+            requests_per_minute: מגבלת בקשות לדקה ל-DeepSeek (0 = ללא הגבלה)
+            tokens_per_minute: מגבלת טוקנים לדקה ל-DeepSeek (0 = ללא הגבלה)
+            hedge_requests: לשלוח בקשה כפולה כשתשובה מתעכבת מעבר לאחוזון ה-95
+            hedge_min_delay: סף מינימלי בשניות לפני בקשה כפולה
+            circuit_failure_threshold: כמה כשלונות רצופים פותחים את המפסק
+            circuit_reset_timeout: כמה שניות המפסק נשאר פתוח לפני ניסיון חוזר
+            prompt_token_budget: תקציב טוקנים לפרומפט - הוראות, FAQ והיסטוריה
+            max_turn_tokens: אורך מקסימלי בטוקנים להודעה בודדת מההיסטוריה
+            conversation_max_turns: מספר הודעות מקסימלי שנשמר לכל שיחה
+            conversation_idle_ttl: אחרי כמה שניות בלי פעילות שיחה נמחקת מהזיכרון
+            max_conversations: מספר שיחות מקסימלי בזיכרון
+            conversation_memory_bytes: תקציב זיכרון משוער להיסטוריית כל השיחות
+            conversation_db_path: קובץ SQLite לשמירת היסטוריית השיחות (None = בזיכרון בלבד)
+            store_agent: סוכן WooCommerce לתשובות ישירות על הזמנות, מכירות ומלאי (None = הכל דרך המודל)
+            catalog_mirror: עותק מקומי של קטלוג המוצרים לשאלות מוצרים ומלאי (None = ישירות מהחנות)
+            order_analytics: מנוע ניתוח הזמנות מקומי לדוחות מכירות (None = דוח מהחנות)
+        """
         self.api_key = deepseek_api_key
-        self.api_url = "https://api.deepseek.com/v1/chat/completions"
+        self.api_base_url = "https://api.deepseek.com"
+        self.api_url = f"{self.api_base_url}/v1/chat/completions"
         self.embeddings_manager = EmbeddingsManager()
-        self.cache = SimpleCache(ttl=3600, maxsize=1000)
-        self.performance_metrics = []
-        self.conversation_history = {}  # מזהה שיחה -> רשימת הודעות
+        self.prompt_builder = PromptBuilder()
+        self.context_builder = ContextBuilder(
+            prompt_token_budget=prompt_token_budget,
+            max_turn_tokens=max_turn_tokens
+        )
+        self.cache = SimpleCache(ttl=3600, maxsize=1000, max_conversations=max_conversations)
+        self.semantic_cache: Optional[SemanticCache] = None
+        if semantic_cache:
+            self.semantic_cache = SemanticCache(
+                self.embeddings_manager,
+                threshold=semantic_cache_threshold,
+                ttl=3600,
+                maxsize=semantic_cache_size
+            )
+        # רק המדידות האחרונות - הרשימה לא גדלה לאורך חיי התהליך
+        self.performance_metrics = deque(maxlen=1000)
+        store_settings = dict(
+            max_turns=conversation_max_turns,
+            idle_ttl=conversation_idle_ttl,
+            max_conversations=max_conversations,
+            max_bytes=conversation_memory_bytes
+        )
+        if conversation_db_path:
+            self.conversation_history = SQLiteConversationStore(conversation_db_path, **store_settings)
+        else:
+            self.conversation_history = ConversationStore(**store_settings)
         self.max_retries = 3
         self.timeout = 30
+        self.speculative_clarification = speculative_clarification
+        self.coalesce_requests = coalesce_requests
+        self._inflight = SingleFlight()
+        self.scheduler = LLMScheduler(
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute
+        )
+        self.hedge_requests = hedge_requests
+        self.latency_tracker = LatencyTracker(min_delay=hedge_min_delay)
+        self.hedge_stats = {"hedged": 0, "hedge_won": 0}
+        self.prompt_cache_stats = {"prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0}
+        # סף דמיון נמוך יותר לתשובת FAQ כשהמודל לא זמין
+        self.degraded_faq_threshold = 0.5
+        self.circuit_breaker = CircuitBreaker(
+            "deepseek",
+            failure_threshold=circuit_failure_threshold,
+            reset_timeout=circuit_reset_timeout
+        )
+        self.store_agent = store_agent
+        self.catalog_mirror = catalog_mirror
+        # משימות רקע שנוצרו מאירועי החנות (שמירת הפניה כדי שלא ייאספו באמצע)
+        self._background_tasks: set = set()
+        self.order_analytics = order_analytics
+        self.task_router: Optional[TaskRouter] = (
+            TaskRouter(store_agent, catalog_mirror=catalog_mirror, order_analytics=order_analytics)
+            if store_agent else None
+        )
+        self.clarification_classifier: Optional[ClarificationClassifier] = None
+        if local_clarification:
+            self.clarification_classifier = ClarificationClassifier(
+                self.embeddings_manager,
+                clear_threshold=clarification_clear_threshold,
+                ambiguous_threshold=clarification_ambiguous_threshold
+            )
+        
+        # מאגר חיבורים משותף ל-DeepSeek (נפתח ב-start ונסגר ב-close)
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.warmup_connections = warmup_connections
+        self._session: Optional[aiohttp.ClientSession] = None
         
         logger.info(
             "סוכן אורקסטרטור אותחל",
             extra={"api_key_length": len(deepseek_api_key) if deepseek_api_key else 0}
         )
 
-    async def _call_llm(self, messages: List[Dict[str, str]]) -> str:
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        """
+        מחזיר את הסשן המשותף, ויוצר אותו אם עדיין לא קיים
+        
+        Returns:
+            סשן HTTP עם מאגר חיבורים קבוע, keep-alive ומטמון DNS
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive_timeout,
+                enable_cleanup_closed=True
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                }
+            )
+            logger.info(
+                "נפתח סשן HTTP משותף ל-DeepSeek",
+                extra={
+                    "pool_size": self.pool_size,
+                    "pool_size_per_host": self.pool_size_per_host,
+                    "keepalive_timeout": self.keepalive_timeout,
+                    "dns_cache_ttl": self.dns_cache_ttl
+                }
+            )
+        return self._session
+
+    async def start(self) -> None:
+        """פתיחת מאגר השיחות ומאגרי החיבורים, וחימום חיבורים ל-DeepSeek"""
+        await self.conversation_history.start()
+        if self.store_agent is not None:
+            await self.store_agent.start()
+        if self.catalog_mirror is not None:
+            await self.catalog_mirror.start()
+        if self.order_analytics is not None:
+            await self.order_analytics.start()
+        session = self._ensure_session()
+        if self.warmup_connections <= 0:
+            return
+
+        async def _warm_up() -> None:
+            # בקשה זולה שרק פותחת חיבור TCP+TLS ומשאירה אותו במאגר
+            async with session.get(f"{self.api_base_url}/v1/models") as response:
+                await response.read()
+
+        start_time = time.time()
+        results = await asyncio.gather(
+            *(_warm_up() for _ in range(self.warmup_connections)),
+            return_exceptions=True
+        )
+        failures = [r for r in results if isinstance(r, Exception)]
+        logger.info(
+            "חיבורים ל-DeepSeek חוממו",
+            extra={
+                "connections": self.warmup_connections,
+                "failures": len(failures),
+                "duration": time.time() - start_time
+            }
+        )
+
+    async def close(self) -> None:
+        """סגירת הסשן המשותף ושחרור החיבורים, וכתיבת היסטוריית השיחות שנשארה"""
+        await self.conversation_history.close()
+        if self.order_analytics is not None:
+            await self.order_analytics.close()
+        if self.catalog_mirror is not None:
+            await self.catalog_mirror.close()
+        if self.store_agent is not None:
+            await self.store_agent.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("הסשן המשותף ל-DeepSeek נסגר")
+        self._session = None
+
+    def apply_store_event(self, topic: str, payload: Dict[str, Any]) -> None:
+        """
+        עדכון המטמונים והעותקים המקומיים לפי אירוע מהחנות (webhook)
+
+        Args:
+            topic: נושא האירוע, למשל product.updated או order.created
+            payload: המשאב כפי שהחנות שלחה אותו (במחיקה - לפחות המזהה)
+        """
+        resource, _, event = topic.partition(".")
+        if resource == "product":
+            if self.store_agent is not None:
+                self.store_agent.invalidate("products")
+            if self.catalog_mirror is not None:
+                # גם לפני ש-ready: עדכון שמגיע בזמן טעינה מלאה נשמר במראה ומוחל שוב אחריה
+                if event == "deleted":
+                    self.catalog_mirror.remove(payload["id"])
+                else:
+                    self.catalog_mirror.apply(payload, advance_checkpoint=False)
+        elif resource == "order":
+            if self.store_agent is not None:
+                # הזמנה משנה גם את המלאי של המוצרים שבה
+                self.store_agent.invalidate("orders", "reports", "products")
+            if self.catalog_mirror is not None and self.catalog_mirror.ready:
+                product_ids = [item.get("product_id") for item in payload.get("line_items") or []]
+                task = asyncio.create_task(self.catalog_mirror.refresh(pid for pid in product_ids if pid))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+            if self.order_analytics is not None and self.order_analytics.ready:
+                if event == "deleted":
+                    self.order_analytics.remove(payload["id"])
+                else:
+                    self.order_analytics.apply(payload)
+        else:
+            logger.debug("אירוע מהחנות ללא טיפול", extra={"topic": topic})
+
+    async def _read_stream(
+        self,
+        response: aiohttp.ClientResponse,
+        on_partial: PartialCallback
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        קריאת תשובה בהזרמה (server-sent events) מ-DeepSeek
+        
+        Args:
+            response: תשובת ה-HTTP הפתוחה
+            on_partial: קולבק שנקרא עם הטקסט המצטבר אחרי כל מקטע
+            
+        Returns:
+            טאפל של (התשובה המלאה, נתוני usage אם השרת שלח)
+        """
+        text = ""
+        usage = None
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+            chunk = json.loads(payload)
+            usage = chunk.get("usage") or usage
+            choices = chunk.get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                text += delta
+                await on_partial(text)
+        return text, usage
+
+    def _record_usage(self, usage: Optional[Dict[str, Any]], estimated_tokens: int) -> None:
+        """
+        רישום נתוני usage מהתשובה: תיקון דלי הטוקנים במתזמן,
+        וספירת טוקני פרומפט שהגיעו ממטמון הקידומת של הספק
+        """
+        if not usage:
+            return
+        if "total_tokens" in usage:
+            self.scheduler.record_usage(estimated_tokens, usage["total_tokens"])
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        # DeepSeek מדווח prompt_cache_hit_tokens; בפורמט OpenAI זה prompt_tokens_details.cached_tokens
+        cached_tokens = usage.get("prompt_cache_hit_tokens")
+        if cached_tokens is None:
+            cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        self.prompt_cache_stats["prompt_tokens"] += prompt_tokens
+        self.prompt_cache_stats["cached_prompt_tokens"] += cached_tokens
+        self.prompt_cache_stats["completion_tokens"] += usage.get("completion_tokens", 0)
+
+    @staticmethod
+    def _coalescing_key(data: Dict[str, Any]) -> str:
+        """
+        מפתח לאיחוד בקשות זהות - הבקשה המלאה עם רווחים מנורמלים בתוכן ההודעות
+        """
+        normalized = dict(data)
+        normalized["messages"] = [
+            {**m, "content": " ".join(str(m.get("content", "")).split())}
+            for m in data["messages"]
+        ]
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _call_llm(
+        self,
+        messages: List[Dict[str, str]],
+        on_partial: Optional[PartialCallback] = None,
+        priority: int = PRIORITY_NORMAL,
+        params: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
         קריאה ל-DeepSeek API
         
+        בקשות זהות שרצות במקביל מאוחדות לקריאה אחת, וכל הממתינים מקבלים
+        את אותה תשובה (ואת אותם מקטעי הזרמה).
+        
         Args:
             messages: רשימת הודעות בפורמט של DeepSeek
+            on_partial: קולבק להזרמת התשובה בזמן שהיא נוצרת (אופציונלי)
+            priority: עדיפות הבקשה בתור המתזמן
+            params: פרמטרי מודל (model, temperature, max_tokens, top_p) במקום ברירות המחדל
             
         Returns:
             התשובה מהמודל
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         data = {
             "model": "deepseek-chat",
-            "messages": messages,
             "temperature": 0.7,
-            "max_tokens": 1000
+            "max_tokens": 1000,
+            **(params or {}),
+            "messages": messages,
+            "stream": on_partial is not None
         }
+        if data["stream"]:
+            # בקשת usage במקטע האחרון של ההזרמה
+            data["stream_options"] = {"include_usage": True}
+        if not self.coalesce_requests:
+            return await self._request_llm(data, on_partial, priority)
+
+        return await self._inflight.do(
+            self._coalescing_key(data),
+            lambda publish: self._request_llm(data, publish if data["stream"] else None, priority),
+            on_progress=on_partial
+        )
+
+    async def _request_llm(
+        self,
+        data: Dict[str, Any],
+        on_partial: Optional[PartialCallback] = None,
+        priority: int = PRIORITY_NORMAL
+    ) -> str:
+        """
+        שליחת בקשה ל-DeepSeek, כולל ניסיונות חוזרים, מפסק וגידור
         
+        Args:
+            data: גוף הבקשה
+            on_partial: קולבק למקטעי הזרמה, כש-data מבקש הזרמה
+            priority: עדיפות הבקשה בתור המתזמן
+            
+        Returns:
+            התשובה מהמודל
+        """
         for attempt in range(self.max_retries):
+            if not self.circuit_breaker.allow_request():
+                raise CircuitOpenError("DeepSeek API unavailable (circuit open)")
+
+            retry_after = None
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        self.api_url,
-                        headers=headers,
-                        json=data,
-                        timeout=self.timeout
-                    ) as response:
-                        if response.status == 200:
-                            result = await response.json()
-                            return result["choices"][0]["message"]["content"]
-                        else:
-                            error_text = await response.text()
-                            logger.error(
-                                "שגיאה בקריאה ל-API",
-                                extra={
-                                    "status_code": response.status,
-                                    "error": error_text,
-                                    "attempt": attempt + 1
-                                }
-                            )
-                            if attempt == self.max_retries - 1:
-                                raise Exception(f"API error: {error_text}")
-                            await asyncio.sleep(2 ** attempt)
-                            
+                answer = await self._send_hedged(data, on_partial, priority)
+                self.circuit_breaker.record_success()
+                return answer
             except Exception as e:
+                self.circuit_breaker.record_failure()
+                if isinstance(e, LLMAPIError):
+                    retry_after = e.retry_after
                 logger.error(
                     "שגיאה בקריאה ל-API",
                     extra={
@@ -93,23 +470,122 @@ class OrchestratorAgent:
                 )
                 if attempt == self.max_retries - 1:
                     raise
-                await asyncio.sleep(2 ** attempt)
+            await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt))
 
-    def _get_conversation_context(self, conversation_id: str, limit: int = 5) -> str:
+    async def _send_hedged(
+        self,
+        data: Dict[str, Any],
+        on_partial: Optional[PartialCallback],
+        priority: int
+    ) -> str:
+        """
+        ניסיון בודד. אם הגידור מופעל והתשובה מתעכבת מעבר לאחוזון ה-95 האחרון,
+        נשלחת בקשה כפולה והתשובה הראשונה שמצליחה מנצחת.
+        הזרמות לא מגודרות, כדי לא לשכפל מקטעים למשתמש.
+        """
+        hedge_delay = self.latency_tracker.hedge_delay() if self.hedge_requests else None
+        if on_partial is not None or hedge_delay is None:
+            return await self._send_once(data, on_partial, priority)
+
+        primary = asyncio.create_task(self._send_once(data, None, priority, record_if_cancelled=True))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        self.hedge_stats["hedged"] += 1
+        logger.info("נשלחה בקשה מגודרת ל-DeepSeek", extra={"hedge_delay": hedge_delay})
+        hedge = asyncio.create_task(self._send_once(data, None, PRIORITY_LOW))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_stats["hedge_won"] += 1
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
+
+    async def _send_once(
+        self,
+        data: Dict[str, Any],
+        on_partial: Optional[PartialCallback],
+        priority: int,
+        record_if_cancelled: bool = False
+    ) -> str:
+        """
+        שליחת בקשת HTTP אחת ל-DeepSeek, אחרי קבלת משבצת מהמתזמן.
+        record_if_cancelled: לרשום את הזמן שעבר גם אם הבקשה בוטלה באמצע (הבקשה הראשית בגידור)
+        
+        Raises:
+            LLMAPIError: אם השרת החזיר סטטוס שגיאה
+        """
+        request_kwargs: Dict[str, Any] = {"json": data}
+        if on_partial is not None:
+            # בהזרמה מגבילים את הזמן בין מקטעים ולא את משך התשובה כולה
+            request_kwargs["timeout"] = aiohttp.ClientTimeout(total=None, sock_read=self.timeout)
+        estimated_tokens = estimate_messages_tokens(data["messages"]) + data.get("max_tokens", 0)
+
+        async with self.scheduler.slot(priority, estimated_tokens):
+            start_time = time.monotonic()
+            session = self._ensure_session()
+            try:
+                async with session.post(self.api_url, **request_kwargs) as response:
+                    if response.status == 200:
+                        if on_partial is not None:
+                            text, usage = await self._read_stream(response, on_partial)
+                            self._record_usage(usage, estimated_tokens)
+                            return text
+                        result = await response.json()
+                        self.latency_tracker.record(time.monotonic() - start_time)
+                        self._record_usage(result.get("usage"), estimated_tokens)
+                        return result["choices"][0]["message"]["content"]
+
+                    error_text = await response.text()
+                    logger.error(
+                        "שגיאה בקריאה ל-API",
+                        extra={
+                            "status_code": response.status,
+                            "error": error_text
+                        }
+                    )
+                    retry_after = None
+                    if response.status in (429, 503):
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        if retry_after is not None:
+                            self.scheduler.pause(retry_after)
+                    raise LLMAPIError(response.status, error_text, retry_after)
+            except asyncio.CancelledError:
+                if record_if_cancelled:
+                    # הבקשה הראשית הפסידה לבקשה המגודרת - הזמן שלה הוא חסם תחתון לזמן התגובה.
+                    # בלי הרישום נשמרים רק זמני המנצחים, האחוזון יורד והגידור נשלח יותר ויותר
+                    self.latency_tracker.record(time.monotonic() - start_time)
+                raise
+
+    def _get_conversation_context(self, conversation_id: str, token_budget: Optional[int] = None) -> str:
         """
         קבלת הקונטקסט של השיחה
         
         Args:
             conversation_id: מזהה השיחה
-            limit: כמה הודעות אחרונות לכלול
+            token_budget: כמה טוקנים מותר להקשר (ברירת מחדל: כל תקציב הפרומפט)
             
         Returns:
             מחרוזת המתארת את הקונטקסט
         """
-        if conversation_id not in self.conversation_history:
+        turns = self.conversation_history.get_history(conversation_id)
+        if not turns:
             return ""
             
-        history = self.conversation_history[conversation_id][-limit:]
+        if token_budget is None:
+            token_budget = self.context_builder.prompt_token_budget
+        history = self.context_builder.select_turns(turns, token_budget - CONTEXT_SUMMARY_TOKENS)
+        if not history:
+            return ""
         context = "\nהיסטוריית השיחה האחרונה:\n\n"
         
         # מעקב אחר נושאים
@@ -121,18 +597,17 @@ class OrchestratorAgent:
             # זיהוי נושא השיחה
             if role == "משתמש":
                 last_user_question = content
+                # מעבר יחיד על ההודעה - הקטגוריה הראשונה שיש לה מילת מפתח
+                topic = CATEGORY_MATCHER.first_group(content)
                 # בדיקה אם ההודעה מתייחסת להודעה קודמת
-                if len(content.split()) <= 5 and not any(kw in content.lower() for category, keywords in CATEGORY_KEYWORDS.items() for kw in keywords):
+                if len(content.split()) <= 5 and topic is None:
                     # זו כנראה תגובה קצרה להודעה קודמת
                     if current_topic:
                         topics.append(current_topic)
-                else:
-                    # חיפוש נושא חדש
-                    for category, keywords in CATEGORY_KEYWORDS.items():
-                        if any(kw in content.lower() for kw in keywords):
-                            current_topic = category
-                            topics.append(category)
-                            break
+                elif topic is not None:
+                    # נושא חדש
+                    current_topic = topic
+                    topics.append(topic)
             
             # הוספת ההודעה עם תיאור ההקשר
             context += f"{role}: {content}\n"
@@ -152,66 +627,61 @@ class OrchestratorAgent:
     def _create_messages(self, user_message: str, conversation_id: Optional[str] = None) -> List[Dict[str, str]]:
         """יצירת רשימת ההודעות לשליחה ל-API"""
         
-        # קבלת הקונטקסט של השיחה
-        context = self._get_conversation_context(conversation_id) if conversation_id else ""
-        
-        # הגדרת הודעת המערכת עם דגש על הקשר השיחה
-        system_message = {
-            "role": "system",
-            "content": f"""אתה עוזר מקצועי לניהול חנות אי-קומרס המתמחה ב-WooCommerce.
-תפקידך לסייע למנהלי חנויות בכל הקשור לניהול החנות שלהם.
-
-כללי מענה חשובים:
-1. תמיד תן תשובות מעשיות וברורות
-2. אם השאלה לא ברורה, שאל שאלת הבהרה ספציפית
-3. אם השאלה קצרה, הבן אותה מתוך ההקשר של השיחה
-4. תמיד התייחס לנושא האחרון שדובר עליו אם אין נושא חדש
-5. הצע דוגמאות מעשיות ומספרים
-
-תחומי המומחיות שלך:
-🛍️ ניהול מוצרים והמלאי
-💰 מחירים וקופונים
-📊 ניתוח נתונים ודוחות
-🚚 משלוחים והזמנות
-👥 שירות לקוחות
-📱 שיווק ופרסום
-
-היסטוריית השיחה:
-{context}
-
-זכור: 
-- אתה מומחה לניהול חנות, עליך לתת תשובות מקצועיות ומעשיות
-- אם המשתמש מבקש מידע נוסף או הרחבה, התייחס לנושא האחרון שדובר עליו
-- תמיד הצע דרכים יצירתיות ומעשיות ליישום
-- אם אתה לא בטוח במשהו, שאל שאלת הבהרה"""
-        }
-        
-        # הוספת הודעת המשתמש
-        user_message = {
-            "role": "user",
-            "content": user_message
-        }
+        # קבלת הקונטקסט של השיחה, במה שנשאר מהתקציב אחרי ההוראות וההודעה
+        context = ""
+        if conversation_id:
+            budget = self.context_builder.history_budget(
+                user_message, fixed_tokens=self.prompt_builder.general_prefix_tokens
+            )
+            context = self._get_conversation_context(conversation_id, budget)
         
-        return [system_message, user_message]
+        # הוראות קבועות קודם, הקשר השיחה אחריהן
+        return self.prompt_builder.build_general(user_message, context)
 
-    async def handle_message(self, message: str, conversation_id: Optional[str] = None) -> str:
-        """טיפול בהודעת משתמש"""
+    async def handle_message(
+        self,
+        message: str,
+        conversation_id: Optional[str] = None,
+        on_partial: Optional[PartialCallback] = None
+    ) -> str:
+        """
+        טיפול בהודעת משתמש
+        
+        Args:
+            message: הודעת המשתמש
+            conversation_id: מזהה השיחה
+            on_partial: קולבק להזרמת תשובת המודל בזמן אמת (אופציונלי)
+            
+        Returns:
+            התשובה המלאה
+        """
         start_time = time.time()
         metrics = PerformanceMetrics()
         
         try:
+            # שיחה שאינה בזיכרון (למשל אחרי הפעלה מחדש) נטענת מהמאגר הקבוע
+            await self.conversation_history.load(conversation_id or "default")
+
+            # שאלות על הזמנות, מכירות ומלאי נענות ישירות מהחנות כשאפשר
+            task_type = TaskType.identify_task(message)
+            metrics.task_type = task_type.name
+            if self.task_router:
+                routed_answer = await self.task_router.answer(message, task_type)
+                if routed_answer is not None:
+                    self._record_routed_answer(
+                        message, routed_answer, conversation_id or "default", metrics, start_time
+                    )
+                    return routed_answer
+
+            if self.speculative_clarification:
+                return await self._handle_message_speculative(
+                    message, conversation_id, on_partial, metrics, start_time, task_type
+                )
+
             # בדיקה האם צריך הבהרה
             needs_clarification, clarification_question = await self._needs_clarification(message)
             if needs_clarification and clarification_question:
-                logger.info(
-                    "נדרשת הבהרה לשאלה",
-                    extra={
-                        "original_message": message,
-                        "clarification_question": clarification_question
-                    }
-                )
-                if conversation_id:
-                    self._update_conversation_history(conversation_id, message, clarification_question)
+                self._record_clarification(message, clarification_question, conversation_id)
                 return clarification_question
 
             if not conversation_id:
@@ -219,131 +689,275 @@ class OrchestratorAgent:
                 conversation_id = "default"
             
             # בדיקה במטמון
-            cache_start = time.time()
-            cached_response = self.cache.get(message, conversation_id)
-            metrics.cache_lookup_time = time.time() - cache_start
-            
-            if cached_response[0]:
-                metrics.cache_hit = True
-                logger.info(
-                    "נמצאה תשובה במטמון (Cache Hit)",
-                    extra={
-                        "conversation_id": conversation_id,
-                        "response_length": len(cached_response[0]),
-                        "cache_lookup_time": metrics.cache_lookup_time
-                    }
-                )
-                metrics.response_length = len(cached_response[0])
-                metrics.total_time = time.time() - start_time
-                self._update_conversation_history(conversation_id, message, cached_response[0])
-                self.performance_metrics.append(metrics)
-                return cached_response[0]
-
-            # חיפוש בשאלות נפוצות
-            faq_matches = self.embeddings_manager.find_similar_questions(message)
-            if faq_matches:
-                best_match = faq_matches[0]  # קבלת ההתאמה הטובה ביותר
+            cached_response, semantic_vector = await self._lookup_cache(message, conversation_id, metrics, start_time)
+            if cached_response is not None:
+                return cached_response
+
+            answer = await self._generate_answer(message, conversation_id, on_partial, task_type)
+            self._store_answer(message, answer, conversation_id, metrics, start_time, semantic_vector)
+            return answer
+                
+        except Exception as e:
+            logger.error(
+                "שגיאה בטיפול בהודעה",
+                extra={
+                    "error": str(e),
+                    "message": message,
+                    "conversation_id": conversation_id
+                }
+            )
+            raise
+
+    async def _handle_message_speculative(
+        self,
+        message: str,
+        conversation_id: Optional[str],
+        on_partial: Optional[PartialCallback],
+        metrics: PerformanceMetrics,
+        start_time: float,
+        task_type: TaskType = TaskType.GENERAL_QUESTION
+    ) -> str:
+        """
+        טיפול בהודעה כשבדיקת ההבהרה רצה במקביל להפקת התשובה
+        
+        פגיעה במטמון מנצחת מיד. אחרת בדיקת ההבהרה והפקת התשובה רצות יחד:
+        אם נדרשת הבהרה התשובה מבוטלת, ואם לא - התשובה נשמרת כרגיל.
+        מקטעי הזרמה מעוכבים עד שידוע שאין צורך בהבהרה.
+        """
+        history_id = conversation_id
+        if not conversation_id:
+            logger.warning("לא התקבל מזהה שיחה, משתמש במזהה ברירת מחדל")
+            conversation_id = "default"
+
+        cached_response, semantic_vector = await self._lookup_cache(message, conversation_id, metrics, start_time)
+        if cached_response is not None:
+            return cached_response
+
+        released = asyncio.Event()
+        held_partial: List[str] = []
+
+        async def gated_partial(text: str) -> None:
+            if released.is_set():
+                await on_partial(text)
+            else:
+                held_partial[:] = [text]
+
+        clarification_task = asyncio.create_task(self._needs_clarification(message))
+        answer_task = asyncio.create_task(
+            self._generate_answer(message, conversation_id, gated_partial if on_partial else None, task_type)
+        )
+        try:
+            needs_clarification, clarification_question = await clarification_task
+            if needs_clarification and clarification_question:
+                answer_task.cancel()
                 logger.info(
-                    "נמצאה תשובה ב-FAQ",
-                    extra={
-                        "conversation_id": conversation_id,
-                        "message": message,
-                        "question": best_match[0],
-                        "similarity_score": best_match[2]
-                    }
+                    "תשובה ספקולטיבית בוטלה לטובת שאלת הבהרה",
+                    extra={"conversation_id": conversation_id}
                 )
+                self._record_clarification(message, clarification_question, history_id)
+                return clarification_question
 
-                # יצירת פרומפט למודל השפה
-                context = self._get_conversation_context(conversation_id)
-                prompt = f"""אתה מומחה מקצועי לניהול חנויות אונליין, עם התמחות ספציפית ב-WooCommerce.
-תפקידך לספק מידע מדויק ופרקטי בנושאי ניהול חנות.
-
-להלן מידע רלוונטי מה-FAQ שלנו בנושא השאלה:
-{best_match[1]}
-
-הקשר השיחה:
-{context}
-
-בהתבסס על המידע הזה, אנא:
-1. התאם את התשובה להקשר הספציפי של השאלה
-2. הוסף דוגמאות קונקרטיות ומספרים במידת האפשר
-3. הצע צעדים מעשיים ליישום
-4. שלב טיפים מקצועיים רלוונטיים
-5. הצע שאלות המשך אם יש צורך בהבהרות
-
-חשוב:
-- התמקד אך ורק בניהול החנות
-- תן תשובות מעשיות שאפשר ליישם מיד
-- השתמש במונחים מקצועיים אך הסבר אותם
-- הצע תמיד את העזרה שלך להמשך
-
-שאלת המשתמש: {message}"""
-
-                # קריאה ל-LLM
-                try:
-                    messages = [
-                        {"role": "system", "content": prompt},
-                        {"role": "user", "content": message}
-                    ]
-                    llm_response = await self._call_llm(messages)
-                    # שמירה במטמון
-                    self.cache.set(message, llm_response, conversation_id)
-                    self._update_conversation_history(conversation_id, message, llm_response)
-                    return llm_response
-                except Exception as e:
-                    logger.error(
-                        "שגיאה בקריאה ל-LLM",
-                        extra={
-                            "error": str(e),
-                            "conversation_id": conversation_id
-                        }
-                    )
-                    # במקרה של שגיאה, נחזיר את התשובה המקורית מה-FAQ
-                    self.cache.set(message, best_match[1], conversation_id)
-                    self._update_conversation_history(conversation_id, message, best_match[1])
-                    return best_match[1]
+            released.set()
+            if held_partial:
+                await on_partial(held_partial[0])
+            answer = await answer_task
+        finally:
+            for task in (clarification_task, answer_task):
+                if not task.done():
+                    task.cancel()
 
-            # יצירת הודעות למודל
-            messages = self._create_messages(message, conversation_id)
-            
-            # שליחת בקשה ל-API
+        self._store_answer(message, answer, conversation_id, metrics, start_time, semantic_vector)
+        return answer
+
+    def _record_clarification(
+        self,
+        message: str,
+        clarification_question: str,
+        conversation_id: Optional[str]
+    ) -> None:
+        """רישום שאלת הבהרה שנשלחה למשתמש"""
+        logger.info(
+            "נדרשת הבהרה לשאלה",
+            extra={
+                "original_message": message,
+                "clarification_question": clarification_question
+            }
+        )
+        if conversation_id:
+            self._update_conversation_history(conversation_id, message, clarification_question)
+
+    def _semantic_cache_applies(self, message: str, conversation_id: str) -> bool:
+        """האם מותר להשתמש במטמון הסמנטי - רק לשאלות שלא תלויות בהקשר השיחה"""
+        if self.semantic_cache is None:
+            return False
+        has_history = conversation_id in self.conversation_history
+        if SemanticCache.is_context_dependent(message, has_history):
+            self.semantic_cache.skipped += 1
+            return False
+        return True
+
+    async def _lookup_cache(
+        self,
+        message: str,
+        conversation_id: str,
+        metrics: PerformanceMetrics,
+        start_time: float
+    ) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        חיפוש תשובה במטמון
+        
+        Returns:
+            טאפל של (התשובה השמורה או None, וקטור ה-embedding לשמירה במטמון הסמנטי או None)
+        """
+        cache_start = time.time()
+        semantic_vector = None
+        cached_response = self.cache.get(message, conversation_id)
+        if not cached_response[0] and self._semantic_cache_applies(message, conversation_id):
+            # חישוב ה-embedding בת'רד נפרד, פעם אחת - גם לחיפוש וגם לשמירה בהמשך
+            semantic_vector = await asyncio.to_thread(self.semantic_cache.embed, message)
+            semantic_hit = self.semantic_cache.get(message, semantic_vector)
+            if semantic_hit:
+                cached_response = (semantic_hit[0], True)
+        metrics.cache_lookup_time = time.time() - cache_start
+        
+        if not cached_response[0]:
+            return None, semantic_vector
+
+        metrics.cache_hit = True
+        logger.info(
+            "נמצאה תשובה במטמון (Cache Hit)",
+            extra={
+                "conversation_id": conversation_id,
+                "response_length": len(cached_response[0]),
+                "cache_lookup_time": metrics.cache_lookup_time
+            }
+        )
+        metrics.response_length = len(cached_response[0])
+        metrics.total_time = time.time() - start_time
+        self._update_conversation_history(conversation_id, message, cached_response[0])
+        self.performance_metrics.append(metrics)
+        return cached_response[0], semantic_vector
+
+    async def _generate_answer(
+        self,
+        message: str,
+        conversation_id: str,
+        on_partial: Optional[PartialCallback] = None,
+        task_type: TaskType = TaskType.GENERAL_QUESTION
+    ) -> str:
+        """
+        הפקת תשובה חדשה - דרך ה-FAQ אם נמצאה התאמה, אחרת בפרומפט הכללי.
+        לא משנה מטמון או היסטוריה, כך שאפשר לבטל אותה בבטחה.
+        פרמטרי המודל (טמפרטורה, אורך) נקבעים לפי סוג המשימה.
+        
+        Returns:
+            התשובה שהופקה
+        """
+        params = TaskType.get_prompt_params(task_type)
+        # חיפוש בשאלות נפוצות (בת'רד נפרד, כדי לא לחסום קריאות רשת שרצות במקביל)
+        faq_matches = await asyncio.to_thread(self.embeddings_manager.find_similar_questions, message)
+        if faq_matches:
+            best_match = faq_matches[0]  # קבלת ההתאמה הטובה ביותר
+            logger.info(
+                "נמצאה תשובה ב-FAQ",
+                extra={
+                    "conversation_id": conversation_id,
+                    "message": message,
+                    "question": best_match[0],
+                    "similarity_score": best_match[2]
+                }
+            )
+
+            # יצירת פרומפט למודל השפה - קטע ה-FAQ וההקשר מחולקים בתקציב הטוקנים
+            faq_snippet = self.context_builder.fit_faq(best_match[1])
+            budget = self.context_builder.history_budget(
+                message, faq_snippet, fixed_tokens=self.prompt_builder.faq_prefix_tokens
+            )
+            context = self._get_conversation_context(conversation_id, budget)
+            messages = self.prompt_builder.build_faq(message, faq_snippet, context)
+
+            # קריאה ל-LLM
             try:
-                answer = await self._call_llm(messages)
-                
-                # שמירה במטמון
-                self.cache.set(message, answer, conversation_id)
-                
-                # עדכון מטריקות
-                metrics.response_length = len(answer)
-                metrics.total_time = time.time() - start_time
-                self.performance_metrics.append(metrics)
-                
-                # עדכון היסטוריית שיחה
-                self._update_conversation_history(conversation_id, message, answer)
-                
-                return answer
-                
+                return await self._call_llm(messages, on_partial, params=params)
             except Exception as e:
                 logger.error(
-                    "שגיאה בשליחת בקשה ל-API",
+                    "שגיאה בקריאה ל-LLM",
                     extra={
                         "error": str(e),
                         "conversation_id": conversation_id
                     }
                 )
-                raise
-                
+                # במקרה של שגיאה, נחזיר את התשובה המקורית מה-FAQ
+                return best_match[1]
+
+        # יצירת הודעות למודל
+        messages = self._create_messages(message, conversation_id)
+        
+        # שליחת בקשה ל-API
+        try:
+            return await self._call_llm(messages, on_partial, params=params)
+        except CircuitOpenError:
+            # המודל לא זמין - נחזיר את השאלה הנפוצה הקרובה ביותר, גם בסף נמוך יותר
+            fallback = await asyncio.to_thread(
+                self.embeddings_manager.find_similar_questions, message, self.degraded_faq_threshold
+            )
+            if fallback:
+                logger.warning(
+                    "המודל לא זמין, מוחזרת תשובה מה-FAQ",
+                    extra={"conversation_id": conversation_id, "question": fallback[0][0]}
+                )
+                return fallback[0][1]
+            raise
         except Exception as e:
             logger.error(
-                "שגיאה בטיפול בהודעה",
+                "שגיאה בשליחת בקשה ל-API",
                 extra={
                     "error": str(e),
-                    "message": message,
                     "conversation_id": conversation_id
                 }
             )
             raise
 
+    def _record_routed_answer(
+        self,
+        message: str,
+        answer: str,
+        conversation_id: str,
+        metrics: PerformanceMetrics,
+        start_time: float
+    ) -> None:
+        """רישום תשובה מהניתוב המהיר - בהיסטוריה ובמטריקות, אבל לא במטמון (נתונים חיים)"""
+        metrics.response_length = len(answer)
+        metrics.total_time = time.time() - start_time
+        self.performance_metrics.append(metrics)
+        self._update_conversation_history(conversation_id, message, answer)
+
+    def _store_answer(
+        self,
+        message: str,
+        answer: str,
+        conversation_id: str,
+        metrics: PerformanceMetrics,
+        start_time: float,
+        semantic_vector: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        שמירת תשובה חדשה במטמון, במטריקות ובהיסטוריית השיחה.
+        semantic_vector הוא הוקטור מ-_lookup_cache; None = השאלה לא מתאימה למטמון הסמנטי
+        """
+        # שמירה במטמון
+        self.cache.set(message, answer, conversation_id)
+        if semantic_vector is not None:
+            self.semantic_cache.set(message, answer, semantic_vector)
+        
+        # עדכון מטריקות
+        metrics.response_length = len(answer)
+        metrics.total_time = time.time() - start_time
+        self.performance_metrics.append(metrics)
+        
+        # עדכון היסטוריית שיחה
+        self._update_conversation_history(conversation_id, message, answer)
+
     async def _needs_clarification(self, message: str) -> Tuple[bool, Optional[str]]:
         """
         בדיקה האם השאלה דורשת הבהרה
@@ -355,33 +969,17 @@ class OrchestratorAgent:
             טאפל של (האם צריך הבהרה, שאלת ההבהרה)
         """
         try:
+            # החלטה מקומית, אם המסווג בטוח בה
+            if self.clarification_classifier:
+                decision = await asyncio.to_thread(self.clarification_classifier.classify, message)
+                if decision.needs_clarification is not None:
+                    return decision.needs_clarification, decision.question
+
             # יצירת פרומפט לבדיקת הבהרה
-            messages = [
-                {
-                    "role": "system",
-                    "content": """בדוק האם השאלה דורשת הבהרה נוספת כדי לתת תשובה מדויקת ומועילה.
-אם כן, החזר שאלת הבהרה.
-אם לא, החזר "לא".
-
-דוגמאות:
-1. שאלה: "איך ליצור קופון?"
-   תשובה: "האם הקופון מיועד למוצר ספציפי או לכל החנות?"
-
-2. שאלה: "מה המכירות שלי?"
-   תשובה: "לאיזו תקופה תרצה לראות את נתוני המכירות?"
-
-3. שאלה: "איך להוסיף מוצר חדש?"
-   תשובה: "לא"
-"""
-                },
-                {
-                    "role": "user",
-                    "content": f"שאלת המשתמש: {message}"
-                }
-            ]
+            messages = self.prompt_builder.build_clarification(message)
             
             # קריאה ל-LLM
-            response = await self._call_llm(messages)
+            response = await self._call_llm(messages, priority=PRIORITY_HIGH)
             
             # אם התשובה היא "לא", אין צורך בהבהרה
             if response.strip().lower() == "לא":
@@ -405,11 +1003,8 @@ class OrchestratorAgent:
             message: הודעת המשתמש
             response: תשובת המערכת
         """
-        if conversation_id not in self.conversation_history:
-            self.conversation_history[conversation_id] = []
-            
-        self.conversation_history[conversation_id].append(("משתמש", message))
-        self.conversation_history[conversation_id].append(("מערכת", response))
+        self.conversation_history.append(conversation_id, "משתמש", message)
+        self.conversation_history.append(conversation_id, "מערכת", response)
 
     def get_performance_stats(self) -> Dict[str, Any]:
         """מחזיר סטטיסטיקות ביצועים"""
@@ -428,5 +1023,28 @@ class OrchestratorAgent:
             "avg_total_time": avg_total_time,
             "avg_api_time": avg_api_time,
             "avg_response_length": sum(m.response_length for m in self.performance_metrics) / total_requests,
-            "cache_stats": self.cache.get_stats()
+            "cache_stats": self.cache.get_stats(),
+            "conversation_stats": self.conversation_history.get_stats(),
+            "coalescing_stats": self._inflight.get_stats(),
+            "semantic_cache_stats": self.semantic_cache.get_stats() if self.semantic_cache else None,
+            "scheduler_stats": self.scheduler.get_stats(),
+            "hedge_stats": {**self.hedge_stats, "hedge_delay": self.latency_tracker.hedge_delay()},
+            "circuit_breaker": self.circuit_breaker.get_stats(),
+            "prompt_cache_stats": {
+                **self.prompt_cache_stats,
+                "cached_prompt_ratio": (
+                    self.prompt_cache_stats["cached_prompt_tokens"] / self.prompt_cache_stats["prompt_tokens"]
+                    if self.prompt_cache_stats["prompt_tokens"] else 0
+                )
+            },
+            "fast_path_stats": self.task_router.stats if self.task_router else None,
+            "catalog_mirror_stats": self.catalog_mirror.get_stats() if self.catalog_mirror else None,
+            "order_analytics_stats": self.order_analytics.get_stats() if self.order_analytics else None,
+            "store_cache_stats": (
+                self.store_agent.cache.get_stats() if self.store_agent and self.store_agent.cache else None
+            ),
+            "store_transport_stats": self.store_agent.transport.get_stats() if self.store_agent else None,
+            "clarification_stats": (
+                self.clarification_classifier.get_stats() if self.clarification_classifier else None
+            )
         } 
\ No newline at end of file
@@ -0,0 +1,483 @@
+"""
+מנוע ניתוח הזמנות מקומי.
+ההזמנות נטענות מהחנות למערכים עמודתיים של NumPy (זמן, סכומים, סטטוס, מוצרים),
+ושאלות על הכנסות, סל ממוצע, מוצרים מובילים והשוואה לתקופה קודמת נענות בחישוב וקטורי
+במקום בקריאה לדוח reports/sales של החנות.
+"""
+
+import asyncio
+import os
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils import get_logger
+from agents.async_woocommerce_agent import AsyncWooCommerceAgent
+
+logger = get_logger(__name__)
+
+ORDER_STATUSES = (
+    "pending", "processing", "on-hold", "completed", "cancelled", "refunded", "failed", "checkout-draft"
+)
+STATUS_CODES = {status: code for code, status in enumerate(ORDER_STATUSES)}
+UNKNOWN_STATUS = len(ORDER_STATUSES)
+
+# הסטטוסים שנספרים כמכירה, כמו בדוחות של WooCommerce
+PAID_STATUSES = ("processing", "on-hold", "completed")
+
+# גרסת מבנה קובץ נקודת הביקורת
+CHECKPOINT_VERSION = 1
+
+DateLike = Union[date, str]
+
+_ORDER_COLUMNS = {
+    "id": np.int64,
+    "created": "datetime64[s]",
+    "status": np.int8,
+    "total": np.float64,
+    "tax": np.float64,
+    "shipping": np.float64,
+    "discount": np.float64,
+    "refunds": np.float64,
+    "items": np.int32
+}
+_ITEM_COLUMNS = {
+    "order_id": np.int64,
+    "created": "datetime64[s]",
+    "status": np.int8,
+    "product_id": np.int64,
+    "quantity": np.int32,
+    "total": np.float64
+}
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _day(value: DateLike) -> np.datetime64:
+    return np.datetime64(value if isinstance(value, str) else value.isoformat(), "D")
+
+
+class _ColumnBuilder:
+    """
+    צבירת הזמנות לשורות פשוטות והמרה למערכים בסוף (בלי לשמור את ה-JSON המלא).
+    שורה אחת לכל הזמנה: מעבר על דפים שזזים בזמן הקריאה (הזמנה חדשה דוחפת את כולן דף קדימה)
+    יכול להחזיר את אותה הזמנה פעמיים, ונשמרת הגרסה העדכנית מביניהן
+    """
+
+    def __init__(self):
+        # מזהה הזמנה -> (תאריך שינוי, שורת ההזמנה, שורות הפריטים)
+        self._rows: Dict[int, Tuple[str, List[Any], List[List[Any]]]] = {}
+        self.product_names: Dict[int, str] = {}
+
+    def add(self, order: Dict[str, Any]) -> None:
+        modified = order.get("date_modified_gmt") or ""
+        previous = self._rows.get(order["id"])
+        if previous is not None and previous[0] > modified:
+            return
+        # date_created בשעון החנות - כך גבולות הימים זהים לאלה שבדוחות החנות
+        created = (order.get("date_created") or "1970-01-01T00:00:00")[:19]
+        status = STATUS_CODES.get(order.get("status"), UNKNOWN_STATUS)
+        line_items = order.get("line_items") or []
+        row = [
+            order["id"],
+            created,
+            status,
+            _to_float(order.get("total")),
+            _to_float(order.get("total_tax")),
+            _to_float(order.get("shipping_total")),
+            _to_float(order.get("discount_total")),
+            # החזרים מופיעים בהזמנה כסכומים שליליים
+            -sum(_to_float(refund.get("total")) for refund in order.get("refunds") or []),
+            sum(int(item.get("quantity") or 0) for item in line_items)
+        ]
+        item_rows = []
+        for item in line_items:
+            product_id = item.get("product_id") or 0
+            item_rows.append([
+                order["id"], created, status, product_id, int(item.get("quantity") or 0), _to_float(item.get("total"))
+            ])
+            if item.get("name"):
+                self.product_names[product_id] = item["name"]
+        self._rows[order["id"]] = (modified, row, item_rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def build(self) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        order_rows = [row for _, row, _ in self._rows.values()]
+        item_rows = [item for _, _, items in self._rows.values() for item in items]
+        order_columns = list(zip(*order_rows)) or [()] * len(_ORDER_COLUMNS)
+        item_columns = list(zip(*item_rows)) or [()] * len(_ITEM_COLUMNS)
+        return (
+            {
+                name: np.array(column, dtype=dtype)
+                for (name, dtype), column in zip(_ORDER_COLUMNS.items(), order_columns)
+            },
+            {
+                name: np.array(column, dtype=dtype)
+                for (name, dtype), column in zip(_ITEM_COLUMNS.items(), item_columns)
+            }
+        )
+
+
+class OrderAnalytics:
+    """
+    ניתוח מכירות על עותק עמודתי של ההזמנות.
+    - start: טעינת נקודת הביקורת מהדיסק (אם יש), והסנכרון הראשון ברקע; בלי נקודת ביקורת -
+      טעינה מלאה של כל ההזמנות ברקע, ועד שהיא מסתיימת ready=False והדוחות מגיעים מהחנות
+    - כל sync_interval שניות: רק הזמנות שהשתנו מאז (modified_after); הזמנה שהשתנתה מחליפה את הקודמת
+    - כל full_sync_interval שניות: טעינה מלאה מחדש
+    """
+
+    def __init__(
+        self,
+        store_agent: AsyncWooCommerceAgent,
+        checkpoint_path: Optional[str] = None,
+        sync_interval: float = 300,
+        full_sync_interval: float = 86400,
+        prefetch: int = 4
+    ):
+        """
+        Args:
+            store_agent: סוכן ה-WooCommerce שממנו נטענות ההזמנות
+            checkpoint_path: קובץ לשמירת העמודות ונקודת הביקורת (None = בזיכרון בלבד)
+            sync_interval: כל כמה שניות לסנכרן הזמנות שהשתנו
+            full_sync_interval: כל כמה שניות לטעון את כל ההזמנות מחדש (0 = רק בהפעלה)
+            prefetch: כמה דפים לבקש במקביל בזמן טעינה
+        """
+        self.store_agent = store_agent
+        self.checkpoint_path = checkpoint_path
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self.prefetch = prefetch
+
+        self.orders, self.items = _ColumnBuilder().build()
+        self.product_names: Dict[int, str] = {}
+        self._paid_codes = np.array([STATUS_CODES[status] for status in PAID_STATUSES], dtype=np.int8)
+
+        self.modified_after: Optional[str] = None
+        self.last_full_sync: float = 0.0
+        self.ready = False
+        # עדכונים (webhooks) שהגיעו בזמן שהסנכרון עובר על ההזמנות - מוחלים שוב אחריו
+        self._events_during_sync: Optional[List[Tuple[str, Any]]] = None
+        self._sync_lock = asyncio.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+        self.stats = {"full_syncs": 0, "incremental_syncs": 0, "updated": 0, "sync_errors": 0}
+
+    def __len__(self) -> int:
+        return len(self.orders["id"])
+
+    # --- חישובים ---
+
+    def _period(self, columns: Dict[str, np.ndarray], date_min: DateLike, date_max: DateLike) -> np.ndarray:
+        """מסכה של שורות מכירה בתקופה (כולל שני הקצוות)"""
+        created = columns["created"]
+        start = _day(date_min).astype("datetime64[s]")
+        end = (_day(date_max) + 1).astype("datetime64[s]")
+        return (created >= start) & (created < end) & np.isin(columns["status"], self._paid_codes)
+
+    def sales_report(self, date_min: DateLike, date_max: DateLike) -> Dict[str, Any]:
+        """
+        דוח מכירות לתקופה, באותם שדות כמו reports/sales
+
+        Args:
+            date_min: תאריך התחלה (כולל)
+            date_max: תאריך סיום (כולל)
+
+        Returns:
+            מילון עם total_sales (אחרי החזרים), net_sales (בלי מע"מ ומשלוח), total_orders,
+            total_items, total_tax, total_shipping, total_refunds, total_discount,
+            average_sales (ליום) ו-average_order_value
+        """
+        mask = self._period(self.orders, date_min, date_max)
+        orders = {name: column[mask] for name, column in self.orders.items() if name not in ("id", "created", "status")}
+        total_orders = int(mask.sum())
+        refunds = float(orders["refunds"].sum())
+        total_sales = float(orders["total"].sum()) - refunds
+        tax = float(orders["tax"].sum())
+        shipping = float(orders["shipping"].sum())
+        days = int((_day(date_max) - _day(date_min)).astype(int)) + 1
+        return {
+            "total_sales": round(total_sales, 2),
+            "net_sales": round(total_sales - tax - shipping, 2),
+            "total_orders": total_orders,
+            "total_items": int(orders["items"].sum()),
+            "total_tax": round(tax, 2),
+            "total_shipping": round(shipping, 2),
+            "total_refunds": round(refunds, 2),
+            "total_discount": round(float(orders["discount"].sum()), 2),
+            "average_sales": round(total_sales / max(days, 1), 2),
+            "average_order_value": round(total_sales / total_orders, 2) if total_orders else 0.0
+        }
+
+    def top_products(
+        self,
+        date_min: DateLike,
+        date_max: DateLike,
+        limit: int = 5,
+        by: str = "revenue"
+    ) -> List[Dict[str, Any]]:
+        """
+        המוצרים הנמכרים ביותר בתקופה
+
+        Args:
+            date_min: תאריך התחלה (כולל)
+            date_max: תאריך סיום (כולל)
+            limit: כמה מוצרים להחזיר
+            by: revenue (לפי הכנסה) או quantity (לפי כמות)
+
+        Returns:
+            רשימה של מילונים עם product_id, name, quantity ו-revenue
+        """
+        mask = self._period(self.items, date_min, date_max)
+        if not mask.any():
+            return []
+        product_ids, groups = np.unique(self.items["product_id"][mask], return_inverse=True)
+        quantity = np.bincount(groups, weights=self.items["quantity"][mask])
+        revenue = np.bincount(groups, weights=self.items["total"][mask])
+        ranking = np.argsort(-(revenue if by == "revenue" else quantity), kind="stable")[:limit]
+        return [
+            {
+                "product_id": int(product_ids[i]),
+                "name": self.product_names.get(int(product_ids[i]), ""),
+                "quantity": int(quantity[i]),
+                "revenue": round(float(revenue[i]), 2)
+            }
+            for i in ranking
+        ]
+
+    def revenue_by_day(self, date_min: DateLike, date_max: DateLike) -> List[Tuple[str, float]]:
+        """הכנסה (אחרי החזרים) לכל יום בתקופה, כולל ימים בלי מכירות"""
+        mask = self._period(self.orders, date_min, date_max)
+        start = _day(date_min)
+        days = int((_day(date_max) - start).astype(int)) + 1
+        offsets = (self.orders["created"][mask].astype("datetime64[D]") - start).astype(np.int64)
+        revenue = np.bincount(
+            offsets,
+            weights=self.orders["total"][mask] - self.orders["refunds"][mask],
+            minlength=days
+        )
+        return [(str(start + i), round(float(revenue[i]), 2)) for i in range(days)]
+
+    def compare_periods(self, date_min: DateLike, date_max: DateLike) -> Dict[str, Any]:
+        """
+        השוואה לתקופה הקודמת באותו אורך
+
+        Returns:
+            מילון עם current, previous ו-change (אחוז שינוי; None כשאין בסיס להשוואה)
+        """
+        start, end = _day(date_min), _day(date_max)
+        length = end - start + 1
+        current = self.sales_report(start.item(), end.item())
+        previous = self.sales_report((start - length).item(), (end - length).item())
+        change = {}
+        for key in ("total_sales", "total_orders", "average_order_value"):
+            change[key] = (
+                round((current[key] - previous[key]) / previous[key] * 100, 1) if previous[key] else None
+            )
+        return {"current": current, "previous": previous, "change": change}
+
+    # --- סנכרון ---
+
+    def _merge(self, builder: _ColumnBuilder) -> None:
+        """החלפת הזמנות שהשתנו בגרסה החדשה שלהן"""
+        orders, items = builder.build()
+        changed = orders["id"]
+        keep_orders = ~np.isin(self.orders["id"], changed)
+        keep_items = ~np.isin(self.items["order_id"], changed)
+        self.orders = {name: np.concatenate([self.orders[name][keep_orders], orders[name]]) for name in orders}
+        self.items = {name: np.concatenate([self.items[name][keep_items], items[name]]) for name in items}
+        self.product_names.update(builder.product_names)
+
+    def apply(self, order: Dict[str, Any]) -> None:
+        """
+        עדכון הזמנה בודדת (למשל מ-webhook) בלי לחכות לסנכרון
+
+        Args:
+            order: ההזמנה כפי שהוחזרה מה-API
+        """
+        if self._events_during_sync is not None:
+            self._events_during_sync.append(("apply", order))
+        builder = _ColumnBuilder()
+        builder.add(order)
+        self._merge(builder)
+        self.stats["updated"] += 1
+
+    def remove(self, order_id: int) -> None:
+        """הסרת הזמנה שנמחקה מהחנות"""
+        if self._events_during_sync is not None:
+            self._events_during_sync.append(("remove", order_id))
+        keep_orders = self.orders["id"] != order_id
+        keep_items = self.items["order_id"] != order_id
+        self.orders = {name: column[keep_orders] for name, column in self.orders.items()}
+        self.items = {name: column[keep_items] for name, column in self.items.items()}
+
+    def _replay(self, events: List[Tuple[str, Any]]) -> None:
+        """החלת העדכונים שהגיעו בזמן המעבר על ההזמנות על הנתונים החדשים, לפי הסדר"""
+        for kind, value in events:
+            if kind == "remove":
+                self.remove(value)
+            else:
+                self.apply(value)
+
+    async def _collect(self, modified_after: Optional[str]) -> Tuple[_ColumnBuilder, Optional[str]]:
+        builder = _ColumnBuilder()
+        latest = modified_after
+        async for order in self.store_agent.iter_orders(modified_after=modified_after, prefetch=self.prefetch):
+            builder.add(order)
+            modified = order.get("date_modified_gmt")
+            if modified and (latest is None or modified > latest):
+                latest = modified
+        return builder, latest
+
+    async def sync(self, full: bool = False) -> None:
+        """
+        סנכרון מול החנות
+
+        Args:
+            full: טעינה מלאה של כל ההזמנות במקום שינויים בלבד
+        """
+        async with self._sync_lock:
+            full = full or self.modified_after is None
+            started = time.monotonic()
+            # טעינה מלאה מחליפה את כל הנתונים, ומיזוג מחליף הזמנות בגרסה שנקראה בתחילת המעבר -
+            # בשני המקרים עדכון שהגיע באמצע היה נדרס בלי ההחלה החוזרת
+            self._events_during_sync = []
+            try:
+                builder, latest = await self._collect(None if full else self.modified_after)
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                logger.error(
+                    "שגיאה בסנכרון ההזמנות לניתוח",
+                    extra={"error_type": type(e).__name__, "error_message": str(e), "full": full}
+                )
+                return
+            finally:
+                events, self._events_during_sync = self._events_during_sync, None
+            if full:
+                self.orders, self.items = builder.build()
+                self.product_names = builder.product_names
+                self.last_full_sync = time.time()
+                self.stats["full_syncs"] += 1
+            else:
+                if len(builder):
+                    self._merge(builder)
+                self.stats["incremental_syncs"] += 1
+            self._replay(events)
+            self.stats["updated"] += len(builder)
+            self.modified_after = latest
+            self.ready = True
+            logger.info(
+                "ההזמנות לניתוח סונכרנו",
+                extra={
+                    "full": full,
+                    "orders_count": len(self),
+                    "changed": len(builder),
+                    "duration": round(time.monotonic() - started, 2)
+                }
+            )
+            await self._save_checkpoint()
+
+    def _full_sync_due(self) -> bool:
+        return self.full_sync_interval > 0 and time.time() - self.last_full_sync >= self.full_sync_interval
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await self.sync(full=self._full_sync_due())
+            await asyncio.sleep(self.sync_interval)
+
+    # --- נקודת ביקורת ---
+
+    def _read_checkpoint(self) -> Dict[str, np.ndarray]:
+        with np.load(self.checkpoint_path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    def _write_checkpoint(self, arrays: Dict[str, np.ndarray]) -> None:
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # קובץ זמני לכל תהליך והחלפה, כמו בנקודת הביקורת של הקטלוג
+        temp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, self.checkpoint_path)
+
+    async def _load_checkpoint(self) -> None:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            data = await asyncio.to_thread(self._read_checkpoint)
+            if int(data["version"]) != CHECKPOINT_VERSION:
+                return
+            orders = {name: data[f"orders.{name}"].astype(dtype) for name, dtype in _ORDER_COLUMNS.items()}
+            items = {name: data[f"items.{name}"].astype(dtype) for name, dtype in _ITEM_COLUMNS.items()}
+            product_names = dict(zip(data["product_ids"].tolist(), data["product_names"].tolist()))
+        except Exception as e:
+            logger.error(
+                "שגיאה בטעינת נקודת הביקורת של ההזמנות - תתבצע טעינה מלאה",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "path": self.checkpoint_path}
+            )
+            return
+        self.orders, self.items, self.product_names = orders, items, product_names
+        self.modified_after = str(data["modified_after"]) or None
+        self.last_full_sync = float(data["last_full_sync"])
+        self.ready = True
+        logger.info(
+            "ההזמנות לניתוח נטענו מנקודת הביקורת",
+            extra={"orders_count": len(self), "modified_after": self.modified_after}
+        )
+
+    async def _save_checkpoint(self) -> None:
+        if not self.checkpoint_path or not self.ready:
+            return
+        arrays = {f"orders.{name}": column for name, column in self.orders.items()}
+        arrays.update({f"items.{name}": column for name, column in self.items.items()})
+        arrays.update(
+            version=np.array(CHECKPOINT_VERSION),
+            modified_after=np.array(self.modified_after or ""),
+            last_full_sync=np.array(self.last_full_sync),
+            product_ids=np.array(list(self.product_names.keys()), dtype=np.int64),
+            product_names=np.array(list(self.product_names.values()), dtype=str)
+        )
+        try:
+            await asyncio.to_thread(self._write_checkpoint, arrays)
+        except Exception as e:
+            logger.error(
+                "שגיאה בשמירת נקודת הביקורת של ההזמנות",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "path": self.checkpoint_path}
+            )
+
+    async def start(self) -> None:
+        """טעינת נקודת הביקורת והפעלת הסנכרון ברקע"""
+        if self._sync_task is not None:
+            return
+        await self._load_checkpoint()
+        # גם הטעינה הראשונה רצה ברקע - הבוט עונה מיד, והנתב פונה לחנות עד ש-ready
+        self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def close(self) -> None:
+        """עצירת הסנכרון ברקע"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות המנוע"""
+        return {
+            **self.stats,
+            "orders_count": len(self),
+            "items_count": len(self.items["order_id"]),
+            "ready": self.ready,
+            "modified_after": self.modified_after
+        }
@@ -0,0 +1,290 @@
+"""
+ניתוב מהיר לשאלות שאפשר לענות עליהן ישירות מנתוני החנות.
+סטטוס הזמנה, דוח מכירות לתקופה ושאלות מלאי נענים מ-WooCommerce בתבנית קבועה,
+בלי קריאה למודל השפה. אם חסר פרמטר (מספר הזמנה, תקופה) השאלה ממשיכה למודל.
+"""
+
+import re
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils import get_logger
+from agents.task_type import TaskType
+from agents.async_woocommerce_agent import AsyncWooCommerceAgent, WooCommerceError
+from agents.catalog_mirror import CatalogMirror
+from agents.order_analytics import OrderAnalytics
+
+logger = get_logger(__name__)
+
+# "הזמנה 1234", "הזמנה מספר 1234", "הזמנה #1234", "#1234"
+_ORDER_ID = re.compile(r"(?:הזמנה|order)\s*(?:מספר|מס['׳]?)?\s*#?\s*(\d{1,10})|#(\d{1,10})", re.IGNORECASE)
+# "מק"ט ABC-12", "sku ABC-12"
+_SKU = re.compile(r"(?:מק[\"״'׳]?ט|sku)\s*:?\s*([A-Za-z0-9][A-Za-z0-9_\-\.]*)", re.IGNORECASE)
+_LAST_DAYS = re.compile(r"(\d{1,3})\s*(?:הימים|ימים)")
+_OUT_OF_STOCK_MARKERS = ["אזל", "חסר", "חסרים", "לא במלאי", "אין במלאי", "out of stock"]
+
+ORDER_STATUS_NAMES = {
+    "pending": "ממתינה לתשלום",
+    "processing": "בטיפול",
+    "on-hold": "בהמתנה",
+    "completed": "הושלמה",
+    "cancelled": "בוטלה",
+    "refunded": "הוחזרה",
+    "failed": "נכשלה",
+    "checkout-draft": "טיוטה"
+}
+
+# כמה מוצרים להציג ברשימה לפני הפניה לשאר
+MAX_LISTED_PRODUCTS = 10
+
+
+def extract_order_id(message: str) -> Optional[int]:
+    """מספר ההזמנה מתוך ההודעה, אם יש"""
+    match = _ORDER_ID.search(message)
+    if not match:
+        return None
+    return int(match.group(1) or match.group(2))
+
+
+def extract_period(message: str, today: Optional[date] = None) -> Optional[Tuple[date, date, str]]:
+    """
+    התקופה שההודעה שואלת עליה
+
+    Args:
+        message: הודעת המשתמש
+        today: התאריך של היום (לבדיקות)
+
+    Returns:
+        טאפל של (מתאריך, עד תאריך, תיאור התקופה), או None אם לא צוינה תקופה
+    """
+    today = today or date.today()
+    match = _LAST_DAYS.search(message)
+    if match and int(match.group(1)) > 0:
+        days = int(match.group(1))
+        return today - timedelta(days=days - 1), today, f"ב-{days} הימים האחרונים"
+    if "אתמול" in message:
+        yesterday = today - timedelta(days=1)
+        return yesterday, yesterday, "אתמול"
+    if "היום" in message:
+        return today, today, "היום"
+    if "חודש שעבר" in message or "חודש הקודם" in message:
+        last_month_end = today.replace(day=1) - timedelta(days=1)
+        return last_month_end.replace(day=1), last_month_end, "בחודש שעבר"
+    if "החודש" in message:
+        return today.replace(day=1), today, "החודש"
+    if "שבועיים" in message:
+        return today - timedelta(days=13), today, "בשבועיים האחרונים"
+    if "שבוע" in message:
+        return today - timedelta(days=6), today, "בשבוע האחרון"
+    if "השנה" in message:
+        return today.replace(month=1, day=1), today, "השנה"
+    return None
+
+
+def _money(value: Any, currency: str = "₪") -> str:
+    try:
+        return f"{currency}{float(value):,.2f}"
+    except (TypeError, ValueError):
+        return f"{currency}0.00"
+
+
+class TaskRouter:
+    """
+    מנתב מהיר לפי TaskType.
+    מחזיר תשובה מוכנה כשאפשר לענות ישירות מהחנות, או None כדי שהשאלה תגיע למודל.
+    """
+
+    def __init__(
+        self,
+        store_agent: AsyncWooCommerceAgent,
+        catalog_mirror: Optional[CatalogMirror] = None,
+        order_analytics: Optional[OrderAnalytics] = None
+    ):
+        """
+        Args:
+            store_agent: סוכן ה-WooCommerce שממנו נשלפים הנתונים
+            catalog_mirror: עותק מקומי של הקטלוג לשאלות מוצרים ומלאי (None = תמיד מהחנות)
+            order_analytics: מנוע ניתוח הזמנות מקומי לדוחות מכירות (None = דוח מהחנות)
+        """
+        self.store_agent = store_agent
+        self.catalog_mirror = catalog_mirror
+        self.order_analytics = order_analytics
+        self.stats: Dict[str, int] = {"answered": 0, "no_params": 0, "errors": 0, "store_errors": 0, "from_mirror": 0}
+
+    async def answer(self, message: str, task_type: TaskType) -> Optional[str]:
+        """
+        ניסיון לענות על ההודעה בלי מודל השפה
+
+        Args:
+            message: הודעת המשתמש
+            task_type: סוג המשימה שזוהה
+
+        Returns:
+            התשובה, או None אם צריך את המודל
+        """
+        handlers = {
+            TaskType.ORDER_STATUS: self._order_status,
+            TaskType.SALES_REPORT: self._sales_report,
+            TaskType.INVENTORY: self._inventory,
+            # שאלות מלאי מזכירות "מוצר" ולכן לעתים מזוהות כמידע על מוצר
+            TaskType.PRODUCT_INFO: self._inventory
+        }
+        handler = handlers.get(task_type)
+        if handler is None:
+            return None
+
+        try:
+            answer = await handler(message)
+        except WooCommerceError as e:
+            # החנות לא ענתה - המודל יענה בלי הנתונים במקום תשובה שגויה כמו "לא נמצא"
+            self.stats["store_errors"] += 1
+            logger.warning(
+                "החנות לא זמינה לניתוב המהיר - מעביר למודל",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "task_type": task_type.name}
+            )
+            return None
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(
+                "שגיאה בניתוב המהיר",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "task_type": task_type.name}
+            )
+            return None
+
+        self.stats["answered" if answer is not None else "no_params"] += 1
+        if answer is not None:
+            logger.info("נענה בניתוב המהיר, ללא מודל השפה", extra={"task_type": task_type.name})
+        return answer
+
+    async def _order_status(self, message: str) -> Optional[str]:
+        order_id = extract_order_id(message)
+        if order_id is None:
+            return None
+        order = await self.store_agent.get_order(order_id)
+        if not order:
+            return f"לא מצאתי בחנות הזמנה מספר {order_id}. כדאי לבדוק שהמספר נכון."
+        return self.render_order(order)
+
+    async def _sales_report(self, message: str) -> Optional[str]:
+        period = extract_period(message)
+        if period is None:
+            return None
+        date_min, date_max, label = period
+        if self.order_analytics is not None and self.order_analytics.ready:
+            analytics = self.order_analytics
+            self.stats["from_mirror"] += 1
+            return self.render_sales_report(
+                analytics.sales_report(date_min, date_max),
+                label,
+                change=analytics.compare_periods(date_min, date_max)["change"],
+                top_products=analytics.top_products(date_min, date_max, limit=3)
+            )
+        report = await self.store_agent.get_sales_report(date_min.isoformat(), date_max.isoformat())
+        if not report:
+            return None
+        return self.render_sales_report(report, label)
+
+    async def _inventory(self, message: str) -> Optional[str]:
+        mirror = self.catalog_mirror if self.catalog_mirror is not None and self.catalog_mirror.ready else None
+        sku_match = _SKU.search(message)
+        if sku_match:
+            sku = sku_match.group(1)
+            if mirror is not None:
+                product = mirror.get_by_sku(sku)
+                products = [product] if product else []
+                self.stats["from_mirror"] += 1
+            else:
+                products = await self.store_agent.get_products(per_page=1, sku=sku)
+            if not products:
+                return f"לא מצאתי בחנות מוצר עם מק\"ט {sku}."
+            return self.render_stock(products[0])
+        if any(marker in message for marker in _OUT_OF_STOCK_MARKERS):
+            if mirror is not None:
+                products = mirror.by_stock_status("outofstock", limit=MAX_LISTED_PRODUCTS + 1)
+                self.stats["from_mirror"] += 1
+            else:
+                products = await self.store_agent.get_products(
+                    per_page=MAX_LISTED_PRODUCTS + 1, stock_status="outofstock"
+                )
+            return self.render_out_of_stock(products)
+        return None
+
+    @staticmethod
+    def render_order(order: Dict[str, Any]) -> str:
+        """תשובה על סטטוס הזמנה"""
+        status = order.get("status", "")
+        lines = [
+            f"📦 הזמנה #{order.get('number') or order.get('id')}",
+            f"סטטוס: {ORDER_STATUS_NAMES.get(status, status)}",
+            f"תאריך: {str(order.get('date_created', ''))[:10]}",
+            f"סכום: {_money(order.get('total'), order.get('currency_symbol') or '₪')}"
+        ]
+        billing = order.get("billing") or {}
+        customer = f"{billing.get('first_name', '')} {billing.get('last_name', '')}".strip()
+        if customer:
+            lines.append(f"לקוח: {customer}")
+        items: List[Dict[str, Any]] = order.get("line_items") or []
+        if items:
+            lines.append("פריטים:")
+            lines.extend(f"• {item.get('name')} × {item.get('quantity')}" for item in items)
+        shipping = order.get("shipping_lines") or []
+        if shipping:
+            lines.append(f"משלוח: {shipping[0].get('method_title')}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def render_sales_report(
+        report: Dict[str, Any],
+        label: str,
+        change: Optional[Dict[str, Optional[float]]] = None,
+        top_products: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """תשובה על דוח מכירות לתקופה, עם השוואה לתקופה הקודמת ומוצרים מובילים אם יש"""
+        lines = [
+            f"📊 המכירות {label}:",
+            f"סה\"כ מכירות: {_money(report.get('total_sales'))}",
+            f"מכירות נטו: {_money(report.get('net_sales'))}",
+            f"הזמנות: {report.get('total_orders', 0)}",
+            f"פריטים שנמכרו: {report.get('total_items', 0)}",
+            f"החזרים: {_money(report.get('total_refunds'))}"
+        ]
+        if report.get("average_order_value") is not None:
+            lines.append(f"סל ממוצע: {_money(report['average_order_value'])}")
+        if change and change.get("total_sales") is not None:
+            lines.append(f"שינוי במכירות לעומת התקופה הקודמת: {change['total_sales']:+.1f}%")
+        if top_products:
+            lines.append("מוצרים מובילים:")
+            lines.extend(
+                f"• {product['name'] or product['product_id']} - {product['quantity']} יח', {_money(product['revenue'])}"
+                for product in top_products
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def render_stock(product: Dict[str, Any]) -> str:
+        """תשובה על מצב המלאי של מוצר"""
+        quantity = product.get("stock_quantity")
+        in_stock = product.get("stock_status") == "instock"
+        if quantity is not None:
+            stock = f"{quantity} יחידות במלאי"
+        else:
+            stock = "במלאי" if in_stock else "לא במלאי"
+        return "\n".join([
+            f"📦 {product.get('name')} (מק\"ט {product.get('sku')})",
+            f"מלאי: {stock}",
+            f"מחיר: {_money(product.get('price'))}"
+        ])
+
+    @staticmethod
+    def render_out_of_stock(products: List[Dict[str, Any]]) -> str:
+        """תשובה עם רשימת המוצרים שאזלו מהמלאי"""
+        if not products:
+            return "✅ אין כרגע מוצרים שאזלו מהמלאי."
+        lines = ["⚠️ מוצרים שאזלו מהמלאי:"]
+        lines.extend(
+            f"• {product.get('name')}" + (f" (מק\"ט {product['sku']})" if product.get("sku") else "")
+            for product in products[:MAX_LISTED_PRODUCTS]
+        )
+        if len(products) > MAX_LISTED_PRODUCTS:
+            lines.append("ועוד מוצרים נוספים - אפשר לראות את כולם בניהול המוצרים בחנות.")
+        return "\n".join(lines)
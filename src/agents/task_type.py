@@ -1,6 +1,8 @@
 from enum import Enum, auto
 from typing import Dict, List, Optional, Any
 
+from utils.keyword_matcher import KeywordMatcher
+
 class TaskType(Enum):
     """סוגי משימות אפשריים"""
     GENERAL_QUESTION = auto()  # שאלה כללית
@@ -26,62 +28,14 @@ class TaskType(Enum):
         Returns:
             TaskType: סוג המשימה המזוהה
         """
-        message_lower = message.lower()
-        
-        # מילות מפתח לכל סוג משימה
-        keywords = {
-            TaskType.PRODUCT_INFO: [
-                "מוצר", "פריט", "מחיר", "קטלוג", "מפרט", "תמונה", "תיאור",
-                "זמין", "במלאי", "וריאציות", "מידות", "צבעים"
-            ],
-            TaskType.ORDER_STATUS: [
-                "הזמנה", "משלוח", "סטטוס", "מעקב", "איסוף", "החזרה", "ביטול",
-                "מספר הזמנה", "תאריך", "כתובת", "אספקה", "שליח"
-            ],
-            TaskType.SALES_REPORT: [
-                "מכירות", "דוח", "הכנסות", "רווח", "סטטיסטיקה", "נתונים",
-                "מגמות", "ביצועים", "תקופה", "השוואה", "גרף", "אנליטיקס"
-            ],
-            TaskType.MARKETING: [
-                "שיווק", "פרסום", "קמפיין", "קידום", "מבצע", "הנחה",
-                "סושיאל", "פייסבוק", "אינסטגרם", "מייל", "ניוזלטר"
-            ],
-            TaskType.INVENTORY: [
-                "מלאי", "כמות", "הזמנה מספק", "מחסן", "ספירה", "מינימום",
-                "מקסימום", "התראה", "חוסר", "עודף", "תנועות"
-            ],
-            TaskType.CUSTOMER_SERVICE: [
-                "לקוח", "תלונה", "פנייה", "שירות", "תמיכה", "החזר",
-                "זיכוי", "שאלה", "בעיה", "עזרה", "צאט"
-            ],
-            TaskType.TECHNICAL: [
-                "תקלה", "באג", "שגיאה", "התקנה", "עדכון", "גיבוי",
-                "אבטחה", "הגדרות", "חיבור", "ממשק", "אפליקציה"
-            ],
-            TaskType.STORE_ADVICE: [
-                "המלצה", "ייעוץ", "שיפור", "אופטימיזציה", "אסטרטגיה",
-                "תכנון", "פיתוח", "גדילה", "מתחרים", "שוק"
-            ]
-        }
-        
         # בדיקת הקשר קודם אם קיים
         if context and 'last_task_type' in context:
             # אם ההודעה קצרה ונראית כהמשך שיחה
-            if len(message_lower.split()) <= 3 and not any(
-                any(kw in message_lower for kw in task_keywords)
-                for task_keywords in keywords.values()
-            ):
+            if len(message.split()) <= 3 and not _TASK_MATCHER.has_any(message):
                 return context['last_task_type']
         
-        # חיפוש מילות מפתח בהודעה
-        max_matches = 0
-        identified_task = TaskType.GENERAL_QUESTION
-        
-        for task_type, task_keywords in keywords.items():
-            matches = sum(1 for kw in task_keywords if kw in message_lower)
-            if matches > max_matches:
-                max_matches = matches
-                identified_task = task_type
+        # חיפוש מילות מפתח בהודעה - מעבר יחיד על הטקסט
+        identified_task, _ = _TASK_MATCHER.best_group(message, default=TaskType.GENERAL_QUESTION)
         
         return identified_task
 
@@ -114,4 +68,44 @@ class TaskType(Enum):
         if task_type in params_by_type:
             base_params.update(params_by_type[task_type])
 
-        return base_params 
\ No newline at end of file
+        return base_params
+
+
+# מילות מפתח לכל סוג משימה
+TASK_KEYWORDS: Dict[TaskType, List[str]] = {
+    TaskType.PRODUCT_INFO: [
+        "מוצר", "פריט", "מחיר", "קטלוג", "מפרט", "תמונה", "תיאור",
+        "זמין", "במלאי", "וריאציות", "מידות", "צבעים"
+    ],
+    TaskType.ORDER_STATUS: [
+        "הזמנה", "משלוח", "סטטוס", "מעקב", "איסוף", "החזרה", "ביטול",
+        "מספר הזמנה", "תאריך", "כתובת", "אספקה", "שליח"
+    ],
+    TaskType.SALES_REPORT: [
+        "מכירות", "דוח", "הכנסות", "רווח", "סטטיסטיקה", "נתונים",
+        "מגמות", "ביצועים", "תקופה", "השוואה", "גרף", "אנליטיקס"
+    ],
+    TaskType.MARKETING: [
+        "שיווק", "פרסום", "קמפיין", "קידום", "מבצע", "הנחה",
+        "סושיאל", "פייסבוק", "אינסטגרם", "מייל", "ניוזלטר"
+    ],
+    TaskType.INVENTORY: [
+        "מלאי", "כמות", "הזמנה מספק", "מחסן", "ספירה", "מינימום",
+        "מקסימום", "התראה", "חוסר", "עודף", "תנועות"
+    ],
+    TaskType.CUSTOMER_SERVICE: [
+        "לקוח", "תלונה", "פנייה", "שירות", "תמיכה", "החזר",
+        "זיכוי", "שאלה", "בעיה", "עזרה", "צאט"
+    ],
+    TaskType.TECHNICAL: [
+        "תקלה", "באג", "שגיאה", "התקנה", "עדכון", "גיבוי",
+        "אבטחה", "הגדרות", "חיבור", "ממשק", "אפליקציה"
+    ],
+    TaskType.STORE_ADVICE: [
+        "המלצה", "ייעוץ", "שיפור", "אופטימיזציה", "אסטרטגיה",
+        "תכנון", "פיתוח", "גדילה", "מתחרים", "שוק"
+    ]
+}
+
+# מזהה מילות המפתח מקומפל פעם אחת בטעינת המודול
+_TASK_MATCHER = KeywordMatcher(TASK_KEYWORDS)
@@ -31,7 +31,9 @@ class WooCommerceAgent:
     def get_products(self, 
                     page: int = 1, 
                     per_page: int = 10, 
-                    category: Optional[str] = None) -> List[Dict[str, Any]]:
+                    category: Optional[str] = None,
+                    stock_status: Optional[str] = None,
+                    sku: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Get products from the store.
         
@@ -39,6 +41,8 @@ class WooCommerceAgent:
             page: Page number
             per_page: Number of items per page
             category: Optional category filter
+            stock_status: Optional stock status filter (instock, outofstock, onbackorder)
+            sku: Optional SKU filter
         """
         try:
             params = {
@@ -47,6 +51,10 @@ class WooCommerceAgent:
             }
             if category:
                 params["category"] = category
+            if stock_status:
+                params["stock_status"] = stock_status
+            if sku:
+                params["sku"] = sku
 
             logger.info(
                 "מבקש רשימת מוצרים",
@@ -156,6 +164,46 @@ class WooCommerceAgent:
             )
             return []
 
+    def get_order(self, order_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a single order.
+        
+        Args:
+            order_id: The ID of the order
+        """
+        try:
+            logger.info("מבקש הזמנה", extra={"order_id": order_id})
+
+            response = self.wcapi.get(f"orders/{order_id}")
+            
+            if response.status_code == 200:
+                order = response.json()
+                logger.info(
+                    "התקבלה הזמנה בהצלחה",
+                    extra={"order_id": order_id, "status": order.get("status")}
+                )
+                return order
+            else:
+                logger.error(
+                    "שגיאה בקבלת הזמנה",
+                    extra={
+                        "order_id": order_id,
+                        "status_code": response.status_code,
+                        "response_text": response.text
+                    }
+                )
+                return None
+        except Exception as e:
+            logger.error(
+                "שגיאה בקבלת הזמנה",
+                extra={
+                    "order_id": order_id,
+                    "error_type": type(e).__name__,
+                    "error_message": str(e)
+                }
+            )
+            return None
+
     def update_product(self, 
                       product_id: int, 
                       data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -241,6 +289,9 @@ class WooCommerceAgent:
             
             if response.status_code == 200:
                 report = response.json()
+                # ה-API מחזיר רשימה עם רשומה אחת לתקופה המבוקשת
+                if isinstance(report, list):
+                    report = report[0] if report else {}
                 logger.info(
                     "התקבל דוח מכירות בהצלחה",
                     extra={
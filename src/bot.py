@@ -3,12 +3,15 @@ Telegram bot implementation for the Ultimate Store Manager.
 This module handles all Telegram-related functionality and message routing.
 """
 
+import time
 import logging
 import asyncio
-from typing import Dict, Optional
-from telegram import Update
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from telegram import Bot, Update
+from telegram.error import BadRequest, RetryAfter, TelegramError
 from telegram.ext import (
     Application,
+    BaseUpdateProcessor,
     CommandHandler,
     MessageHandler,
     filters,
@@ -16,18 +19,172 @@ from telegram.ext import (
 )
 
 from agents.orchestrator import OrchestratorAgent
+from store_webhooks import StoreWebhookServer
 from utils import get_logger
 from utils.constants import QuestionCategory, QuestionIntent
+from webhook_server import WebhookServer, serve_webhook
 
 # Configure logging
 logger = get_logger(__name__)
 
+# Telegram's maximum message length
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+
+class _ThrottledMessageEditor:
+    """Progressively edits a Telegram message, throttled to the edit rate limit."""
+
+    def __init__(self, bot: Bot, chat_id: int, message_id: int, min_interval: float):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.min_interval = min_interval
+        self._next_edit_at = 0.0
+        self._pending: Optional[asyncio.Task] = None
+        self.edits = 0
+
+    async def update(self, text: str) -> None:
+        """Schedule an edit with the latest partial text if the throttle allows it."""
+        if self._pending is not None and not self._pending.done():
+            return
+        if time.monotonic() < self._next_edit_at:
+            return
+        self._pending = asyncio.create_task(self._edit(text + " ▌"))
+
+    async def finish(self, text: str) -> bool:
+        """Wait for any in-flight edit and write the final text. Returns False if it could not."""
+        if self._pending is not None:
+            await self._pending
+        if self.edits == 0 or len(text) > TELEGRAM_MAX_MESSAGE_LENGTH:
+            return False
+        delay = self._next_edit_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return await self._edit(text)
+
+    async def _edit(self, text: str) -> bool:
+        self._next_edit_at = time.monotonic() + self.min_interval
+        try:
+            await self.bot.edit_message_text(
+                chat_id=self.chat_id,
+                message_id=self.message_id,
+                text=text[:TELEGRAM_MAX_MESSAGE_LENGTH]
+            )
+            self.edits += 1
+            return True
+        except RetryAfter as e:
+            self._next_edit_at = time.monotonic() + float(e.retry_after)
+            logger.warning(
+                "טלגרם הגביל את קצב עריכת ההודעות",
+                extra={"chat_id": self.chat_id, "retry_after": float(e.retry_after)}
+            )
+        except (BadRequest, TelegramError) as e:
+            # "message is not modified" ודומיו - לא קריטי בזמן הזרמה
+            logger.debug(
+                "עריכת הודעה נכשלה",
+                extra={"chat_id": self.chat_id, "error": str(e)}
+            )
+        return False
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates from different chats concurrently, and updates of the same chat in order.
+
+    Each chat has a FIFO lock, so a chat's next message starts only after the previous one is
+    answered. Only updates that hold their chat's lock count toward max_concurrent_updates;
+    updates waiting behind their own chat do not take a slot from other chats.
+    """
+
+    def __init__(self, max_concurrent_updates: int, max_pending_updates: int = 1000):
+        """
+        Args:
+            max_concurrent_updates: Updates processed at the same time across all chats
+            max_pending_updates: Updates accepted at once, including those waiting for their chat
+        """
+        super().__init__(max(max_pending_updates, max_concurrent_updates))
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # chat id -> [lock, number of updates using it]; removed when no update needs it
+        self._chat_locks: Dict[Hashable, List[Any]] = {}
+        # updates being processed or waiting for their chat / a slot
+        self.pending = 0
+
+    @staticmethod
+    def _chat_key(update: object) -> Optional[Hashable]:
+        if isinstance(update, Update) and update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        self.pending += 1
+        try:
+            await self._process_in_order(update, coroutine)
+        finally:
+            self.pending -= 1
+
+    async def _process_in_order(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._chat_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        entry = self._chat_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._slots:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
 class StoreManagerBot:
-    def __init__(self, token: str, orchestrator: OrchestratorAgent):
-        """Initialize the bot with the given token and orchestrator."""
+    def __init__(
+        self,
+        token: str,
+        orchestrator: OrchestratorAgent,
+        stream_responses: bool = False,
+        stream_edit_interval: float = 1.0,
+        concurrent_updates: int = 1,
+        store_webhook: Optional[StoreWebhookServer] = None
+    ):
+        """
+        Initialize the bot with the given token and orchestrator.
+        
+        Args:
+            token: Telegram bot token
+            orchestrator: The orchestrator that answers messages
+            stream_responses: Edit the placeholder message in place as the answer is generated
+            stream_edit_interval: Minimum seconds between edits of the same message
+            concurrent_updates: Chats answered in parallel (1 = one update at a time).
+                Messages within a chat are always answered in order.
+            store_webhook: Receiver for the store's webhooks, run alongside the bot
+        """
         self.token = token
         self.orchestrator = orchestrator
-        self.application = Application.builder().token(token).build()
+        self.store_webhook = store_webhook
+        self.stream_responses = stream_responses
+        self.stream_edit_interval = stream_edit_interval
+        builder = (
+            Application.builder()
+            .token(token)
+            .post_init(self._on_startup)
+            .post_shutdown(self._on_shutdown)
+        )
+        self._processor: Optional[ChatOrderedUpdateProcessor] = None
+        if concurrent_updates > 1:
+            self._processor = ChatOrderedUpdateProcessor(concurrent_updates)
+            builder = builder.concurrent_updates(self._processor)
+        self.application = builder.build()
         
         # Add handlers
         self.application.add_handler(CommandHandler("start", self.start))
@@ -39,6 +196,26 @@ class StoreManagerBot:
         
         logger.info("בוט אותחל בהצלחה")
 
+    @property
+    def pending_updates(self) -> int:
+        """Updates received but not answered yet (queued, waiting for their chat or in progress)."""
+        queued = self.application.update_queue.qsize()
+        return queued + (self._processor.pending if self._processor else 0)
+
+    async def _on_startup(self, application: Application) -> None:
+        """Open the orchestrator's connection pool and conversation store before polling starts."""
+        await self.orchestrator.start()
+        logger.info("מאגר החיבורים של האורקסטרטור מוכן")
+        if self.store_webhook is not None:
+            await self.store_webhook.start()
+
+    async def _on_shutdown(self, application: Application) -> None:
+        """Release the orchestrator's connection pool and flush conversation history when the bot stops."""
+        if self.store_webhook is not None:
+            await self.store_webhook.stop()
+        await self.orchestrator.close()
+        logger.info("מאגר החיבורים של האורקסטרטור נסגר")
+
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Send a welcome message when the command /start is issued."""
         user = update.effective_user
@@ -125,12 +302,35 @@ class StoreManagerBot:
             waiting_message = await update.message.reply_text("🤔 מעבד את הבקשה שלך... אנא המתן")
             logger.debug("נשלחה הודעת המתנה")
             
+            # הזרמת התשובה לתוך הודעת ההמתנה, אם מופעל
+            editor = None
+            if self.stream_responses:
+                editor = _ThrottledMessageEditor(
+                    bot=context.bot,
+                    chat_id=chat_id,
+                    message_id=waiting_message.message_id,
+                    min_interval=self.stream_edit_interval
+                )
+            
             # קבלת תשובה מהאורקסטרטור
             response = await self.orchestrator.handle_message(
                 message=message,
-                conversation_id=str(chat_id)
+                conversation_id=str(chat_id),
+                on_partial=editor.update if editor else None
             )
             
+            if editor and await editor.finish(response):
+                logger.info(
+                    "נשלחה תשובה בהזרמה",
+                    extra={
+                        "user_id": user.id,
+                        "chat_id": chat_id,
+                        "response_length": len(response),
+                        "edits": editor.edits
+                    }
+                )
+                return
+            
             # מחיקת הודעת ההמתנה
             try:
                 await context.bot.delete_message(
@@ -196,7 +396,64 @@ class StoreManagerBot:
             
             await update.effective_message.reply_text(error_message)
 
+    async def serve(self, next_update: Callable[[], Awaitable[Optional[dict]]]) -> None:
+        """
+        Process updates handed over by another process instead of polling Telegram.
+        
+        Args:
+            next_update: Returns the next update as a dict, or None to stop.
+                Updates still queued when it returns None are processed before shutdown.
+                A {"store_event": {"topic": ..., "payload": ...}} item is a store webhook
+                event, applied to the orchestrator's caches instead of being processed.
+        """
+        await self.application.initialize()
+        await self._on_startup(self.application)
+        await self.application.start()
+        try:
+            while (data := await next_update()) is not None:
+                if "store_event" in data:
+                    event = data["store_event"]
+                    self.orchestrator.apply_store_event(event["topic"], event["payload"])
+                    continue
+                await self.application.update_queue.put(Update.de_json(data, self.application.bot))
+        finally:
+            await self.application.stop()
+            await self._on_shutdown(self.application)
+            await self.application.shutdown()
+
     def run(self) -> None:
         """Start the bot."""
         logger.info("מתחיל להריץ את הבוט...")
-        self.application.run_polling(allowed_updates=Update.ALL_TYPES) 
\ No newline at end of file
+        self.application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+    def run_webhook(
+        self,
+        webhook_url: str,
+        url_path: str = "/telegram",
+        listen: str = "0.0.0.0",
+        port: int = 8443,
+        secret_token: Optional[str] = None,
+        max_pending_updates: int = 100
+    ) -> None:
+        """
+        Start the bot in webhook mode, receiving updates on an embedded HTTP server.
+        
+        Args:
+            webhook_url: Public URL registered with Telegram
+            url_path: Local path the server accepts updates on
+            listen: Interface to bind
+            port: Port to bind
+            secret_token: Secret Telegram sends with every update (recommended)
+            max_pending_updates: Unanswered updates above which new ones are refused for a retry
+        """
+        server = WebhookServer(
+            self.application,
+            pending_updates=lambda: self.pending_updates,
+            url_path=url_path,
+            listen=listen,
+            port=port,
+            secret_token=secret_token,
+            max_pending_updates=max_pending_updates
+        )
+        logger.info("מתחיל להריץ את הבוט במצב webhook...")
+        asyncio.run(serve_webhook(self.application, server, webhook_url)) 
\ No newline at end of file
@@ -4,12 +4,19 @@ Main entry point for the Ultimate Store Manager bot.
 
 import os
 import logging
+from typing import Any, Dict, Optional
 from dotenv import load_dotenv
 from pathlib import Path
+from urllib.parse import urlparse
 
 from bot import StoreManagerBot
 from agents.orchestrator import OrchestratorAgent
-from agents.woocommerce_agent import WooCommerceAgent
+from agents.async_woocommerce_agent import AsyncWooCommerceAgent
+from agents.catalog_mirror import CatalogMirror
+from agents.order_analytics import OrderAnalytics
+from store_webhooks import StoreWebhookServer
+from worker_pool import WorkerPool
+from utils.store_transport import StoreTransportPolicy
 
 # Configure logging
 logging.basicConfig(
@@ -18,6 +25,112 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def store_webhook_settings() -> Optional[Dict[str, Any]]:
+    """Settings of the store webhook receiver, or None when no webhook secret is configured."""
+    secret = os.getenv("WC_WEBHOOK_SECRET")
+    if not secret:
+        return None
+    return dict(
+        secret=secret,
+        url_path=os.getenv("WC_WEBHOOK_PATH", "/woocommerce"),
+        listen=os.getenv("WC_WEBHOOK_LISTEN", "0.0.0.0"),
+        port=int(os.getenv("WC_WEBHOOK_PORT", "8444"))
+    )
+
+
+def create_bot(store_webhook: Optional[Dict[str, Any]] = None) -> StoreManagerBot:
+    """Build the agents and the bot from environment variables.
+
+    Module-level so worker processes can build their own copy.
+    store_webhook: StoreWebhookServer settings to receive the store's webhooks in this process.
+    """
+    # Initialize WooCommerce agent
+    logger.info("מאתחל את סוכן ה-WooCommerce...")
+    wc_agent = AsyncWooCommerceAgent(
+        url=os.getenv("WC_STORE_URL"),
+        consumer_key=os.getenv("WC_CONSUMER_KEY"),
+        consumer_secret=os.getenv("WC_CONSUMER_SECRET"),
+        timeout=float(os.getenv("WC_TIMEOUT", "10")),
+        pool_size=int(os.getenv("WC_POOL_SIZE", "10")),
+        cache_ttls={
+            "products": float(os.getenv("WC_CACHE_TTL_PRODUCTS", "300")),
+            "orders": float(os.getenv("WC_CACHE_TTL_ORDERS", "30")),
+            "reports": float(os.getenv("WC_CACHE_TTL_REPORTS", "300"))
+        },
+        cache_max_bytes=int(float(os.getenv("WC_CACHE_MAX_MB", "16")) * 1024 * 1024),
+        transport=StoreTransportPolicy(
+            max_concurrency=int(os.getenv("WC_MAX_CONCURRENCY", "4")),
+            requests_per_minute=float(os.getenv("WC_REQUESTS_PER_MINUTE", "0")),
+            max_retries=int(os.getenv("WC_MAX_RETRIES", "3"))
+        )
+    )
+    logger.info("סוכן ה-WooCommerce אותחל בהצלחה")
+
+    catalog_mirror = None
+    if os.getenv("CATALOG_MIRROR", "false").lower() == "true":
+        catalog_mirror = CatalogMirror(
+            wc_agent,
+            checkpoint_path=os.getenv("CATALOG_CHECKPOINT_PATH") or None,
+            sync_interval=float(os.getenv("CATALOG_SYNC_INTERVAL", "300")),
+            full_sync_interval=float(os.getenv("CATALOG_FULL_SYNC_INTERVAL", "86400"))
+        )
+
+    order_analytics = None
+    if os.getenv("ORDER_ANALYTICS", "false").lower() == "true":
+        order_analytics = OrderAnalytics(
+            wc_agent,
+            checkpoint_path=os.getenv("ORDER_ANALYTICS_CHECKPOINT_PATH") or None,
+            sync_interval=float(os.getenv("ORDER_ANALYTICS_SYNC_INTERVAL", "300"))
+        )
+
+    # Initialize Orchestrator agent
+    logger.info("מאתחל את ה-Orchestrator...")
+    orchestrator = OrchestratorAgent(
+        deepseek_api_key=os.getenv("DEEPSEEK_API_KEY"),
+        speculative_clarification=os.getenv("SPECULATIVE_CLARIFICATION", "false").lower() == "true",
+        local_clarification=os.getenv("LOCAL_CLARIFICATION", "false").lower() == "true",
+        clarification_clear_threshold=float(os.getenv("CLARIFICATION_CLEAR_THRESHOLD", "0.35")),
+        clarification_ambiguous_threshold=float(os.getenv("CLARIFICATION_AMBIGUOUS_THRESHOLD", "0.75")),
+        coalesce_requests=os.getenv("COALESCE_LLM_REQUESTS", "true").lower() == "true",
+        semantic_cache=os.getenv("SEMANTIC_CACHE", "false").lower() == "true",
+        semantic_cache_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+        semantic_cache_size=int(os.getenv("SEMANTIC_CACHE_SIZE", "1000")),
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "10")),
+        requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")),
+        tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "0")),
+        hedge_requests=os.getenv("LLM_HEDGE_REQUESTS", "false").lower() == "true",
+        hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "2.0")),
+        circuit_failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5")),
+        circuit_reset_timeout=float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", "30")),
+        prompt_token_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "3000")),
+        max_turn_tokens=int(os.getenv("MAX_TURN_TOKENS", "300")),
+        conversation_max_turns=int(os.getenv("CONVERSATION_MAX_TURNS", "20")),
+        conversation_idle_ttl=float(os.getenv("CONVERSATION_IDLE_TTL", "86400")),
+        max_conversations=int(os.getenv("MAX_CONVERSATIONS", "10000")),
+        conversation_memory_bytes=int(float(os.getenv("CONVERSATION_MEMORY_MB", "64")) * 1024 * 1024),
+        conversation_db_path=os.getenv("CONVERSATION_DB_PATH") or None,
+        store_agent=wc_agent if os.getenv("FAST_PATH_ROUTING", "true").lower() == "true" else None,
+        catalog_mirror=catalog_mirror,
+        order_analytics=order_analytics
+    )
+    logger.info("ה-Orchestrator אותחל בהצלחה")
+
+    # Initialize the bot
+    logger.info("מאתחל את הבוט...")
+    bot = StoreManagerBot(
+        token=os.getenv("TELEGRAM_BOT_TOKEN"),
+        orchestrator=orchestrator,
+        stream_responses=os.getenv("STREAM_RESPONSES", "false").lower() == "true",
+        stream_edit_interval=float(os.getenv("STREAM_EDIT_INTERVAL", "1.0")),
+        concurrent_updates=int(os.getenv("CONCURRENT_UPDATES", "1")),
+        store_webhook=(
+            StoreWebhookServer(on_event=orchestrator.apply_store_event, **store_webhook) if store_webhook else None
+        )
+    )
+    logger.info("הבוט אותחל בהצלחה")
+    return bot
+
+
 def main():
     """Initialize and start the bot."""
     # Load environment variables from root directory
@@ -52,33 +165,41 @@ def main():
 
     try:
         logger.info("מתחיל אתחול הרכיבים...")
-        
-        # Initialize WooCommerce agent
-        logger.info("מאתחל את סוכן ה-WooCommerce...")
-        wc_agent = WooCommerceAgent(
-            url=os.getenv("WC_STORE_URL"),
-            consumer_key=os.getenv("WC_CONSUMER_KEY"),
-            consumer_secret=os.getenv("WC_CONSUMER_SECRET")
-        )
-        logger.info("סוכן ה-WooCommerce אותחל בהצלחה")
 
-        # Initialize Orchestrator agent
-        logger.info("מאתחל את ה-Orchestrator...")
-        orchestrator = OrchestratorAgent(
-            deepseek_api_key=os.getenv("DEEPSEEK_API_KEY")
+        # Webhook mode when a public URL is configured, polling otherwise
+        webhook_url = os.getenv("WEBHOOK_URL")
+        webhook_settings = dict(
+            # by default the path of the URL registered with Telegram; WEBHOOK_PATH only when a proxy rewrites it
+            url_path=os.getenv("WEBHOOK_PATH") or urlparse(webhook_url or "").path or "/",
+            listen=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+            port=int(os.getenv("WEBHOOK_PORT", "8443")),
+            secret_token=os.getenv("WEBHOOK_SECRET_TOKEN") or None,
+            max_pending_updates=int(os.getenv("WEBHOOK_MAX_PENDING_UPDATES", "100"))
         )
-        logger.info("ה-Orchestrator אותחל בהצלחה")
 
-        # Initialize and start the bot
-        logger.info("מאתחל את הבוט...")
-        bot = StoreManagerBot(
-            token=os.getenv("TELEGRAM_BOT_TOKEN"),
-            orchestrator=orchestrator
-        )
-        logger.info("הבוט אותחל בהצלחה")
+        workers = int(os.getenv("WORKER_PROCESSES", "1"))
+        if workers > 1:
+            # Every worker builds its own agents; this process only receives and routes updates
+            pool = WorkerPool(
+                token=os.getenv("TELEGRAM_BOT_TOKEN"),
+                bot_factory=create_bot,
+                workers=workers,
+                shutdown_timeout=float(os.getenv("WORKER_SHUTDOWN_TIMEOUT", "30")),
+                store_webhook=store_webhook_settings()
+            )
+            if webhook_url:
+                pool.run_webhook(webhook_url, **webhook_settings)
+            else:
+                pool.run()
+            return
+
+        bot = create_bot(store_webhook=store_webhook_settings())
 
         logger.info("מתחיל להריץ את הבוט...")
-        bot.run()
+        if webhook_url:
+            bot.run_webhook(webhook_url, **webhook_settings)
+        else:
+            bot.run()
         logger.info("הבוט הופעל בהצלחה")
 
     except Exception as e:
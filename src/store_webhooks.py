@@ -0,0 +1,132 @@
+"""
+Receiver for WooCommerce webhooks (product.updated, order.created, ...).
+The store pushes every change, so cached responses, the catalog mirror and the order
+analytics are refreshed as changes happen instead of waiting for the next poll.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+from typing import Any, Callable, Dict, Optional
+
+from aiohttp import web
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+SIGNATURE_HEADER = "X-WC-Webhook-Signature"
+TOPIC_HEADER = "X-WC-Webhook-Topic"
+DELIVERY_HEADER = "X-WC-Webhook-Delivery-ID"
+
+# Receives (topic, payload) for every verified event, e.g. ("product.updated", {...})
+StoreEventCallback = Callable[[str, Dict[str, Any]], None]
+
+
+def sign_payload(body: bytes, secret: str) -> str:
+    """The signature WooCommerce sends: base64 of the HMAC-SHA256 of the raw body."""
+    return base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest()).decode()
+
+
+def verify_signature(body: bytes, signature: str, secret: str) -> bool:
+    """Check a delivery's signature in constant time."""
+    return hmac.compare_digest(sign_payload(body, secret).encode(), signature.encode())
+
+
+class StoreWebhookServer:
+    """
+    Embedded HTTP endpoint for WooCommerce webhooks.
+
+    - Deliveries whose X-WC-Webhook-Signature does not match the secret are rejected (401)
+    - The ping WooCommerce sends when a webhook is created is acknowledged
+    - Every verified event is handed to on_event; a failure there is logged and still
+      acknowledged, since a redelivery would fail the same way
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        on_event: StoreEventCallback,
+        url_path: str = "/woocommerce",
+        listen: str = "0.0.0.0",
+        port: int = 8444
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            secret: The secret configured on the store's webhooks
+            on_event: Called with the topic and payload of every verified event
+            url_path: Path the store posts to
+            listen: Interface to bind
+            port: Port to bind
+        """
+        self.secret = secret
+        self.on_event = on_event
+        self.url_path = url_path
+        self.listen = listen
+        self.port = port
+        self.stats = {"events": 0, "pings": 0, "rejected_signature": 0, "invalid": 0, "errors": 0}
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_post(url_path, self._handle_delivery)
+
+    async def _handle_delivery(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        topic = request.headers.get(TOPIC_HEADER)
+
+        # the ping sent when a webhook is saved is a form body without a topic
+        if topic is None and body.startswith(b"webhook_id="):
+            self.stats["pings"] += 1
+            logger.info("התקבל ping מ-WooCommerce", extra={"body": body.decode(errors="replace")})
+            return web.Response(status=200)
+
+        signature = request.headers.get(SIGNATURE_HEADER, "")
+        if not verify_signature(body, signature, self.secret):
+            self.stats["rejected_signature"] += 1
+            logger.warning("התקבל webhook מהחנות עם חתימה שגויה", extra={"remote": request.remote, "topic": topic})
+            return web.Response(status=401)
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if not topic or not isinstance(payload, dict):
+            self.stats["invalid"] += 1
+            return web.Response(status=400)
+
+        try:
+            self.on_event(topic, payload)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(
+                "שגיאה בטיפול ב-webhook מהחנות",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "topic": topic}
+            )
+            return web.Response(status=200)
+
+        self.stats["events"] += 1
+        logger.info(
+            "התקבל webhook מהחנות",
+            extra={"topic": topic, "resource_id": payload.get("id"), "delivery_id": request.headers.get(DELIVERY_HEADER)}
+        )
+        return web.Response(status=200)
+
+    async def start(self) -> None:
+        """Start listening."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logger.info(
+            "שרת ה-webhooks של החנות מאזין",
+            extra={"listen": self.listen, "port": self.port, "path": self.url_path}
+        )
+
+    async def stop(self) -> None:
+        """Stop accepting deliveries."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            logger.info("שרת ה-webhooks של החנות נעצר", extra=self.stats)
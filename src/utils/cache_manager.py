@@ -3,6 +3,7 @@
 """
 
 import json
+from collections import OrderedDict
 from typing import Optional, Dict, Any, Tuple
 from datetime import datetime
 from cachetools import TTLCache
@@ -11,27 +12,52 @@ from utils import get_logger
 logger = get_logger(__name__)
 
 class SimpleCache:
-    def __init__(self, ttl: int = 3600, maxsize: int = 100):
+    def __init__(self, ttl: int = 3600, maxsize: int = 100, max_conversations: int = 10000):
         """
         אתחול מנהל המטמון
         
         Args:
             ttl: זמן תפוגה בשניות (ברירת מחדל: שעה)
             maxsize: כמות מקסימלית של פריטים במטמון לכל שיחה
+            max_conversations: כמות מקסימלית של שיחות עם מטמון (הישנות מפונות לפי LRU)
         """
         self.ttl = ttl
         self.maxsize = maxsize
-        # מילון של מטמונים לפי מזהה שיחה
-        self.conversation_caches: Dict[str, TTLCache] = {}
+        self.max_conversations = max_conversations
+        # מילון של מטמונים לפי מזהה שיחה, בסדר שימוש (האחרון בסוף)
+        self.conversation_caches: "OrderedDict[str, TTLCache]" = OrderedDict()
+        self.evictions = {"idle": 0, "lru": 0}
         
         logger.info(
             "מאתחל מערכת מטמון",
             extra={
                 "maxsize_per_conversation": maxsize,
+                "max_conversations": max_conversations,
                 "ttl": ttl
             }
         )
 
+    def _evict_conversations(self, keep: Optional[str] = None) -> None:
+        """
+        פינוי מטמונים של שיחות: שיחות שכל הרשומות שלהן פגו, ומעבר למגבלה - הפחות פעילות
+        
+        Args:
+            keep: שיחה שאין לפנות (זו שבשימוש כרגע)
+        """
+        # הסדר הוא לפי הכתיבה האחרונה, והשיחות שפגו נמצאות בתחילתו
+        while self.conversation_caches:
+            conversation_id, cache = next(iter(self.conversation_caches.items()))
+            if conversation_id == keep:
+                break
+            cache.expire()
+            if len(cache):
+                break
+            del self.conversation_caches[conversation_id]
+            self.evictions["idle"] += 1
+        while len(self.conversation_caches) > self.max_conversations:
+            self.conversation_caches.popitem(last=False)
+            self.evictions["lru"] += 1
+
     def _get_or_create_cache(self, conversation_id: str) -> TTLCache:
         """
         מקבל או יוצר מטמון חדש לשיחה ספציפית
@@ -45,7 +71,10 @@ class SimpleCache:
                 "נוצר מטמון חדש לשיחה",
                 extra={"conversation_id": conversation_id}
             )
-        return self.conversation_caches[conversation_id]
+        self.conversation_caches.move_to_end(conversation_id)
+        cache = self.conversation_caches[conversation_id]
+        self._evict_conversations(keep=conversation_id)
+        return cache
 
     def set(self, key: str, value: str, conversation_id: str, context: Optional[Dict[str, Any]] = None) -> None:
         """
@@ -169,8 +198,10 @@ class SimpleCache:
     def get_stats(self) -> Dict[str, Any]:
         """קבלת סטטיסטיקות על המטמון"""
         try:
+            self._evict_conversations()
             stats = {
                 "total_conversations": len(self.conversation_caches),
+                "evictions": dict(self.evictions),
                 "conversations": {
                     conv_id: {
                         "entries": len(cache),
@@ -0,0 +1,200 @@
+"""
+מסווג מקומי שמחליט האם שאלה דורשת הבהרה, בלי קריאה למודל השפה.
+המודל נשאל רק כשהמסווג לא בטוח בהחלטה.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from utils import get_logger
+from .constants import QuestionCategory
+from .keyword_matcher import CATEGORY_MATCHER
+from .embeddings_manager import EmbeddingsManager
+
+logger = get_logger(__name__)
+
+# שאלות שידוע שדורשות הבהרה (מתוך הדוגמאות בפרומפט ההבהרה)
+AMBIGUOUS_EXAMPLES = [
+    "איך ליצור קופון?",
+    "מה המכירות שלי?",
+    "מה המצב?",
+    "תעזור לי",
+    "יש בעיה",
+    "מה עם ההזמנה?",
+    "כמה זה?",
+    "תראה לי נתונים"
+]
+
+# שאלות הבהרה מוכנות לפי קטגוריה, לשימוש כשהמסווג בטוח שנדרשת הבהרה
+CLARIFICATION_QUESTIONS = {
+    QuestionCategory.SALES: "לאיזו תקופה או לאיזה מוצר/מבצע אתה מתכוון?",
+    QuestionCategory.MARKETING: "באיזה ערוץ שיווק מדובר, ומה המטרה - חשיפה, תנועה או מכירות?",
+    QuestionCategory.PRODUCTS: "על איזה מוצר או קטגוריית מוצרים מדובר?",
+    QuestionCategory.CUSTOMERS: "תוכל לפרט על איזו פנייה או הזמנה של לקוח מדובר?",
+    QuestionCategory.TECHNICAL: "מה בדיוק קורה, ובאיזה חלק של החנות (תוסף, תשלום, משלוח)?",
+    QuestionCategory.ANALYTICS: "לאיזו תקופה תרצה לראות את הנתונים, ולפי איזה מדד?",
+    QuestionCategory.GENERAL: "תוכל לפרט קצת יותר במה אתה צריך עזרה בניהול החנות?"
+}
+
+
+@dataclass
+class ClarificationDecision:
+    """תוצאת הסיווג המקומי"""
+    score: float                             # ציון עמימות בין 0 (ברור) ל-1 (עמום)
+    needs_clarification: Optional[bool]      # None - לא בטוח, יש לשאול את המודל
+    question: Optional[str] = None           # שאלת הבהרה מוכנה אם needs_clarification
+    category: str = QuestionCategory.GENERAL
+
+
+class ClarificationClassifier:
+    """
+    מסווג עמימות מקומי.
+    משלב שלושה סימנים: אורך ההודעה, כיסוי מילות מפתח מ-CATEGORY_KEYWORDS,
+    ודמיון ה-embedding של השאלה לשאלות נפוצות מול שאלות עמומות ידועות.
+    """
+
+    def __init__(
+        self,
+        embeddings_manager: EmbeddingsManager,
+        clear_threshold: float = 0.35,
+        ambiguous_threshold: float = 0.75
+    ):
+        """
+        אתחול המסווג
+
+        Args:
+            embeddings_manager: מנהל ה-embeddings המשותף
+            clear_threshold: ציון שמתחתיו השאלה נחשבת ברורה
+            ambiguous_threshold: ציון שמעליו השאלה נחשבת עמומה
+        """
+        if not 0 <= clear_threshold <= ambiguous_threshold <= 1:
+            raise ValueError("נדרש 0 <= clear_threshold <= ambiguous_threshold <= 1")
+
+        self.embeddings_manager = embeddings_manager
+        self.clear_threshold = clear_threshold
+        self.ambiguous_threshold = ambiguous_threshold
+        self._ambiguous_matrix: Optional[np.ndarray] = None
+        self._faq_matrix: Optional[np.ndarray] = None
+        self._faq_count = 0
+        self._lock = threading.Lock()
+        self.stats = {"clear": 0, "ambiguous": 0, "uncertain": 0}
+
+        logger.info(
+            "מסווג ההבהרה המקומי אותחל",
+            extra={
+                "clear_threshold": clear_threshold,
+                "ambiguous_threshold": ambiguous_threshold
+            }
+        )
+
+    @staticmethod
+    def _normalize_rows(vectors: List[List[float]]) -> np.ndarray:
+        """המרת רשימת וקטורים למטריצה מנורמלת (לדמיון קוסינוס במכפלה אחת)"""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _reference_matrices(self) -> tuple:
+        """מטריצות ה-embeddings של השאלות העמומות ושל ה-FAQ (נבנות פעם אחת)"""
+        with self._lock:
+            if self._ambiguous_matrix is None:
+                self._ambiguous_matrix = self._normalize_rows([
+                    self.embeddings_manager.get_query_embedding(example)
+                    for example in AMBIGUOUS_EXAMPLES
+                ])
+            faq_embeddings = [
+                entry.embedding for entry in self.embeddings_manager.faq_entries if entry.embedding
+            ]
+            if self._faq_matrix is None or len(faq_embeddings) != self._faq_count:
+                self._faq_count = len(faq_embeddings)
+                self._faq_matrix = self._normalize_rows(faq_embeddings) if faq_embeddings else None
+            return self._ambiguous_matrix, self._faq_matrix
+
+    @staticmethod
+    def _length_score(word_count: int) -> float:
+        """הודעות קצרות נוטות להיות עמומות"""
+        if word_count <= 2:
+            return 1.0
+        if word_count <= 4:
+            return 0.6
+        if word_count <= 7:
+            return 0.3
+        return 0.1
+
+    def score(self, message: str) -> ClarificationDecision:
+        """
+        חישוב ציון עמימות להודעה (ללא החלטה ועדכון סטטיסטיקות)
+
+        Args:
+            message: הודעת המשתמש
+
+        Returns:
+            ClarificationDecision עם הציון והקטגוריה
+        """
+        hits = CATEGORY_MATCHER.count_by_group(message)
+        total_hits = sum(hits.values())
+        category = (
+            max(CATEGORY_MATCHER.group_order, key=hits.get) if total_hits else QuestionCategory.GENERAL
+        )
+
+        length_score = self._length_score(len(message.split()))
+        keyword_score = 1.0 if total_hits == 0 else 0.5 if total_hits == 1 else 0.2
+
+        ambiguous_matrix, faq_matrix = self._reference_matrices()
+        query = self._normalize_rows([self.embeddings_manager.get_query_embedding(message)])[0]
+        ambiguous_similarity = float(np.max(ambiguous_matrix @ query))
+        faq_similarity = float(np.max(faq_matrix @ query)) if faq_matrix is not None else 0.0
+        embedding_score = min(1.0, max(0.0, 0.5 + ambiguous_similarity - faq_similarity))
+
+        score = 0.3 * length_score + 0.3 * keyword_score + 0.4 * embedding_score
+        return ClarificationDecision(score=score, needs_clarification=None, category=category)
+
+    def classify(self, message: str) -> ClarificationDecision:
+        """
+        סיווג הודעה: ברורה, עמומה או לא בטוח
+
+        Args:
+            message: הודעת המשתמש
+
+        Returns:
+            ClarificationDecision. כש-needs_clarification הוא None יש להתייעץ עם המודל
+        """
+        decision = self.score(message)
+        if decision.score < self.clear_threshold:
+            decision.needs_clarification = False
+            outcome = "clear"
+        elif decision.score >= self.ambiguous_threshold:
+            decision.needs_clarification = True
+            decision.question = CLARIFICATION_QUESTIONS.get(
+                decision.category, CLARIFICATION_QUESTIONS[QuestionCategory.GENERAL]
+            )
+            outcome = "ambiguous"
+        else:
+            outcome = "uncertain"
+        # הסיווג רץ בת'רדים במקביל לשיחות אחרות
+        with self._lock:
+            self.stats[outcome] += 1
+
+        logger.debug(
+            "סיווג הבהרה מקומי",
+            extra={
+                "message": message,
+                "score": round(decision.score, 3),
+                "category": decision.category,
+                "needs_clarification": decision.needs_clarification
+            }
+        )
+        return decision
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות החלטות - כמה הוחלטו מקומית וכמה הועברו למודל"""
+        total = sum(self.stats.values())
+        return {
+            **self.stats,
+            "total": total,
+            "local_decision_rate": (total - self.stats["uncertain"]) / total if total else 0
+        }
@@ -0,0 +1,108 @@
+"""
+בניית הקשר שיחה בתקציב טוקנים.
+במקום לקחת מספר קבוע של הודעות אחרונות בכל אורך שהוא, התקציב מחולק בין
+הוראות המערכת, קטע ה-FAQ והיסטוריית השיחה, וההיסטוריה נחתכת כך שתיכנס.
+"""
+
+from typing import List, Tuple
+
+from .tokens import estimate_tokens
+
+# תוספת משוערת לכל הודעה בהקשר (שם הדובר, הערת נושא, שורות ריקות)
+TURN_OVERHEAD_TOKENS = 8
+# הודעה שנחתכת לפחות מזה לא שווה את המקום
+MIN_TRUNCATED_TOKENS = 20
+TRUNCATION_MARK = "…"
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    קיצור טקסט כך שיכיל בערך max_tokens טוקנים
+
+    Args:
+        text: הטקסט
+        max_tokens: מספר טוקנים מקסימלי
+
+    Returns:
+        הטקסט המקורי אם הוא קצר מספיק, אחרת תחילתו עם סימן קיצור
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    # חיתוך לפי יחס התווים לטוקן בטקסט הזה, ואז ליד גבול מילה
+    cut = max(1, int(len(text) * max_tokens / tokens))
+    truncated = text[:cut]
+    space = truncated.rfind(" ")
+    if space > cut // 2:
+        truncated = truncated[:space]
+    return truncated.rstrip() + TRUNCATION_MARK
+
+
+class ContextBuilder:
+    """
+    מחלק תקציב טוקנים לפרומפט ובוחר אילו הודעות מההיסטוריה ייכנסו.
+    ההודעות החדשות נשמרות קודם; תשובות ארוכות של המערכת מקוצרות,
+    והודעות ישנות שלא נכנסות לתקציב נשמטות.
+    """
+
+    def __init__(
+        self,
+        prompt_token_budget: int = 3000,
+        max_turn_tokens: int = 300,
+        faq_max_share: float = 0.4,
+        max_turns: int = 20
+    ):
+        """
+        Args:
+            prompt_token_budget: תקציב טוקנים כולל לפרומפט (בלי התשובה)
+            max_turn_tokens: אורך מקסימלי להודעה בודדת מההיסטוריה
+            faq_max_share: החלק המקסימלי מהתקציב לקטע ה-FAQ
+            max_turns: מספר הודעות מקסימלי מההיסטוריה, גם אם יש מקום
+        """
+        self.prompt_token_budget = prompt_token_budget
+        self.max_turn_tokens = max_turn_tokens
+        self.faq_max_share = faq_max_share
+        self.max_turns = max_turns
+
+    def fit_faq(self, faq_answer: str) -> str:
+        """קיצור קטע ה-FAQ לחלק שהוקצה לו מהתקציב"""
+        return truncate_to_tokens(faq_answer, int(self.prompt_token_budget * self.faq_max_share))
+
+    def history_budget(self, *fixed_parts: str, fixed_tokens: int = 0) -> int:
+        """
+        כמה טוקנים נשארים להיסטוריה אחרי החלקים הקבועים
+
+        Args:
+            fixed_parts: טקסטים שייכנסו לפרומפט בכל מקרה (הודעת המשתמש, קטע FAQ)
+            fixed_tokens: טוקנים שכבר ידועים מראש (למשל הוראות המערכת)
+
+        Returns:
+            תקציב ההיסטוריה (לא שלילי)
+        """
+        used = fixed_tokens + sum(estimate_tokens(part) for part in fixed_parts)
+        return max(0, self.prompt_token_budget - used)
+
+    def select_turns(self, history: List[Tuple[str, str]], budget: int) -> List[Tuple[str, str]]:
+        """
+        בחירת הודעות מההיסטוריה שנכנסות בתקציב, מהחדשה לישנה
+
+        Args:
+            history: רשימת (דובר, תוכן) בסדר כרונולוגי
+            budget: תקציב טוקנים להיסטוריה
+
+        Returns:
+            ההודעות שנבחרו (חלקן מקוצרות), בסדר כרונולוגי
+        """
+        selected: List[Tuple[str, str]] = []
+        remaining = budget
+        for role, content in reversed(history[-self.max_turns:]):
+            available = min(self.max_turn_tokens, remaining - TURN_OVERHEAD_TOKENS)
+            if available < MIN_TRUNCATED_TOKENS:
+                break
+            content = truncate_to_tokens(content, available)
+            selected.append((role, content))
+            remaining -= estimate_tokens(content) + TURN_OVERHEAD_TOKENS
+        selected.reverse()
+        return selected
@@ -0,0 +1,215 @@
+"""
+מאגר שיחות קבוע על SQLite.
+הקריאות עוברות דרך שכבת הזיכרון של ConversationStore, והכתיבות מצטברות
+בתור ונכתבות ברקע באצוות, כך שהטיפול בהודעה לא מחכה לדיסק.
+"""
+
+import asyncio
+import os
+import sqlite3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils import get_logger
+from .conversation_store import ConversationStore
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversation_turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversation_turns_conversation
+    ON conversation_turns (conversation_id, id);
+"""
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    היסטוריית שיחות שנשמרת ב-SQLite (מצב WAL) ושורדת הפעלה מחדש.
+    - קריאה: מהזיכרון; שיחה שאינה בזיכרון נטענת מהמסד ב-load, מחוץ ללולאת האירועים
+    - כתיבה: append מעדכן את הזיכרון מיד ומוסיף לתור; משימת רקע כותבת את התור
+      כל flush_interval שניות בטרנזקציה אחת
+    - במסד נשמרות רק max_turns ההודעות האחרונות לכל שיחה
+
+    כל הגישה למסד עוברת ב-thread יחיד, כך שקריאה תמיד רואה את כל מה שנכתב לפניה.
+    כמה תהליכים יכולים לחלוק את אותו קובץ, אבל שכבת הזיכרון של כל תהליך
+    מתאימה רק לשיחות שהוא מטפל בהן.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 0.5,
+        max_pending: int = 10000,
+        **store_kwargs: Any
+    ):
+        """
+        Args:
+            path: נתיב קובץ המסד
+            flush_interval: כל כמה שניות לכתוב את התור למסד
+            max_pending: מספר הודעות מקסימלי שממתינות לכתיבה (מעבר לזה הישנות נזרקות)
+            store_kwargs: הגדרות שכבת הזיכרון (ראו ConversationStore)
+        """
+        super().__init__(**store_kwargs)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-db")
+        self._pending: List[Tuple[str, str, str]] = []
+        self._unflushed: Counter = Counter()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self.db_stats = {"loaded": 0, "written": 0, "batches": 0, "dropped": 0, "write_errors": 0}
+
+    async def _run(self, func, *args):
+        """הרצת פעולת מסד ב-thread של המסד"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA busy_timeout=5000")
+        db.executescript(_SCHEMA)
+        self._db = db
+
+    def _read(self, conversation_id: str) -> List[Tuple[str, str]]:
+        rows = self._db.execute(
+            "SELECT role, content FROM conversation_turns WHERE conversation_id = ? "
+            "ORDER BY id DESC LIMIT ?",
+            (conversation_id, self.max_turns)
+        ).fetchall()
+        rows.reverse()
+        return rows
+
+    def _write(self, batch: List[Tuple[str, str, str]]) -> None:
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO conversation_turns (conversation_id, role, content) VALUES (?, ?, ?)",
+                batch
+            )
+            # מחיקת הודעות ישנות מעבר ל-max_turns בשיחות שנכתבו עכשיו
+            self._db.executemany(
+                "DELETE FROM conversation_turns WHERE conversation_id = ? AND id <= ("
+                "SELECT id FROM conversation_turns WHERE conversation_id = ? "
+                "ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                [(conversation_id, conversation_id, self.max_turns) for conversation_id in {row[0] for row in batch}]
+            )
+
+    async def start(self) -> None:
+        """פתיחת המסד והפעלת משימת הכתיבה ברקע"""
+        if self._db is None:
+            await self._run(self._open)
+            logger.info("מסד השיחות נפתח", extra={"path": self.path})
+        if self._flush_task is None:
+            self._wakeup = asyncio.Event()
+            if self._pending:
+                self._wakeup.set()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """עצירת משימת הרקע, כתיבת מה שנשאר בתור וסגירת המסד"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._db is not None:
+            await self.flush()
+            await self._run(self._db.close)
+            self._db = None
+            logger.info("מסד השיחות נסגר", extra={"path": self.path, **self.db_stats})
+        self._executor.shutdown(wait=False)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # המתנה קצרה כדי לאסוף כמה הודעות לאצווה אחת
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """כתיבת כל ההודעות שבתור למסד"""
+        async with self._flush_lock:
+            if not self._pending or self._db is None:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                await self._run(self._write, batch)
+            except Exception as e:
+                # החזרה לתור לניסיון הבא, בלי לחרוג מהמגבלה
+                self._pending[:0] = batch
+                self._trim_pending()
+                self.db_stats["write_errors"] += 1
+                logger.error(
+                    "שגיאה בכתיבת היסטוריית שיחות למסד",
+                    extra={"error_type": type(e).__name__, "error_message": str(e), "rows": len(batch)}
+                )
+                return
+            self._unflushed.subtract(row[0] for row in batch)
+            self._unflushed += Counter()  # הסרת מונים שירדו לאפס
+            self.db_stats["written"] += len(batch)
+            self.db_stats["batches"] += 1
+
+    def _trim_pending(self) -> None:
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            dropped, self._pending = self._pending[:overflow], self._pending[overflow:]
+            self._unflushed.subtract(row[0] for row in dropped)
+            self._unflushed += Counter()
+            self.db_stats["dropped"] += overflow
+            logger.warning("תור הכתיבה למסד השיחות מלא - הודעות ישנות לא יישמרו", extra={"dropped": overflow})
+
+    def append(self, conversation_id: str, role: str, content: str) -> None:
+        """הוספת הודעה לזיכרון ולתור הכתיבה"""
+        super().append(conversation_id, role, content)
+        self._pending.append((conversation_id, role, content))
+        self._unflushed[conversation_id] += 1
+        self._trim_pending()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def load(self, conversation_id: str) -> None:
+        """
+        טעינת ההיסטוריה של שיחה מהמסד אם היא לא בזיכרון
+
+        Args:
+            conversation_id: מזהה השיחה
+        """
+        if self._db is None or conversation_id in self:
+            return
+        # שיחה שפונתה מהזיכרון לפני שנכתבה - קודם לכתוב, כדי שהקריאה תכלול הכל
+        if self._unflushed[conversation_id]:
+            await self.flush()
+        try:
+            turns = await self._run(self._read, conversation_id)
+        except Exception as e:
+            logger.error(
+                "שגיאה בטעינת היסטוריית שיחה מהמסד",
+                extra={"error_type": type(e).__name__, "error_message": str(e), "conversation_id": conversation_id}
+            )
+            return
+        if turns:
+            self._restore(conversation_id, turns)
+            self.db_stats["loaded"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות שכבת הזיכרון והמסד"""
+        return {
+            **super().get_stats(),
+            **self.db_stats,
+            "pending_writes": len(self._pending)
+        }
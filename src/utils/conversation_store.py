@@ -0,0 +1,213 @@
+"""
+מאגר מצב שיחות מוגבל בזיכרון.
+לכל שיחה נשמרות רק ההודעות האחרונות (חוצץ טבעתי), שיחות שלא היו פעילות
+זמן מה מפונות, ויש תקרת זיכרון כוללת לכל השיחות יחד.
+"""
+
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Tuple
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# תוספת משוערת בבייטים לכל הודעה שמורה (טאפל, מחרוזת הדובר)
+TURN_OVERHEAD_BYTES = 64
+
+
+class _Conversation:
+    """היסטוריה של שיחה אחת"""
+
+    __slots__ = ("turns", "size", "last_active")
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Tuple[str, str, int]] = deque(maxlen=max_turns)
+        self.size = 0
+        self.last_active = time.monotonic()
+
+
+class ConversationStore:
+    """
+    היסטוריית שיחות לפי מזהה שיחה.
+    - כל שיחה שומרת עד max_turns הודעות; הודעה חדשה דוחקת את הישנה ביותר
+    - שיחה שלא הייתה פעילה idle_ttl שניות מפונה
+    - מעבר ל-max_conversations או ל-max_bytes מפונות השיחות שהכי פחות היו בשימוש (LRU)
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 20,
+        idle_ttl: float = 86400,
+        max_conversations: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024
+    ):
+        """
+        Args:
+            max_turns: מספר הודעות מקסימלי לשיחה (משתמש ומערכת נספרים בנפרד)
+            idle_ttl: אחרי כמה שניות בלי פעילות שיחה מפונה (0 = בלי פינוי לפי זמן)
+            max_conversations: מספר שיחות מקסימלי בזיכרון
+            max_bytes: תקציב זיכרון משוער לכל ההיסטוריות יחד
+        """
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = {"idle": 0, "lru": 0, "memory": 0}
+        self.trimmed_turns = 0
+
+        logger.info(
+            "מאגר השיחות אותחל",
+            extra={
+                "max_turns": max_turns,
+                "idle_ttl": idle_ttl,
+                "max_conversations": max_conversations,
+                "max_bytes": max_bytes
+            }
+        )
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return self._get(conversation_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def _is_idle(self, conversation: _Conversation, now: float) -> bool:
+        return self.idle_ttl > 0 and now - conversation.last_active > self.idle_ttl
+
+    def _get(self, conversation_id: str):
+        """השיחה אם היא קיימת ולא פגה (ללא עדכון זמן הפעילות)"""
+        conversation = self._conversations.get(conversation_id)
+        if conversation is not None and self._is_idle(conversation, time.monotonic()):
+            self._evict(conversation_id, "idle")
+            return None
+        return conversation
+
+    def _evict(self, conversation_id: str, reason: str) -> None:
+        """הסרת שיחה ועדכון סטטיסטיקות"""
+        conversation = self._conversations.pop(conversation_id)
+        self.total_bytes -= conversation.size
+        self.evictions[reason] += 1
+        logger.debug(
+            "שיחה פונתה מהזיכרון",
+            extra={"conversation_id": conversation_id, "reason": reason, "turns": len(conversation.turns)}
+        )
+
+    def _evict_idle(self) -> None:
+        """פינוי שיחות לא פעילות - הן בתחילת הסדר, אז עוצרים בראשונה שפעילה"""
+        now = time.monotonic()
+        while self._conversations:
+            conversation_id, conversation = next(iter(self._conversations.items()))
+            if not self._is_idle(conversation, now):
+                break
+            self._evict(conversation_id, "idle")
+
+    def _enforce_limits(self, keep: str) -> None:
+        """פינוי לפי LRU עד שמספר השיחות והזיכרון בתוך המגבלות (לא את השיחה הנוכחית)"""
+        self._evict_idle()
+        while len(self._conversations) > self.max_conversations:
+            self._evict(next(iter(self._conversations)), "lru")
+        while self.total_bytes > self.max_bytes and len(self._conversations) > 1:
+            oldest = next(iter(self._conversations))
+            if oldest == keep:
+                break
+            self._evict(oldest, "memory")
+
+    def get_history(self, conversation_id: str) -> List[Tuple[str, str]]:
+        """
+        ההודעות השמורות של שיחה
+
+        Args:
+            conversation_id: מזהה השיחה
+
+        Returns:
+            רשימת (דובר, תוכן) בסדר כרונולוגי; ריקה אם אין היסטוריה
+        """
+        conversation = self._get(conversation_id)
+        if conversation is None:
+            return []
+        return [(role, content) for role, content, _ in conversation.turns]
+
+    def append(self, conversation_id: str, role: str, content: str) -> None:
+        """
+        הוספת הודעה לשיחה
+
+        Args:
+            conversation_id: מזהה השיחה
+            role: הדובר
+            content: תוכן ההודעה
+        """
+        conversation = self._get(conversation_id)
+        if conversation is None:
+            conversation = self._conversations[conversation_id] = _Conversation(self.max_turns)
+        if len(conversation.turns) == conversation.turns.maxlen:
+            conversation.size -= conversation.turns[0][2]
+            self.total_bytes -= conversation.turns[0][2]
+            self.trimmed_turns += 1
+
+        size = len(content.encode("utf-8")) + TURN_OVERHEAD_BYTES
+        conversation.turns.append((role, content, size))
+        conversation.size += size
+        self.total_bytes += size
+        conversation.last_active = time.monotonic()
+        self._conversations.move_to_end(conversation_id)
+        self._enforce_limits(keep=conversation_id)
+
+    def _restore(self, conversation_id: str, turns: List[Tuple[str, str]]) -> None:
+        """
+        טעינת היסטוריה קיימת לשיחה (למשל ממאגר קבוע).
+        אם בזמן הקריאה כבר נוספו לשיחה הודעות בזיכרון, ההיסטוריה השמורה נכנסת לפניהן
+
+        Args:
+            conversation_id: מזהה השיחה
+            turns: רשימת (דובר, תוכן) בסדר כרונולוגי
+        """
+        if not turns:
+            return
+        existing = self._conversations.pop(conversation_id, None)
+        if existing is not None:
+            current = [(role, content) for role, content, _ in existing.turns]
+            # הודעות שנוספו בזמן הקריאה אולי כבר נכתבו למאגר ונקראו - לא לספור אותן פעמיים
+            overlap = next(
+                (k for k in range(min(len(turns), len(current)), 0, -1) if turns[-k:] == current[:k]),
+                0
+            )
+            turns = turns[:len(turns) - overlap] + current
+            self.total_bytes -= existing.size
+        conversation = self._conversations[conversation_id] = _Conversation(self.max_turns)
+        if existing is not None:
+            conversation.last_active = existing.last_active
+        for role, content in turns[-self.max_turns:]:
+            size = len(content.encode("utf-8")) + TURN_OVERHEAD_BYTES
+            conversation.turns.append((role, content, size))
+            conversation.size += size
+            self.total_bytes += size
+        self._enforce_limits(keep=conversation_id)
+
+    async def load(self, conversation_id: str) -> None:
+        """הכנת ההיסטוריה של שיחה לפני הטיפול בהודעה (בזיכרון בלבד - אין מה לטעון)"""
+
+    async def start(self) -> None:
+        """אתחול המאגר (בזיכרון בלבד - אין מה לאתחל)"""
+
+    async def close(self) -> None:
+        """סגירת המאגר (בזיכרון בלבד - אין מה לסגור)"""
+
+    def clear_conversation(self, conversation_id: str) -> None:
+        """מחיקת ההיסטוריה של שיחה"""
+        conversation = self._conversations.pop(conversation_id, None)
+        if conversation is not None:
+            self.total_bytes -= conversation.size
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות מאגר השיחות"""
+        self._evict_idle()
+        return {
+            "conversations": len(self._conversations),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": dict(self.evictions),
+            "trimmed_turns": self.trimmed_turns
+        }
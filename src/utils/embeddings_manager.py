@@ -4,25 +4,32 @@
 """
 
 import logging
+import threading
 import numpy as np
 from typing import Dict, List, Tuple, Any, Optional
+from cachetools import LRUCache
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 from utils import get_logger
-from .constants import QuestionCategory, QuestionIntent, CATEGORY_KEYWORDS
+from .constants import QuestionCategory, QuestionIntent
+from .keyword_matcher import CATEGORY_MATCHER
 from .faq import FAQEntry, INITIAL_FAQS
 
 logger = get_logger(__name__)
 
 class EmbeddingsManager:
-    def __init__(self, threshold: float = 0.7):
+    def __init__(self, threshold: float = 0.7, query_cache_size: int = 512):
         """
         אתחול מנהל ה-embeddings
         
         Args:
             threshold: סף דמיון מינימלי לחיפוש שאלות דומות
+            query_cache_size: כמה embeddings של שאלות אחרונות לשמור בזיכרון
         """
         self.threshold = threshold
+        # embeddings של שאלות אחרונות, כדי שכמה רכיבים יחשבו כל שאלה פעם אחת
+        self._query_cache: LRUCache = LRUCache(maxsize=query_cache_size)
+        self._query_cache_lock = threading.Lock()
         self.model = SentenceTransformer('sentence-transformers/distiluse-base-multilingual-cased-v2')
         self.faq_entries: List[FAQEntry] = []
         self._initialize_faq()
@@ -59,17 +66,27 @@ class EmbeddingsManager:
         """חישוב embedding לטקסט"""
         return self.model.encode(text).tolist()
 
+    def get_query_embedding(self, query: str) -> List[float]:
+        """
+        קבלת embedding לשאלת משתמש, עם מטמון לשאלות אחרונות
+        
+        Args:
+            query: שאלת המשתמש
+            
+        Returns:
+            וקטור ה-embedding של השאלה
+        """
+        with self._query_cache_lock:
+            embedding = self._query_cache.get(query)
+        if embedding is None:
+            embedding = self._calculate_embedding(query)
+            with self._query_cache_lock:
+                self._query_cache[query] = embedding
+        return embedding
+
     def _identify_category(self, query: str) -> str:
         """זיהוי קטגוריה לפי מילות מפתח"""
-        query_lower = query.lower()
-        max_matches = 0
-        best_category = QuestionCategory.GENERAL
-
-        for category, keywords in CATEGORY_KEYWORDS.items():
-            matches = sum(1 for kw in keywords if kw in query_lower)
-            if matches > max_matches:
-                max_matches = matches
-                best_category = category
+        best_category, max_matches = CATEGORY_MATCHER.best_group(query, default=QuestionCategory.GENERAL)
 
         logger.debug(
             "זוהתה קטגוריה",
@@ -107,7 +124,7 @@ class EmbeddingsManager:
             category = self._identify_category(query)
             
             # חישוב embedding לשאלה
-            query_embedding = self._calculate_embedding(query)
+            query_embedding = self.get_query_embedding(query)
             
             # חישוב דמיון לכל השאלות
             similarities = []
@@ -0,0 +1,182 @@
+"""
+מטמון תשובות HTTP עם בקשות מותנות.
+תשובה טרייה מוחזרת בלי לפנות לשרת; תשובה שפג תוקפה נבדקת מול השרת עם
+If-None-Match / If-Modified-Since, ותשובת 304 מחדשת אותה בלי להוריד את התוכן שוב.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+CacheKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# תוספת משוערת בבייטים לכל רשומה (מפתח, כותרות, אובייקט)
+ENTRY_OVERHEAD_BYTES = 512
+
+
+@dataclass
+class CachedResponse:
+    """תשובה שמורה"""
+    status: int
+    headers: Mapping[str, str]
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+    size: int
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+def cache_key(endpoint: str, params: Optional[Dict[str, Any]]) -> CacheKey:
+    """מפתח לפי נקודת הקצה והפרמטרים, בלי תלות בסדר הפרמטרים"""
+    return endpoint, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+
+def resource_of(endpoint: str) -> str:
+    """סוג המשאב של נקודת קצה - "products/12" -> "products" """
+    return endpoint.split("/", 1)[0]
+
+
+class HTTPResponseCache:
+    """
+    מטמון תשובות GET לפי נקודת קצה ופרמטרים.
+    - זמן תפוגה לפי סוג משאב (products, orders, reports...); משאב בלי הגדרה לא נשמר
+    - תשובה שפג תוקפה ויש לה ETag או Last-Modified נשמרת לבדיקה מותנית
+    - תקרת בייטים כוללת; מעבר לה מפונות הרשומות שהכי פחות היו בשימוש (LRU)
+    - invalidate מוחק את כל הרשומות של משאב, למשל אחרי עדכון מוצר
+    """
+
+    def __init__(self, ttls: Dict[str, float], max_bytes: int = 16 * 1024 * 1024):
+        """
+        Args:
+            ttls: זמן תפוגה בשניות לכל סוג משאב
+            max_bytes: תקציב זיכרון משוער לכל התשובות יחד
+        """
+        self.ttls = ttls
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, CachedResponse]" = OrderedDict()
+        self.total_bytes = 0
+        # עולה בכל מחיקה - תשובה שהתחילה לפני מחיקה לא תישמר אחריה
+        self.generation = 0
+        self.stats = {
+            "hits": 0, "misses": 0, "revalidated": 0, "evictions": 0, "invalidations": 0
+        }
+
+    def cacheable(self, endpoint: str) -> bool:
+        """האם תשובות מנקודת הקצה נשמרות"""
+        return self.ttls.get(resource_of(endpoint), 0) > 0
+
+    def lookup(self, key: CacheKey) -> Tuple[Optional[CachedResponse], bool]:
+        """
+        חיפוש תשובה שמורה
+
+        Returns:
+            טאפל של (הרשומה אם יש, האם היא טרייה); רשומה שאינה טרייה מוחזרת רק אם אפשר לבדוק אותה מול השרת
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None, False
+        self._entries.move_to_end(key)
+        if time.monotonic() < entry.expires_at:
+            self.stats["hits"] += 1
+            return entry, True
+        if entry.revalidatable:
+            return entry, False
+        self._remove(key)
+        self.stats["misses"] += 1
+        return None, False
+
+    @staticmethod
+    def conditional_headers(entry: CachedResponse) -> Dict[str, str]:
+        """כותרות לבדיקה מותנית של רשומה שפג תוקפה"""
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def refresh(self, key: CacheKey, entry: CachedResponse) -> None:
+        """השרת אישר שהרשומה עדיין נכונה (304) - תוקף חדש"""
+        entry.expires_at = time.monotonic() + self.ttls.get(resource_of(key[0]), 0)
+        self.stats["revalidated"] += 1
+
+    def store(
+        self,
+        key: CacheKey,
+        status: int,
+        headers: Mapping[str, str],
+        text: str,
+        generation: Optional[int] = None
+    ) -> None:
+        """
+        שמירת תשובה
+
+        Args:
+            key: מפתח המטמון
+            status: קוד התשובה (רק 200 נשמר)
+            headers: כותרות התשובה
+            text: גוף התשובה
+            generation: ערך generation כשהבקשה נשלחה; אם בינתיים היתה מחיקה התשובה לא נשמרת
+        """
+        if generation is not None and generation != self.generation:
+            return
+        ttl = self.ttls.get(resource_of(key[0]), 0)
+        if status != 200 or ttl <= 0 or "no-store" in headers.get("Cache-Control", ""):
+            return
+        size = len(text.encode("utf-8")) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = CachedResponse(
+            status=status,
+            headers=headers,
+            text=text,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            expires_at=time.monotonic() + ttl,
+            size=size
+        )
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            oldest, _ = next(iter(self._entries.items()))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+
+    def invalidate(self, resources: Iterable[str]) -> int:
+        """
+        מחיקת כל הרשומות של סוגי משאבים
+
+        Args:
+            resources: סוגי המשאבים, למשל ["products"]
+
+        Returns:
+            מספר הרשומות שנמחקו
+        """
+        resources = set(resources)
+        self.generation += 1
+        keys = [key for key in self._entries if resource_of(key[0]) in resources]
+        for key in keys:
+            self._remove(key)
+        if keys:
+            self.stats["invalidations"] += 1
+            logger.debug("רשומות נמחקו מהמטמון", extra={"resources": sorted(resources), "entries": len(keys)})
+        return len(keys)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות המטמון"""
+        return {**self.stats, "entries": len(self._entries), "total_bytes": self.total_bytes}
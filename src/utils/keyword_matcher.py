@@ -0,0 +1,99 @@
+"""
+זיהוי מילות מפתח במעבר יחיד על הטקסט.
+כל מילות המפתח מכל הקבוצות מקומפלות לביטוי רגולרי אחד, כך שבמקום
+סריקת `kw in text` לכל מילה בכל קטגוריה, יש סריקה לינארית אחת להודעה.
+"""
+
+import re
+from typing import Dict, Hashable, Iterable, List, Mapping, Optional, Set, Tuple
+
+from .constants import CATEGORY_KEYWORDS
+
+
+class KeywordMatcher:
+    """
+    מזהה מילות מפתח מקובצות (למשל לפי קטגוריה).
+    ההתאמה היא כמו `kw in text.lower()` - גם חלק ממילה נחשב - וכל מילת מפתח
+    נספרת פעם אחת בלבד, גם אם היא מופיעה כמה פעמים.
+    """
+
+    def __init__(self, groups: Mapping[Hashable, Iterable[str]]):
+        """
+        Args:
+            groups: מיפוי מקבוצה לרשימת מילות המפתח שלה (הסדר קובע שבירת שוויון)
+        """
+        self.group_order: List[Hashable] = list(groups)
+        self._groups_of: Dict[str, List[Hashable]] = {}
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                self._groups_of.setdefault(keyword.lower(), []).append(group)
+
+        keywords = sorted(self._groups_of, key=len, reverse=True)
+        # lookahead מוצא התאמה בכל מיקום, גם כשהתאמות חופפות
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(kw) for kw in keywords) + "))")
+        # במיקום נתון נבחרת המילה הארוכה ביותר; מילים שהן תחילית שלה נוספות כאן
+        self._prefixes: Dict[str, List[str]] = {
+            kw: [other for other in keywords if other != kw and kw.startswith(other)]
+            for kw in keywords
+        }
+
+    def find(self, text: str) -> Set[str]:
+        """
+        כל מילות המפתח שמופיעות בטקסט
+
+        Args:
+            text: הטקסט לסריקה
+
+        Returns:
+            קבוצת מילות המפתח שנמצאו
+        """
+        found: Set[str] = set()
+        for match in self._pattern.finditer(text.lower()):
+            keyword = match.group(1)
+            if keyword not in found:
+                found.add(keyword)
+                found.update(self._prefixes[keyword])
+        return found
+
+    def has_any(self, text: str) -> bool:
+        """האם יש בטקסט מילת מפתח כלשהי"""
+        return self._pattern.search(text.lower()) is not None
+
+    def count_by_group(self, text: str) -> Dict[Hashable, int]:
+        """
+        מספר מילות המפתח השונות שנמצאו בכל קבוצה
+
+        Args:
+            text: הטקסט לסריקה
+
+        Returns:
+            מילון מקבוצה למספר ההתאמות (כולל קבוצות עם 0)
+        """
+        counts = {group: 0 for group in self.group_order}
+        for keyword in self.find(text):
+            for group in self._groups_of[keyword]:
+                counts[group] += 1
+        return counts
+
+    def best_group(self, text: str, default: Optional[Hashable] = None) -> Tuple[Optional[Hashable], int]:
+        """
+        הקבוצה עם הכי הרבה התאמות (בשוויון - הראשונה לפי הסדר)
+
+        Returns:
+            טאפל של (קבוצה, מספר התאמות); default ו-0 אם אין התאמות
+        """
+        counts = self.count_by_group(text)
+        best, best_count = default, 0
+        for group in self.group_order:
+            if counts[group] > best_count:
+                best, best_count = group, counts[group]
+        return best, best_count
+
+    def first_group(self, text: str) -> Optional[Hashable]:
+        """הקבוצה הראשונה לפי הסדר שיש לה התאמה כלשהי (None אם אין)"""
+        counts = self.count_by_group(text)
+        return next((group for group in self.group_order if counts[group]), None)
+
+
+# מזהה משותף לקטגוריות השאלות
+CATEGORY_MATCHER = KeywordMatcher(CATEGORY_KEYWORDS)
@@ -0,0 +1,225 @@
+"""
+מתזמן אסינכרוני לקריאות למודל השפה.
+מגביל מקביליות, שומר על קצב בקשות וטוקנים (token bucket), מעביר בקשות
+לפי עדיפות, ועוצר את כל השליחה כשהשרת מבקש להמתין (Retry-After).
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# עדיפויות - מספר קטן יותר עובר קודם
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class TokenBucket:
+    """דלי אסימונים - קצב מילוי קבוע עם קיבולת מקסימלית"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_minute: כמה יחידות מתמלאות בדקה (0 = ללא הגבלה)
+            capacity: קיבולת מקסימלית (ברירת מחדל: דקה אחת של מילוי)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """כמה שניות עד שיהיו מספיק אסימונים (0 אם כבר יש)"""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        # בקשה גדולה מהקיבולת מחכה לדלי מלא ולא לנצח
+        needed = min(amount, self.capacity) - self.tokens
+        return max(0.0, needed / self.rate)
+
+    def consume(self, amount: float) -> None:
+        """הורדת אסימונים (יכול לרדת מתחת לאפס - חוב שנפרע בהמשך)"""
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens -= amount
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    פענוח כותרת Retry-After - מספר שניות או תאריך HTTP
+
+    Returns:
+        מספר שניות להמתנה, או None אם הכותרת חסרה או לא תקינה
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """המתנה אקספוננציאלית עם jitter מלא, כדי שניסיונות חוזרים לא יסתנכרנו"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class LLMScheduler:
+    """
+    בקרת כניסה לקריאות למודל השפה.
+    כל קריאה מקבלת "משבצת" דרך slot(); משבצת ניתנת רק כשיש מקום במקביליות,
+    כשיש אסימונים בשני הדליים (בקשות וטוקנים) ואחרי שהמתנת Retry-After הסתיימה.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        stats_window: int = 1000
+    ):
+        """
+        אתחול המתזמן
+
+        Args:
+            max_concurrency: מספר קריאות מקסימלי שרצות במקביל
+            requests_per_minute: מגבלת בקשות לדקה (0 = ללא הגבלה)
+            tokens_per_minute: מגבלת טוקנים לדקה (0 = ללא הגבלה)
+            stats_window: כמה זמני המתנה אחרונים לשמור לסטטיסטיקות
+        """
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        self._queue: List[Tuple[int, int, asyncio.Future, int]] = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._wait_times: deque = deque(maxlen=stats_window)
+        self.stats = {"admitted": 0, "throttled": 0, "retry_after_pauses": 0}
+
+        logger.info(
+            "מתזמן קריאות LLM אותחל",
+            extra={
+                "max_concurrency": max_concurrency,
+                "requests_per_minute": requests_per_minute,
+                "tokens_per_minute": tokens_per_minute
+            }
+        )
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_NORMAL, tokens: int = 0) -> AsyncIterator[None]:
+        """
+        המתנה למשבצת והחזקתה לאורך הקריאה
+
+        Args:
+            priority: עדיפות הבקשה (PRIORITY_HIGH/NORMAL/LOW)
+            tokens: הערכת הטוקנים שהבקשה תצרוך
+        """
+        await self._acquire(priority, tokens)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._dispatch()
+
+    async def _acquire(self, priority: int, tokens: int) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queued_at = time.monotonic()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future, tokens))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # המשבצת ניתנה בדיוק כשהממתין בוטל - מחזירים אותה
+                self.in_flight -= 1
+                self._dispatch()
+            raise
+        wait = time.monotonic() - queued_at
+        self._wait_times.append(wait)
+        if wait > 0.05:
+            self.stats["throttled"] += 1
+
+    def _dispatch(self) -> None:
+        """מתן משבצות לממתינים בראש התור, כל עוד המגבלות מאפשרות"""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._queue and self.in_flight < self.max_concurrency:
+            priority, _, future, tokens = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+
+            delay = max(
+                self._paused_until - time.monotonic(),
+                self.request_bucket.time_until(1),
+                self.token_bucket.time_until(tokens)
+            )
+            if delay > 0:
+                self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+
+            heapq.heappop(self._queue)
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(tokens)
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            future.set_result(None)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """תיקון דלי הטוקנים לפי השימוש בפועל שהשרת דיווח"""
+        self.token_bucket.consume(actual_tokens - estimated_tokens)
+
+    def pause(self, seconds: float) -> None:
+        """עצירת כל השליחה למשך זמן (בעקבות Retry-After מהשרת)"""
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self._paused_until = until
+            self.stats["retry_after_pauses"] += 1
+            logger.warning("השליחה למודל נעצרה לפי בקשת השרת", extra={"seconds": seconds})
+
+    @property
+    def queue_depth(self) -> int:
+        """כמה בקשות ממתינות כרגע למשבצת"""
+        return sum(1 for _, _, future, _ in self._queue if not future.done())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות תור והמתנה"""
+        waits = sorted(self._wait_times)
+        return {
+            **self.stats,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "avg_wait_time": sum(waits) / len(waits) if waits else 0,
+            "p95_wait_time": waits[int(len(waits) * 0.95)] if waits else 0,
+            "max_wait_time": waits[-1] if waits else 0
+        }
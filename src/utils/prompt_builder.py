@@ -0,0 +1,150 @@
+"""
+הרכבת פרומפטים עם קידומת יציבה.
+ההוראות הקבועות נשלחות כהודעת מערכת ראשונה שזהה בייט-לבייט בכל קריאה,
+והחלקים המשתנים (מידע מה-FAQ, הקשר השיחה) מגיעים רק אחריה.
+כך הספק יכול לשמור את הקידומת במטמון (context caching) ולחסוך זמן ועלות.
+"""
+
+from string import Template
+from typing import Dict, List
+
+from .tokens import estimate_tokens
+
+# הוראות קבועות לשאלה כללית
+GENERAL_INSTRUCTIONS = """אתה עוזר מקצועי לניהול חנות אי-קומרס המתמחה ב-WooCommerce.
+תפקידך לסייע למנהלי חנויות בכל הקשור לניהול החנות שלהם.
+
+כללי מענה חשובים:
+1. תמיד תן תשובות מעשיות וברורות
+2. אם השאלה לא ברורה, שאל שאלת הבהרה ספציפית
+3. אם השאלה קצרה, הבן אותה מתוך ההקשר של השיחה
+4. תמיד התייחס לנושא האחרון שדובר עליו אם אין נושא חדש
+5. הצע דוגמאות מעשיות ומספרים
+
+תחומי המומחיות שלך:
+🛍️ ניהול מוצרים והמלאי
+💰 מחירים וקופונים
+📊 ניתוח נתונים ודוחות
+🚚 משלוחים והזמנות
+👥 שירות לקוחות
+📱 שיווק ופרסום
+
+זכור:
+- אתה מומחה לניהול חנות, עליך לתת תשובות מקצועיות ומעשיות
+- אם המשתמש מבקש מידע נוסף או הרחבה, התייחס לנושא האחרון שדובר עליו
+- תמיד הצע דרכים יצירתיות ומעשיות ליישום
+- אם אתה לא בטוח במשהו, שאל שאלת הבהרה"""
+
+# הוראות קבועות לתשובה שמבוססת על שאלה נפוצה
+FAQ_INSTRUCTIONS = """אתה מומחה מקצועי לניהול חנויות אונליין, עם התמחות ספציפית ב-WooCommerce.
+תפקידך לספק מידע מדויק ופרקטי בנושאי ניהול חנות.
+
+תקבל מידע רלוונטי מה-FAQ שלנו בנושא השאלה ואת הקשר השיחה.
+בהתבסס על המידע הזה, אנא:
+1. התאם את התשובה להקשר הספציפי של השאלה
+2. הוסף דוגמאות קונקרטיות ומספרים במידת האפשר
+3. הצע צעדים מעשיים ליישום
+4. שלב טיפים מקצועיים רלוונטיים
+5. הצע שאלות המשך אם יש צורך בהבהרות
+
+חשוב:
+- התמקד אך ורק בניהול החנות
+- תן תשובות מעשיות שאפשר ליישם מיד
+- השתמש במונחים מקצועיים אך הסבר אותם
+- הצע תמיד את העזרה שלך להמשך"""
+
+# הוראות קבועות לבדיקת הצורך בהבהרה
+CLARIFICATION_INSTRUCTIONS = """בדוק האם השאלה דורשת הבהרה נוספת כדי לתת תשובה מדויקת ומועילה.
+אם כן, החזר שאלת הבהרה.
+אם לא, החזר "לא".
+
+דוגמאות:
+1. שאלה: "איך ליצור קופון?"
+   תשובה: "האם הקופון מיועד למוצר ספציפי או לכל החנות?"
+
+2. שאלה: "מה המכירות שלי?"
+   תשובה: "לאיזו תקופה תרצה לראות את נתוני המכירות?"
+
+3. שאלה: "איך להוסיף מוצר חדש?"
+   תשובה: "לא"
+"""
+
+# תבניות לחלקים המשתנים - מקומפלות פעם אחת בטעינת המודול
+_HISTORY_TEMPLATE = Template("היסטוריית השיחה:\n$context")
+_FAQ_TEMPLATE = Template("להלן מידע רלוונטי מה-FAQ שלנו בנושא השאלה:\n$faq_answer")
+_CLARIFICATION_TEMPLATE = Template("שאלת המשתמש: $message")
+
+
+class PromptBuilder:
+    """
+    בונה רשימות הודעות לשליחה למודל.
+    הודעות המערכת הקבועות נבנות פעם אחת ומשותפות לכל הקריאות.
+    """
+
+    def __init__(self):
+        self._general_prefix = {"role": "system", "content": GENERAL_INSTRUCTIONS}
+        self._faq_prefix = {"role": "system", "content": FAQ_INSTRUCTIONS}
+        self._clarification_prefix = {"role": "system", "content": CLARIFICATION_INSTRUCTIONS}
+        # גודל הקידומות בטוקנים, לחלוקת תקציב הפרומפט
+        self.general_prefix_tokens = estimate_tokens(GENERAL_INSTRUCTIONS)
+        self.faq_prefix_tokens = estimate_tokens(FAQ_INSTRUCTIONS)
+
+    @staticmethod
+    def _dynamic(sections: List[str]) -> List[Dict[str, str]]:
+        """הודעת מערכת שנייה עם החלקים המשתנים (רק אם יש כאלה)"""
+        content = "\n\n".join(section for section in sections if section)
+        return [{"role": "system", "content": content}] if content else []
+
+    def build_general(self, user_message: str, context: str = "") -> List[Dict[str, str]]:
+        """
+        הודעות לשאלה כללית
+
+        Args:
+            user_message: הודעת המשתמש
+            context: הקשר השיחה (אופציונלי)
+
+        Returns:
+            רשימת הודעות: קידומת קבועה, הקשר, הודעת המשתמש
+        """
+        sections = [_HISTORY_TEMPLATE.substitute(context=context)] if context else []
+        return [
+            self._general_prefix,
+            *self._dynamic(sections),
+            {"role": "user", "content": user_message}
+        ]
+
+    def build_faq(self, user_message: str, faq_answer: str, context: str = "") -> List[Dict[str, str]]:
+        """
+        הודעות לתשובה שמבוססת על שאלה נפוצה
+
+        Args:
+            user_message: הודעת המשתמש
+            faq_answer: התשובה מה-FAQ
+            context: הקשר השיחה (אופציונלי)
+
+        Returns:
+            רשימת הודעות: קידומת קבועה, מידע FAQ והקשר, הודעת המשתמש
+        """
+        sections = [_FAQ_TEMPLATE.substitute(faq_answer=faq_answer)]
+        if context:
+            sections.append(_HISTORY_TEMPLATE.substitute(context=context))
+        return [
+            self._faq_prefix,
+            *self._dynamic(sections),
+            {"role": "user", "content": user_message}
+        ]
+
+    def build_clarification(self, message: str) -> List[Dict[str, str]]:
+        """
+        הודעות לבדיקת הצורך בהבהרה
+
+        Args:
+            message: הודעת המשתמש
+
+        Returns:
+            רשימת הודעות: קידומת קבועה והודעת המשתמש
+        """
+        return [
+            self._clarification_prefix,
+            {"role": "user", "content": _CLARIFICATION_TEMPLATE.substitute(message=message)}
+        ]
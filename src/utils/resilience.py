@@ -0,0 +1,133 @@
+"""
+כלי עמידות לקריאות לשירותים חיצוניים:
+- מפסק (circuit breaker) שמפסיק לשלוח בקשות אחרי רצף כשלונות
+- מעקב זמני תגובה לחישוב סף לבקשות מגודרות (hedged requests)
+"""
+
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """המפסק פתוח - הבקשה נדחתה בלי להישלח"""
+
+
+class CircuitBreaker:
+    """
+    מפסק עם שלושה מצבים:
+    - closed: בקשות עוברות כרגיל
+    - open: אחרי failure_threshold כשלונות רצופים; בקשות נדחות מיד
+    - half_open: אחרי reset_timeout עוברת בקשת ניסיון אחת; הצלחה סוגרת, כשלון פותח מחדש
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            name: שם השירות (ללוגים)
+            failure_threshold: כמה כשלונות רצופים פותחים את המפסק
+            reset_timeout: כמה שניות להמתין לפני בקשת ניסיון
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_started_at: Optional[float] = None
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow_request(self) -> bool:
+        """האם מותר לשלוח בקשה עכשיו"""
+        now = time.monotonic()
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if now - self._opened_at < self.reset_timeout:
+                self.stats["rejected"] += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._trial_started_at = None
+        # half_open - בקשת ניסיון אחת בכל פעם (ניסיון שנתקע משוחרר אחרי reset_timeout)
+        if self._trial_started_at is not None and now - self._trial_started_at < self.reset_timeout:
+            self.stats["rejected"] += 1
+            return False
+        self._trial_started_at = now
+        return True
+
+    def record_success(self) -> None:
+        """רישום הצלחה - סוגר את המפסק"""
+        if self.state != self.CLOSED:
+            logger.info("המפסק נסגר - השירות חזר לפעול", extra={"service": self.name})
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_started_at = None
+
+    def record_failure(self) -> None:
+        """רישום כשלון - פותח את המפסק אחרי רצף כשלונות או כשלון בבקשת ניסיון"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.stats["opened"] += 1
+                logger.warning(
+                    "המפסק נפתח - בקשות לשירות יידחו זמנית",
+                    extra={
+                        "service": self.name,
+                        "consecutive_failures": self.consecutive_failures,
+                        "reset_timeout": self.reset_timeout
+                    }
+                )
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_started_at = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות מפסק"""
+        return {
+            **self.stats,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures
+        }
+
+
+class LatencyTracker:
+    """
+    מעקב אחרי זמני תגובה אחרונים.
+    מחשב את סף הגידור - האחוזון ה-95 - שאחריו כדאי לשלוח בקשה כפולה.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20, min_delay: float = 1.0):
+        """
+        Args:
+            window: כמה זמנים אחרונים לשמור
+            min_samples: כמה דגימות נדרשות לפני שמתחילים לגדר
+            min_delay: סף מינימלי בשניות
+        """
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        """רישום זמן תגובה"""
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """אחוזון מהדגימות האחרונות (None אם אין דגימות)"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def hedge_delay(self) -> Optional[float]:
+        """אחרי כמה שניות לשלוח בקשה כפולה (None אם אין מספיק נתונים)"""
+        if len(self._samples) < self.min_samples:
+            return None
+        return max(self.min_delay, self.percentile(0.95))
@@ -0,0 +1,196 @@
+"""
+מטמון תשובות סמנטי משותף לכל השיחות.
+שאלה שכבר נענתה - גם בשיחה אחרת וגם בניסוח קצת שונה - מקבלת את התשובה השמורה,
+לפי דמיון embeddings מעל סף.
+"""
+
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from utils import get_logger
+from .keyword_matcher import CATEGORY_MATCHER
+from .embeddings_manager import EmbeddingsManager
+
+logger = get_logger(__name__)
+
+# מילים שמרמזות שההודעה מתייחסת למשהו שנאמר קודם בשיחה
+FOLLOW_UP_MARKERS = [
+    "זה", "זאת", "אותו", "אותה", "אותם", "הקודם", "הקודמת", "שאמרת", "שכתבת",
+    "תרחיב", "תפרט", "ומה עם", "ואם", "למעלה", "כמו שאמרת"
+]
+
+
+class SemanticCache:
+    """
+    מטמון תשובות גלובלי עם חיפוש שכן-קרוב וקטורי.
+    ה-embeddings שמורים במטריצה מנורמלת אחת, כך שחיפוש הוא מכפלת מטריצה-וקטור
+    אחת. פינוי לפי TTL, ואם אין מקום - הרשומה שלא נעשה בה שימוש הכי הרבה זמן (LRU).
+    """
+
+    def __init__(
+        self,
+        embeddings_manager: EmbeddingsManager,
+        threshold: float = 0.92,
+        ttl: int = 3600,
+        maxsize: int = 1000
+    ):
+        """
+        אתחול המטמון
+
+        Args:
+            embeddings_manager: מנהל ה-embeddings המשותף
+            threshold: דמיון קוסינוס מינימלי כדי להחשיב שאלה כזהה
+            ttl: זמן תפוגה בשניות
+            maxsize: מספר תשובות מקסימלי במטמון
+        """
+        self.embeddings_manager = embeddings_manager
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+        self._vectors: Optional[np.ndarray] = None       # (maxsize, dim) מנורמל
+        self._created = np.zeros(maxsize, dtype=np.float64)
+        self._last_used = np.zeros(maxsize, dtype=np.float64)
+        self._occupied = np.zeros(maxsize, dtype=bool)
+        self._questions: List[Optional[str]] = [None] * maxsize
+        self._answers: List[Optional[str]] = [None] * maxsize
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+
+        logger.info(
+            "מטמון סמנטי אותחל",
+            extra={"threshold": threshold, "ttl": ttl, "maxsize": maxsize}
+        )
+
+    @staticmethod
+    def is_context_dependent(message: str, has_history: bool = False) -> bool:
+        """
+        האם ההודעה היא המשך לשיחה, שהתשובה עליה תלויה בהקשר
+
+        Args:
+            message: הודעת המשתמש
+            has_history: האם יש לשיחה היסטוריה קודמת
+
+        Returns:
+            True אם אסור להגיש לה תשובה מהמטמון הגלובלי
+        """
+        words = message.lower().replace("?", " ").replace(",", " ").split()
+        text = " ".join(words)
+        if any(f" {marker} " in f" {text} " for marker in FOLLOW_UP_MARKERS):
+            return True
+        if has_history and len(words) <= 5:
+            return not CATEGORY_MATCHER.has_any(text)
+        return False
+
+    def embed(self, text: str) -> np.ndarray:
+        """
+        וקטור מנורמל לשאלה - חישוב כבד, ולכן נקרא מת'רד נפרד (asyncio.to_thread)
+        ומועבר ל-get ול-set, כדי שהמודל לא ירוץ על לולאת האירועים
+        """
+        vector = np.asarray(self.embeddings_manager.get_query_embedding(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _live_mask(self, now: float) -> np.ndarray:
+        return self._occupied & (now - self._created <= self.ttl)
+
+    def _nearest(self, vector: np.ndarray, now: float) -> Tuple[int, float]:
+        """האינדקס והדמיון של השאלה השמורה הקרובה ביותר (-1 אם המטמון ריק)"""
+        if self._vectors is None:
+            return -1, 0.0
+        live = self._live_mask(now)
+        if not live.any():
+            return -1, 0.0
+        scores = self._vectors @ vector
+        scores[~live] = -np.inf
+        index = int(np.argmax(scores))
+        return index, float(scores[index])
+
+    def get(self, question: str, vector: Optional[np.ndarray] = None) -> Optional[Tuple[str, float]]:
+        """
+        חיפוש תשובה לשאלה דומה
+
+        Args:
+            question: שאלת המשתמש
+            vector: הוקטור מ-embed (None = חישוב כאן)
+
+        Returns:
+            טאפל של (תשובה, ציון דמיון), או None אם לא נמצאה שאלה דומה מספיק
+        """
+        now = time.time()
+        index, similarity = self._nearest(self.embed(question) if vector is None else vector, now)
+        if index < 0 or similarity < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._last_used[index] = now
+        logger.info(
+            "נמצאה תשובה במטמון הסמנטי",
+            extra={
+                "question": question,
+                "cached_question": self._questions[index],
+                "similarity": similarity
+            }
+        )
+        return self._answers[index], similarity
+
+    def set(self, question: str, answer: str, vector: Optional[np.ndarray] = None) -> None:
+        """
+        שמירת תשובה במטמון
+
+        Args:
+            question: שאלת המשתמש
+            answer: התשובה שנשלחה
+            vector: הוקטור מ-embed (None = חישוב כאן)
+        """
+        now = time.time()
+        if vector is None:
+            vector = self.embed(question)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+
+        index, similarity = self._nearest(vector, now)
+        if index < 0 or similarity < self.threshold:
+            index = self._free_slot(now)
+
+        self._vectors[index] = vector
+        self._created[index] = now
+        self._last_used[index] = now
+        self._occupied[index] = True
+        self._questions[index] = question
+        self._answers[index] = answer
+
+    def _free_slot(self, now: float) -> int:
+        """מקום פנוי - ריק, פג תוקף, או הפחות בשימוש לאחרונה"""
+        free = np.flatnonzero(~self._live_mask(now))
+        if free.size:
+            return int(free[0])
+        self.evictions += 1
+        return int(np.argmin(self._last_used))
+
+    def clear(self) -> None:
+        """ניקוי המטמון"""
+        self._occupied[:] = False
+        self._questions = [None] * self.maxsize
+        self._answers = [None] * self.maxsize
+        logger.info("המטמון הסמנטי נוקה")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות מטמון"""
+        lookups = self.hits + self.misses
+        return {
+            "size": int(self._live_mask(time.time()).sum()),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0
+        }
@@ -0,0 +1,125 @@
+"""
+איחוד בקשות זהות שרצות במקביל (single-flight).
+בקשה ראשונה למפתח מבצעת את העבודה, וכל בקשה זהה שמגיעה בזמן שהיא רצה
+מצטרפת לאותה תוצאה במקום לשלוח בקשה נוספת.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# קולבק שמקבל עדכוני ביניים מהעבודה המשותפת (למשל טקסט מצטבר בהזרמה)
+ProgressCallback = Callable[[Any], Awaitable[None]]
+
+
+@dataclass
+class _Flight:
+    """עבודה אחת שרצה עבור כל הממתינים לאותו מפתח"""
+    task: Optional[asyncio.Task] = None
+    waiters: int = 0
+    listeners: List[ProgressCallback] = field(default_factory=list)
+    last_progress: Any = None
+
+
+class SingleFlight:
+    """
+    מאחד קריאות אסינכרוניות זהות שרצות במקביל.
+
+    - שגיאה בעבודה המשותפת מועברת לכל הממתינים.
+    - ביטול של ממתין אחד לא מבטל את העבודה לאחרים; העבודה מבוטלת רק
+      כשכל הממתינים ויתרו עליה.
+    - התוצאה לא נשמרת אחרי הסיום - קריאה מאוחרת יותר מתחילה עבודה חדשה.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def in_flight(self) -> int:
+        """כמה עבודות רצות כרגע"""
+        return len(self._flights)
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[ProgressCallback], Awaitable[T]],
+        on_progress: Optional[ProgressCallback] = None
+    ) -> T:
+        """
+        הרצת fn עבור המפתח, או הצטרפות לריצה קיימת
+
+        Args:
+            key: מפתח הבקשה (בקשות עם אותו מפתח מאוחדות)
+            fn: פונקציה שמבצעת את העבודה; מקבלת קולבק לפרסום עדכוני ביניים
+            on_progress: קולבק לקבלת עדכוני הביניים (אופציונלי)
+
+        Returns:
+            תוצאת העבודה המשותפת
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(fn(self._publisher(flight)))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["coalesced"] += 1
+            logger.debug("בקשה זהה צורפה לבקשה שכבר רצה", extra={"waiters": flight.waiters + 1})
+
+        # רישום לפני כל await - כך המצטרף נספר כממתין ולא מפספס עדכונים בזמן ההשלמה
+        if on_progress is not None:
+            flight.listeners.append(on_progress)
+        flight.waiters += 1
+        try:
+            if on_progress is not None:
+                # השלמת העדכון האחרון שפורסם לפני ההצטרפות; אם בינתיים פורסם חדש - שולחים גם אותו,
+                # כדי שהעדכון האחרון שהמצטרף מקבל יהיה תמיד העדכני
+                replayed = None
+                while flight.last_progress is not None and flight.last_progress is not replayed:
+                    replayed = flight.last_progress
+                    await on_progress(replayed)
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if on_progress is not None:
+                flight.listeners.remove(on_progress)
+            if flight.waiters == 0 and not flight.task.done():
+                # כל הממתינים בוטלו - אין טעם להמשיך בעבודה. מוציאים את הריצה מיד, כדי שבקשה
+                # שמגיעה לפני שהביטול מסתיים תתחיל ריצה חדשה ולא תצטרף לריצה שמתבטלת
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    @staticmethod
+    def _publisher(flight: _Flight) -> ProgressCallback:
+        async def publish(value: Any) -> None:
+            flight.last_progress = value
+            for listener in list(flight.listeners):
+                try:
+                    await listener(value)
+                except Exception as e:
+                    # מאזין תקול לא יפיל את העבודה המשותפת
+                    logger.warning(
+                        "שגיאה בהעברת עדכון ביניים",
+                        extra={"error_type": type(e).__name__, "error": str(e)}
+                    )
+        return publish
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות איחוד"""
+        total = self.stats["leaders"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "in_flight": self.in_flight(),
+            "coalesced_rate": self.stats["coalesced"] / total if total else 0
+        }
@@ -0,0 +1,115 @@
+"""
+מדיניות תעבורה לחנות (WooCommerce).
+מגבילה כמה בקשות רצות במקביל ובאיזה קצב (token bucket), עוצרת את כל השליחה
+כשהחנות מבקשת להמתין (Retry-After), ומחליטה מתי ואחרי כמה זמן לנסות שוב.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from utils import get_logger
+from utils.llm_scheduler import TokenBucket, backoff_delay
+
+logger = get_logger(__name__)
+
+# סטטוסים שכדאי לנסות שוב: החנות עמוסה או לא זמינה לרגע
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+# שיטות שבטוח לשלוח שוב - חזרה עליהן לא משנה את התוצאה
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+
+
+class StoreTransportPolicy:
+    """
+    מדיניות משותפת לכל הקריאות לחנות אחת.
+    - עד max_concurrency בקשות במקביל, ועד requests_per_minute בקשות בדקה
+    - 429/5xx ושגיאות רשת בשיטות אידמפוטנטיות נשלחות שוב עד max_retries פעמים,
+      עם המתנה אקספוננציאלית עם jitter (או לפי Retry-After)
+    - 429 עם Retry-After עוצר את כל הבקשות לחנות עד שהזמן עובר, לא רק את הבקשה שנדחתה
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        requests_per_minute: float = 0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 10.0
+    ):
+        """
+        Args:
+            max_concurrency: מספר בקשות מקסימלי שרצות במקביל לחנות
+            requests_per_minute: מגבלת בקשות לדקה (0 = ללא הגבלה)
+            max_retries: ניסיונות חוזרים אחרי הניסיון הראשון
+            backoff_base: המתנה בסיסית בשניות לפני ניסיון חוזר
+            backoff_cap: המתנה מקסימלית בשניות בין ניסיונות
+        """
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+        # דלי בקיבולת שנייה של מילוי, כדי שפרץ לא ינצל דקה שלמה בבת אחת
+        self._bucket = TokenBucket(requests_per_minute, capacity=max(requests_per_minute / 60.0, 1.0))
+        self._bucket_lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "paused": 0, "gave_up": 0}
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """משבצת לבקשה אחת: מקום במקביליות, אסימון מהדלי וסוף השהיית Retry-After"""
+        async with self._semaphore:
+            await self._wait_for_turn()
+            self.stats["requests"] += 1
+            yield
+
+    async def _wait_for_turn(self) -> None:
+        async with self._bucket_lock:
+            while True:
+                delay = max(self._paused_until - time.monotonic(), self._bucket.time_until(1))
+                if delay <= 0:
+                    break
+                self.stats["throttled"] += 1
+                await asyncio.sleep(delay)
+            self._bucket.consume(1)
+
+    def pause(self, seconds: float) -> None:
+        """עצירת כל הבקשות לחנות למשך זמן (החנות ביקשה Retry-After)"""
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self._paused_until = until
+            self.stats["paused"] += 1
+            logger.warning("החנות ביקשה להמתין - הבקשות אליה מושהות", extra={"seconds": round(seconds, 2)})
+
+    def should_retry(self, method: str, attempt: int, status: Optional[int] = None) -> bool:
+        """
+        האם לנסות שוב
+
+        Args:
+            method: שיטת ה-HTTP
+            attempt: מספר הניסיון שנכשל (0 = הראשון)
+            status: קוד התשובה, או None לשגיאת רשת / זמן
+
+        Returns:
+            True אם כדאי לשלוח שוב
+        """
+        if method not in IDEMPOTENT_METHODS:
+            return False
+        if status is not None and status not in RETRYABLE_STATUSES:
+            return False
+        if attempt >= self.max_retries:
+            self.stats["gave_up"] += 1
+            return False
+        self.stats["retries"] += 1
+        return True
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """כמה להמתין לפני הניסיון הבא - Retry-After אם נשלח, אחרת אקספוננציאלי עם jitter"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_cap * 6)
+        return backoff_delay(attempt, base=self.backoff_base, cap=self.backoff_cap)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות המדיניות"""
+        return {**self.stats, "max_concurrency": self.max_concurrency}
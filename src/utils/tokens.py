@@ -0,0 +1,44 @@
+"""
+הערכה מקומית ומהירה של מספר הטוקנים בטקסט, בלי טוקנייזר.
+"""
+
+import re
+from typing import Dict, List
+
+# בממוצע: טוקן לכל ~4 תווים באנגלית, ולכל ~2.5 תווים בעברית
+CHARS_PER_TOKEN_LATIN = 4.0
+CHARS_PER_TOKEN_HEBREW = 2.5
+# תוספת טוקנים לכל הודעה בפורמט צ'אט (role, מפרידים)
+TOKENS_PER_MESSAGE = 4
+
+_HEBREW_CHARS = re.compile("[\u0590-\u05FF]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    הערכת מספר הטוקנים בטקסט
+
+    Args:
+        text: הטקסט
+
+    Returns:
+        מספר טוקנים משוער (מעוגל כלפי מעלה)
+    """
+    if not text:
+        return 0
+    hebrew = len(_HEBREW_CHARS.findall(text))
+    other = len(text) - hebrew
+    return int(hebrew / CHARS_PER_TOKEN_HEBREW + other / CHARS_PER_TOKEN_LATIN) + 1
+
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    הערכת מספר הטוקנים ברשימת הודעות בפורמט צ'אט
+
+    Args:
+        messages: רשימת הודעות
+
+    Returns:
+        מספר טוקנים משוער
+    """
+    return sum(estimate_tokens(m.get("content", "")) + TOKENS_PER_MESSAGE for m in messages)
@@ -0,0 +1,161 @@
+"""
+Webhook mode: Telegram pushes updates to an embedded aiohttp server instead of being polled.
+Several instances can run behind a load balancer, since nothing is pulled from Telegram.
+"""
+
+import asyncio
+import hmac
+import json
+import signal
+from typing import Callable, Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Receives updates over HTTP and puts them on the application's update queue.
+
+    - Requests without the configured secret token are rejected (403)
+    - When max_pending_updates updates are already waiting or being processed, new ones are
+      refused with 503 and Retry-After; Telegram delivers them again later
+    - GET /healthz reports the current load, for load balancer health checks
+    """
+
+    def __init__(
+        self,
+        application: Application,
+        pending_updates: Callable[[], int],
+        url_path: str = "/telegram",
+        listen: str = "0.0.0.0",
+        port: int = 8443,
+        secret_token: Optional[str] = None,
+        max_pending_updates: int = 100,
+        retry_after: int = 1
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            application: The application whose update queue receives the updates
+            pending_updates: Returns how many accepted updates are not finished yet
+            url_path: Path Telegram posts to
+            listen: Interface to bind
+            port: Port to bind
+            secret_token: Expected value of the secret token header (None = not checked)
+            max_pending_updates: Unfinished updates above which new ones are refused
+            retry_after: Seconds suggested to the sender when refusing an update
+        """
+        self.application = application
+        self.pending_updates = pending_updates
+        self.url_path = url_path
+        self.listen = listen
+        self.port = port
+        self.secret_token = secret_token
+        self.max_pending_updates = max_pending_updates
+        self.retry_after = retry_after
+        self.stats = {"accepted": 0, "rejected_busy": 0, "rejected_secret": 0, "invalid": 0}
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_post(url_path, self._handle_update)
+        self.app.router.add_get("/healthz", self._handle_health)
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        if self.secret_token is not None:
+            received = request.headers.get(SECRET_TOKEN_HEADER, "")
+            if not hmac.compare_digest(received.encode(), self.secret_token.encode()):
+                self.stats["rejected_secret"] += 1
+                logger.warning("התקבל עדכון עם טוקן סודי שגוי", extra={"remote": request.remote})
+                return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except (json.JSONDecodeError, TypeError, ValueError, KeyError) as e:
+            update = None
+            logger.warning("התקבל עדכון לא תקין", extra={"error": str(e)})
+        if update is None:
+            self.stats["invalid"] += 1
+            return web.Response(status=400)
+
+        # the check and the enqueue must not be separated by an await, or concurrent requests
+        # could all pass the check before any of them is counted
+        if self.pending_updates() >= self.max_pending_updates:
+            self.stats["rejected_busy"] += 1
+            return web.Response(status=503, headers={"Retry-After": str(self.retry_after)})
+        self.application.update_queue.put_nowait(update)
+        self.stats["accepted"] += 1
+        return web.Response(status=200)
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            **self.stats,
+            "pending_updates": self.pending_updates(),
+            "max_pending_updates": self.max_pending_updates
+        })
+
+    async def start(self) -> None:
+        """Start listening."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logger.info(
+            "שרת ה-webhook מאזין",
+            extra={"listen": self.listen, "port": self.port, "path": self.url_path}
+        )
+
+    async def stop(self) -> None:
+        """Stop accepting updates."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            logger.info("שרת ה-webhook נעצר", extra=self.stats)
+
+
+async def serve_webhook(application: Application, server: WebhookServer, webhook_url: str) -> None:
+    """
+    Run an application in webhook mode until SIGINT/SIGTERM.
+
+    Mirrors run_polling's lifecycle: post_init before the server starts, queued updates are
+    processed before post_shutdown. The webhook stays registered on exit so other instances
+    behind the same URL keep receiving updates.
+
+    Args:
+        application: The application to run
+        server: The webhook server feeding it
+        webhook_url: Public URL registered with Telegram
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start()
+        await application.bot.set_webhook(
+            url=webhook_url,
+            secret_token=server.secret_token,
+            allowed_updates=Update.ALL_TYPES
+        )
+        logger.info("ה-webhook נרשם בטלגרם", extra={"url": webhook_url})
+        await stop.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await application.shutdown()
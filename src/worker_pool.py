@@ -0,0 +1,229 @@
+"""
+Multi-process worker mode.
+A front process polls Telegram and hands every update to one of N worker processes,
+chosen by chat_id, so each chat's history and caches stay inside a single worker.
+Each worker runs its own StoreManagerBot and OrchestratorAgent and replies directly.
+"""
+
+import asyncio
+import multiprocessing
+import signal
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+from bot import StoreManagerBot
+from store_webhooks import StoreWebhookServer
+from utils import get_logger
+from webhook_server import WebhookServer, serve_webhook
+
+logger = get_logger(__name__)
+
+# Builds the bot (and its orchestrator) inside a worker process.
+# Must be a module-level function so it can be pickled for a spawned process.
+BotFactory = Callable[[], StoreManagerBot]
+
+
+def shard_for(update: Update, workers: int) -> int:
+    """Pick the worker for an update: by chat, so a chat is always served by the same worker."""
+    chat = update.effective_chat
+    key = chat.id if chat else update.update_id
+    return key % workers
+
+
+def _worker_main(index: int, updates: multiprocessing.Queue, bot_factory: BotFactory) -> None:
+    """Entry point of a worker process."""
+    # Ctrl+C reaches the whole process group; the front stops workers gracefully instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    bot = bot_factory()
+
+    async def next_update() -> Optional[dict]:
+        return await asyncio.get_running_loop().run_in_executor(None, updates.get)
+
+    logger.info("תהליך עובד התחיל", extra={"worker": index})
+    asyncio.run(bot.serve(next_update))
+    logger.info("תהליך עובד הסתיים", extra={"worker": index})
+
+
+class WorkerPool:
+    """
+    Front process for the worker mode.
+    Receives updates by polling, routes them by chat_id to worker processes,
+    restarts workers that die and supports a rolling restart (SIGHUP).
+    """
+
+    def __init__(
+        self,
+        token: str,
+        bot_factory: BotFactory,
+        workers: int = 2,
+        max_restarts: int = 5,
+        restart_window: float = 60.0,
+        shutdown_timeout: float = 30.0,
+        store_webhook: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            token: Telegram bot token
+            bot_factory: Module-level function that builds a StoreManagerBot in a worker
+            workers: Number of worker processes
+            max_restarts: Restarts allowed per worker within restart_window before backing off
+            restart_window: Seconds over which restarts are counted
+            shutdown_timeout: Seconds to wait for a worker to finish its queue before killing it
+            store_webhook: StoreWebhookServer settings (secret, url_path, listen, port) to receive
+                the store's webhooks here and pass every event to all workers (None = off)
+        """
+        self.token = token
+        self.bot_factory = bot_factory
+        self.workers = workers
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.shutdown_timeout = shutdown_timeout
+
+        # spawn - a clean interpreter per worker, without the front's threads and event loop
+        self._context = multiprocessing.get_context("spawn")
+        self._queues: List[multiprocessing.Queue] = [self._context.Queue() for _ in range(workers)]
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._restart_times: List[deque] = [deque() for _ in range(workers)]
+        self._restarting: set = set()
+        self._stopping = False
+        self._supervisor: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {"dispatched": 0, "restarts": 0, "crashes": 0, "store_events": 0}
+        # every worker keeps its own caches, so store events go to all of them
+        self.store_webhook: Optional[StoreWebhookServer] = (
+            StoreWebhookServer(on_event=self._broadcast_store_event, **store_webhook) if store_webhook else None
+        )
+
+        self.application = (
+            Application.builder()
+            .token(token)
+            .post_init(self._on_startup)
+            .post_shutdown(self._on_shutdown)
+            .build()
+        )
+        self.application.add_handler(TypeHandler(Update, self._dispatch))
+
+        logger.info("מאגר התהליכים אותחל", extra={"workers": workers})
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self._queues[index], self.bot_factory),
+            name=f"store-bot-worker-{index}",
+            daemon=False
+        )
+        process.start()
+        self._processes[index] = process
+        logger.info("תהליך עובד הופעל", extra={"worker": index, "pid": process.pid})
+
+    async def _stop_worker(self, index: int) -> None:
+        """Ask a worker to finish its queued updates and exit; kill it if it takes too long."""
+        process = self._processes[index]
+        if process is None or not process.is_alive():
+            return
+        self._queues[index].put(None)
+        await asyncio.get_running_loop().run_in_executor(None, process.join, self.shutdown_timeout)
+        if process.is_alive():
+            logger.warning("תהליך עובד לא הסתיים בזמן - נעצר בכוח", extra={"worker": index, "pid": process.pid})
+            process.terminate()
+            await asyncio.get_running_loop().run_in_executor(None, process.join, 5)
+
+    async def _dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Forward an update to the worker that owns its chat."""
+        index = shard_for(update, self.workers)
+        self._queues[index].put(update.to_dict())
+        self.stats["dispatched"] += 1
+
+    def _broadcast_store_event(self, topic: str, payload: Dict[str, Any]) -> None:
+        """Pass a store webhook event to every worker."""
+        for queue in self._queues:
+            queue.put({"store_event": {"topic": topic, "payload": payload}})
+        self.stats["store_events"] += 1
+
+    async def _supervise(self) -> None:
+        """Restart workers that exited unexpectedly, backing off when one keeps crashing."""
+        while not self._stopping:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            for index, process in enumerate(self._processes):
+                if index in self._restarting or (process is not None and process.is_alive()):
+                    continue
+                restarts = self._restart_times[index]
+                while restarts and now - restarts[0] > self.restart_window:
+                    restarts.popleft()
+                if len(restarts) >= self.max_restarts:
+                    continue
+                if process is not None:
+                    self.stats["crashes"] += 1
+                    logger.error(
+                        "תהליך עובד הסתיים באופן לא צפוי - מופעל מחדש",
+                        extra={"worker": index, "exitcode": process.exitcode, "recent_restarts": len(restarts)}
+                    )
+                restarts.append(now)
+                self.stats["restarts"] += 1
+                self._spawn(index)
+
+    async def restart(self) -> None:
+        """Rolling restart: replace workers one at a time; updates queued meanwhile wait for the new one."""
+        logger.info("מתחיל הפעלה מחדש מדורגת של התהליכים")
+        for index in range(self.workers):
+            self._restarting.add(index)
+            try:
+                await self._stop_worker(index)
+                if not self._stopping:
+                    self._spawn(index)
+            finally:
+                self._restarting.discard(index)
+        logger.info("ההפעלה מחדש המדורגת הסתיימה")
+
+    async def _on_startup(self, application: Application) -> None:
+        for index in range(self.workers):
+            self._spawn(index)
+        self._supervisor = asyncio.create_task(self._supervise())
+        if self.store_webhook is not None:
+            await self.store_webhook.start()
+        if hasattr(signal, "SIGHUP"):
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGHUP, lambda: asyncio.create_task(self.restart())
+            )
+
+    async def _on_shutdown(self, application: Application) -> None:
+        self._stopping = True
+        if self.store_webhook is not None:
+            await self.store_webhook.stop()
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+        await asyncio.gather(*(self._stop_worker(index) for index in range(self.workers)))
+        logger.info("כל תהליכי העובדים נעצרו", extra=self.stats)
+
+    def run(self) -> None:
+        """Start the workers and poll Telegram in this process."""
+        logger.info("מתחיל להריץ את הבוט במצב תהליכים מרובים...", extra={"workers": self.workers})
+        self.application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+    def run_webhook(self, webhook_url: str, max_pending_updates: int = 100, **server_kwargs) -> None:
+        """
+        Start the workers and receive updates by webhook in this process.
+
+        Args:
+            webhook_url: Public URL registered with Telegram
+            max_pending_updates: Updates waiting for a worker above which new ones are refused
+            server_kwargs: url_path, listen, port and secret_token for the WebhookServer
+        """
+        server = WebhookServer(
+            self.application,
+            pending_updates=self._pending_updates,
+            max_pending_updates=max_pending_updates,
+            **server_kwargs
+        )
+        logger.info("מתחיל להריץ את הבוט במצב תהליכים מרובים עם webhook...", extra={"workers": self.workers})
+        asyncio.run(serve_webhook(self.application, server, webhook_url))
+
+    def _pending_updates(self) -> int:
+        """Updates not yet taken by the busiest worker (the one a new update may be stuck behind)."""
+        return max(queue.qsize() for queue in self._queues)
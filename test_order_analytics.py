@@ -0,0 +1,42 @@
+import sys
+import asyncio
+sys.path.append('src')
+
+from agents.order_analytics import OrderAnalytics
+
+
+class RepeatingStore:
+    """Store stub whose order walk returns the same order on two pages"""
+
+    def __init__(self):
+        self.order = {
+            "id": 101,
+            "status": "completed",
+            "date_created": "2024-03-01T10:00:00",
+            "date_modified_gmt": "2024-03-01T08:00:00",
+            "total": "100.00",
+            "total_tax": "0",
+            "shipping_total": "0",
+            "discount_total": "0",
+            "refunds": [],
+            "line_items": [{"product_id": 7, "name": "Widget", "quantity": 1, "total": "100.00"}]
+        }
+
+    async def iter_orders(self, modified_after=None, prefetch=1):
+        yield self.order
+        yield dict(self.order)
+
+
+async def main():
+    analytics = OrderAnalytics(RepeatingStore())
+    await analytics.sync(full=True)
+    report = analytics.sales_report("2024-03-01", "2024-03-31")
+    top = analytics.top_products("2024-03-01", "2024-03-31", limit=1)
+    print(f"Orders: {report['total_orders']}, sales: {report['total_sales']}, quantity: {top[0]['quantity']}")
+    assert report["total_orders"] == 1, "repeated order was counted twice"
+    assert report["total_sales"] == 100.0
+    assert top[0]["quantity"] == 1
+    print("OK: repeated order counted once")
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Replays signed WooCommerce webhook deliveries against a running bot.
+
+Usage:
+    python test_store_webhook.py [URL] [SECRET]
+
+Defaults: http://localhost:8444/woocommerce and the WC_WEBHOOK_SECRET environment variable.
+Each delivery is signed like WooCommerce signs it (base64 HMAC-SHA256 of the raw body).
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+import hmac
+import asyncio
+
+import aiohttp
+
+
+def sample_product(product_id, stock_quantity):
+    now = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+    return {
+        "id": product_id,
+        "name": "חולצת בדיקה",
+        "sku": f"TEST-{product_id}",
+        "status": "publish",
+        "price": "79.90",
+        "regular_price": "99.90",
+        "sale_price": "79.90",
+        "stock_status": "instock" if stock_quantity > 0 else "outofstock",
+        "stock_quantity": stock_quantity,
+        "categories": [{"id": 15, "name": "חולצות", "slug": "shirts"}],
+        "date_modified_gmt": now
+    }
+
+
+def sample_order(order_id, product_id):
+    now = time.strftime("%Y-%m-%dT%H:%M:%S")
+    return {
+        "id": order_id,
+        "number": str(order_id),
+        "status": "processing",
+        "currency_symbol": "₪",
+        "date_created": now,
+        "date_modified_gmt": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+        "total": "169.80",
+        "total_tax": "24.67",
+        "shipping_total": "10.00",
+        "discount_total": "0.00",
+        "billing": {"first_name": "ישראל", "last_name": "ישראלי"},
+        "line_items": [{"product_id": product_id, "name": "חולצת בדיקה", "quantity": 2, "total": "159.80"}],
+        "refunds": []
+    }
+
+
+def sign(body, secret):
+    return base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest()).decode()
+
+
+async def deliver(session, url, secret, topic, payload, signature=None):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json",
+        "X-WC-Webhook-Topic": topic,
+        "X-WC-Webhook-Resource": topic.split(".")[0],
+        "X-WC-Webhook-Event": topic.split(".")[1],
+        "X-WC-Webhook-Delivery-ID": str(int(time.time() * 1000)),
+        "X-WC-Webhook-Signature": signature if signature is not None else sign(body, secret)
+    }
+    async with session.post(url, data=body, headers=headers) as response:
+        return response.status
+
+
+async def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8444/woocommerce"
+    secret = sys.argv[2] if len(sys.argv) > 2 else os.getenv("WC_WEBHOOK_SECRET", "")
+    if not secret:
+        print("No secret given (argument or WC_WEBHOOK_SECRET)")
+        return
+
+    product_id, order_id = 990001, 990001
+    async with aiohttp.ClientSession() as session:
+        print("Ping (sent by WooCommerce when a webhook is saved)...")
+        async with session.post(url, data="webhook_id=1",
+                                headers={"Content-Type": "application/x-www-form-urlencoded"}) as response:
+            print(f"  status: {response.status} (expected 200)")
+
+        print("\nDelivery with a wrong signature...")
+        status = await deliver(session, url, secret, "product.updated", sample_product(product_id, 5), "invalid")
+        print(f"  status: {status} (expected 401)")
+
+        deliveries = [
+            ("product.created", sample_product(product_id, 5)),
+            ("product.updated", sample_product(product_id, 0)),
+            ("order.created", sample_order(order_id, product_id)),
+            ("order.updated", {**sample_order(order_id, product_id), "status": "completed"}),
+            ("product.deleted", {"id": product_id}),
+            ("order.deleted", {"id": order_id})
+        ]
+        print("\nSigned deliveries:")
+        for topic, payload in deliveries:
+            status = await deliver(session, url, secret, topic, payload)
+            print(f"  {topic:<16} status: {status} (expected 200)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
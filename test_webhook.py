@@ -0,0 +1,65 @@
+"""
+Posts fake Telegram updates to a running webhook server.
+
+Usage:
+    python test_webhook.py [URL] [SECRET_TOKEN] [COUNT] [CHATS]
+
+Defaults: http://localhost:8443/telegram, no secret, 20 updates spread over 5 chats.
+The bot's replies to the fake chats fail on Telegram's side; this only exercises ingestion.
+"""
+
+import sys
+import time
+import asyncio
+from collections import Counter
+from urllib.parse import urljoin
+
+import aiohttp
+
+
+def fake_update(update_id, chat_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": "Test"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "text": text
+        }
+    }
+
+
+async def post(session, url, secret, update):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    async with session.post(url, json=update, headers=headers) as response:
+        return response.status
+
+
+async def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8443/telegram"
+    secret = sys.argv[2] if len(sys.argv) > 2 else ""
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    chats = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+    base_id = int(time.time())
+
+    async with aiohttp.ClientSession() as session:
+        print("Posting with a wrong secret token...")
+        status = await post(session, url, secret + "-wrong", fake_update(base_id, 1, "hello"))
+        print(f"  status: {status} (expected 403 when a secret is configured)")
+
+        print(f"\nPosting {count} updates over {chats} chats at once...")
+        start = time.time()
+        statuses = await asyncio.gather(*(
+            post(session, url, secret, fake_update(base_id + i + 1, 1000 + i % chats, f"שאלה מספר {i}"))
+            for i in range(count)
+        ))
+        print(f"  done in {time.time() - start:.2f}s: {dict(Counter(statuses))}")
+        print("  (503 = refused under backpressure, Telegram would retry it)")
+
+        async with session.get(urljoin(url, "/healthz")) as response:
+            print(f"\nHealth: {await response.json()}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())